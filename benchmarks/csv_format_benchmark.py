@@ -0,0 +1,108 @@
+"""Micro-benchmark of the csv serialization of bars.
+
+Compares the per-bar `",".join([str(v) for v in bar])` and `.encode()` that
+`write_to_file` used to run, and the per-line "%r" formatting of the former
+`Bars.to_csv`, against the bulk formatting of `csv_format.format_bars`, on
+random values and on prices of a tick grid, then times `write_to_file` itself
+on a new series.
+
+Usage:
+    python -m benchmarks.csv_format_benchmark
+    python -m benchmarks.csv_format_benchmark --bars 1000 50000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from packages.services.bars import Bars
+from packages.services.csv_format import format_bars
+from packages.services.write import write_to_file
+
+
+def make_bars(num_bars: int, tick: bool, start_ts: int = 1693550020) -> Bars:
+    ts = start_ts + 60 * np.arange(num_bars, dtype=np.int64)
+    rng = np.random.default_rng(0)
+    if not tick:
+        return Bars(ts, 26000.5 + rng.random((num_bars, 5)) * 100)
+    close = 26000 + np.round(np.cumsum(rng.normal(0, 5, num_bars)) * 4) / 4
+    volume = rng.integers(1, 5000, num_bars).astype(np.float64)
+    values = np.column_stack([close + 0.25, close + 1.5, close - 1.25, close, volume])
+    return Bars(ts, values)
+
+
+def legacy_path(bars: Bars) -> int:
+    data = b"".join(
+        [
+            "{}\n".format(",".join([str(v) for v in row])).encode("utf-8")
+            for row in bars.rows().tolist()
+        ]
+    )
+    return len(data)
+
+
+def line_format_path(bars: Bars) -> int:
+    line_format = ",".join(["%r"] * (bars.width + 1)) + "\n"
+    text = "".join([line_format % tuple(row) for row in bars.rows().tolist()])
+    return len(text.encode("utf-8"))
+
+
+def bulk_path(bars: Bars) -> int:
+    return len(format_bars(bars.ts, bars.values))
+
+
+def measure(func, repeat: int, *args) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure_write(storage_dir: str, bars: Bars, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        shutil.rmtree(storage_dir, ignore_errors=True)
+        start = time.perf_counter()
+        write_to_file(storage_dir, "BENCH:SYM", "1", bars)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bars", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    storage_dir = os.path.join(tempfile.mkdtemp(), "storage")
+    try:
+        for num_bars in args.bars:
+            for tick in [False, True]:
+                bars = make_bars(num_bars, tick)
+                print(f"{num_bars} bars, {'tick grid' if tick else 'random'} values")
+                baseline = None
+                for path_name, func in [
+                    ("legacy", legacy_path),
+                    ("line format", line_format_path),
+                    ("bulk", bulk_path),
+                ]:
+                    duration = measure(func, args.repeat, bars)
+                    baseline = baseline or duration
+                    print(
+                        "    {:<14s} {:10.3f} ms {:6.2f}x".format(
+                            path_name, duration * 1e3, baseline / duration
+                        )
+                    )
+                duration = measure_write(storage_dir, bars, args.repeat)
+                print("    {:<14s} {:10.3f} ms".format("write_to_file", duration * 1e3))
+    finally:
+        shutil.rmtree(os.path.dirname(storage_dir), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
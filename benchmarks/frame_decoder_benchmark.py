@@ -0,0 +1,169 @@
+"""Micro-benchmark of the websocket frame decoding.
+
+Compares the regex path that `async_get_multiple_bars` used to run on every
+message against `FrameDecoder`, on synthetic frames shaped like the ones
+tradingview sends, or on recorded messages.
+
+Usage:
+    python -m benchmarks.frame_decoder_benchmark
+    python -m benchmarks.frame_decoder_benchmark --frames recorded.jsonl
+
+Recorded messages are read one per line, each line being the json encoded
+string exactly as returned by `ws.recv()`.
+"""
+import argparse
+import json
+import re
+import time
+
+from packages.scrapers.tradingview import SKIPPED_RESPONSE_TYPE
+from packages.services.frame_decoder import FrameDecoder
+from packages.services.websockets import create_message, prepend_header
+from packages.types.frame import FrameType
+
+
+def make_bars(num_bars: int, start_ts: int = 1693550020, step: int = 60) -> list:
+    return [
+        {
+            "i": i,
+            "v": [
+                float(start_ts + i * step),
+                26000.5 + i,
+                26010.25 + i,
+                25990.75 + i,
+                26005.0 + i,
+                123.456789 + i,
+            ],
+        }
+        for i in range(num_bars)
+    ]
+
+
+def make_timescale_update(cs_id: str, chart_idx: int, bars: list) -> str:
+    return create_message(
+        "timescale_update",
+        [
+            cs_id,
+            {
+                f"sds_{chart_idx}": {
+                    "node": "bench",
+                    "s": bars,
+                    "ns": {"d": "", "indexes": []},
+                    "t": "s1",
+                    "lbs": {"bar_close_time": int(bars[-1]["v"][0]) + 60},
+                }
+            },
+            {"index": len(bars) - 1, "zoffset": 0, "changes": [], "marks": []},
+        ],
+    )
+
+
+def make_scenarios(num_bars: int) -> dict[str, list[str]]:
+    cs_id = "cs_benchmarkabcd"
+    small = (
+        create_message("series_loading", [cs_id, "sds_1", "s1"])
+        + create_message(
+            "symbol_resolved",
+            [cs_id, "sds_sym_1", {"name": "BTCUSDT", "data_frequency": "1S"}],
+        )
+        + create_message("series_timeframe", [cs_id, "sds_1", "s1", 0, 9, "", True])
+    )
+    return {
+        f"timescale_update x1 ({num_bars} bars)": [
+            make_timescale_update(cs_id, 1, make_bars(num_bars))
+        ],
+        "packed small messages x1000": [small] * 1000,
+        "heartbeats x1000": [prepend_header(f"~h~{i}") for i in range(1000)],
+        "series_completed x1000": [
+            create_message(
+                "series_completed",
+                [cs_id, "sds_1", "streaming", "s1", {"rt_update_period": 1}],
+            )
+        ]
+        * 1000,
+    }
+
+
+def regex_path(messages: list[str]) -> int:
+    parsed = 0
+    for message in messages:
+        if re.match(r"~m~\d+~m~~h~\d+$", str(message)):
+            continue
+        for segment in re.split(r"~m~\d+~m~", str(message))[1:]:
+            json.loads(segment)
+            parsed += 1
+    return parsed
+
+
+def decoder_path(messages: list[str]) -> int:
+    parsed = 0
+    decoder = FrameDecoder()
+    for message in messages:
+        for frame in decoder.feed(message):
+            if frame.frame_type == FrameType.HEARTBEAT:
+                continue
+            frame.data
+            parsed += 1
+    return parsed
+
+
+def decoder_lazy_path(messages: list[str]) -> int:
+    parsed = 0
+    decoder = FrameDecoder()
+    for message in messages:
+        for frame in decoder.feed(message):
+            if frame.frame_type == FrameType.HEARTBEAT:
+                continue
+            if frame.m in SKIPPED_RESPONSE_TYPE:
+                continue
+            frame.data
+            parsed += 1
+    return parsed
+
+
+def measure(func, messages: list[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(messages)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", help="file of recorded messages, one per line")
+    parser.add_argument("--bars", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.frames is not None:
+        with open(args.frames, "r") as f:
+            scenarios = {args.frames: [json.loads(line) for line in f if line.strip()]}
+    else:
+        scenarios = make_scenarios(args.bars)
+
+    paths = [
+        ("regex", regex_path),
+        ("decoder", decoder_path),
+        ("decoder lazy", decoder_lazy_path),
+    ]
+    for name, messages in scenarios.items():
+        size = sum(len(message) for message in messages)
+        print(f"{name}: {len(messages)} messages, {size / 1e6:.2f} MB")
+        baseline = None
+        for path_name, func in paths:
+            duration = measure(func, messages, args.repeat)
+            baseline = baseline or duration
+            print(
+                "    {:<14s} {:10.3f} ms {:10.1f} MB/s {:6.2f}x".format(
+                    path_name,
+                    duration * 1e3,
+                    size / duration / 1e6,
+                    baseline / duration,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""End-to-end throughput benchmark of the scrapers.
+
+Runs the scraper against the local mock server from
+`packages/mocks/tradingview_server.py` (in its own process, so it does not
+compete with the scraper for the GIL) for every combination of processes and
+chart sessions, and reports pairs/sec, bytes/sec and p50/p99 per-pair latency.
+
+Usage:
+    python -m benchmarks.scraper_throughput_benchmark --pairs 1000 \
+        --processes 1,2,4 --max-cs 5,10,20 --bars 5000 --latency 0.05
+
+With --keep-alive, connections and chart sessions are reused across runs as
+`ScraperEngine` does, the second run of each combination shows the cost
+without handshake and session setup. With more than one process the runs go
+through `ScraperWorkerPool`, whose workers share the pairs, and the busy time
+of the least and most busy worker is reported. Compare with the fixed chunk per
+process of --static on a skewed load:
+
+    python -m benchmarks.scraper_throughput_benchmark --processes 4 \
+        --interval-latency 1=0.5,3=0.5 --interval-major [--static]
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing as mp
+import time
+
+from packages.mocks.tradingview_server import MockTradingViewServer
+from packages.scrapers.tradingview import get_multiple_bars
+from packages.scrapers.worker_pool import ScraperWorkerPool
+from packages.utils.intervals import get_interval_list
+
+
+def _server_process(config: dict, conn):
+    async def run():
+        mock = MockTradingViewServer(**config)
+        conn.send(await mock.start())
+        while True:
+            if conn.poll():
+                command = conn.recv()
+                if command == "stats":
+                    conn.send(dict(mock.stats))
+                elif command == "stop":
+                    break
+            await asyncio.sleep(0.01)
+        await mock.stop()
+
+    asyncio.run(run())
+
+
+def percentile(values: list[float], q: float) -> float:
+    if len(values) == 0:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def make_pairs(num_pairs: int, interval_major: bool = False) -> list[tuple[str, str]]:
+    interval_list = get_interval_list("non seconds")
+    pairs = [
+        (f"MOCK:SYM{i // len(interval_list)}", interval_list[i % len(interval_list)])
+        for i in range(num_pairs)
+    ]
+    if interval_major:
+        # as pairs of the same interval become ready together
+        pairs.sort(key=lambda pair: interval_list.index(pair[1]))
+    return pairs
+
+
+def parse_interval_latency(text: str) -> dict[str, float]:
+    return {
+        interval: float(latency)
+        for interval, latency in (item.split("=") for item in text.split(",") if item)
+    }
+
+
+def run(conn, logger, pairs, args, num_processes, max_cs, url, worker_pool):
+    conn.send("stats")
+    bytes_before = conn.recv()["bytes_sent"]
+    start = time.perf_counter()
+    if worker_pool is not None:
+        results = list(worker_pool.iter_bars("", pairs))
+        busy = [stats["busy"] for stats in worker_pool.worker_stats]
+    else:
+        results = get_multiple_bars(
+            logger=logger,
+            auth_token="",
+            symbol_pair_list=pairs,
+            timeout=args.timeout,
+            num_processes=num_processes,
+            max_cs=max_cs,
+            url=url,
+            keep_alive=args.keep_alive,
+            adaptive_cs=args.adaptive_cs,
+        )
+        busy = []
+    duration = time.perf_counter() - start
+    conn.send("stats")
+    num_bytes = conn.recv()["bytes_sent"] - bytes_before
+
+    latencies = [result[3]["latency"] for result in results if "latency" in result[3]]
+    errors = len(pairs) - sum(result[2] is not None for result in results)
+    print(
+        "{:>9d} {:>6d} {:>10.1f} {:>10.2f} {:>9.1f} {:>9.1f} {:>7d} {:>12s}".format(
+            num_processes,
+            max_cs,
+            len(results) / duration,
+            num_bytes / duration / 1e6,
+            percentile(latencies, 0.5) * 1e3,
+            percentile(latencies, 0.99) * 1e3,
+            errors,
+            "{:.0%}/{:.0%}".format(min(busy) / duration, max(busy) / duration)
+            if len(busy) > 0
+            else "-",
+        )
+    )
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pairs", type=int, default=1000)
+    parser.add_argument("--processes", default="1,2,4")
+    parser.add_argument("--max-cs", default="5,10,20")
+    parser.add_argument("--bars", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument(
+        "--interval-latency",
+        default="",
+        help="latency of some intervals, e.g. 1=0.5,3=0.5",
+    )
+    parser.add_argument(
+        "--interval-major",
+        action="store_true",
+        help="order the pairs by interval instead of by symbol",
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=int, default=3)
+    parser.add_argument(
+        "--adaptive-cs",
+        action="store_true",
+        help="let the chart sessions in flight adapt, up to max_cs",
+    )
+    parser.add_argument(
+        "--static",
+        action="store_true",
+        help="split the pairs into one fixed chunk per process, no worker pool",
+    )
+    parser.add_argument(
+        "--keep-alive",
+        action="store_true",
+        help="reuse connections across runs, each combination is run twice",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    logger = logging.getLogger("benchmark")
+
+    config = {
+        "latency": args.latency,
+        "latency_jitter": args.latency_jitter,
+        "interval_latency": parse_interval_latency(args.interval_latency),
+        "bar_count": args.bars,
+        "error_rate": args.error_rate,
+    }
+    conn, child_conn = mp.Pipe()
+    server = mp.Process(target=_server_process, args=(config, child_conn))
+    server.start()
+    url = conn.recv()
+
+    pairs = make_pairs(args.pairs, args.interval_major)
+    print(f"{len(pairs)} pairs, {args.bars} bars per pair, mock server at {url}")
+    print(
+        "{:>9s} {:>6s} {:>10s} {:>10s} {:>9s} {:>9s} {:>7s} {:>11s}".format(
+            "processes",
+            "max_cs",
+            "pairs/s",
+            "MB/s",
+            "p50 ms",
+            "p99 ms",
+            "errors",
+            "busy min/max",
+        )
+    )
+    try:
+        for num_processes in [int(x) for x in args.processes.split(",")]:
+            for max_cs in [int(x) for x in args.max_cs.split(",")]:
+                worker_pool = None
+                if num_processes > 1 and not args.static:
+                    worker_pool = ScraperWorkerPool(
+                        logger,
+                        num_processes,
+                        url=url,
+                        timeout=args.timeout,
+                        max_cs=max_cs,
+                        adaptive_cs=args.adaptive_cs,
+                    )
+                for _ in range(2 if args.keep_alive else 1):
+                    run(conn, logger, pairs, args, num_processes, max_cs, url, worker_pool)
+                if worker_pool is not None:
+                    worker_pool.close()
+    finally:
+        conn.send("stop")
+        server.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Micro-benchmark of the overlap reconciliation of write_to_file.
+
+Compares the per-value parse and per-bar comparison that `write_to_file`
+used to run on the stored bars overlapping the new ones against the array
+operations of `parse_csv_rows`, `diff_old_overlapped_bars` and
+`format_csv_rows`, then times `write_to_file` itself on a stored series
+overlapped by the new bars.
+
+Usage:
+    python -m benchmarks.write_overlap_benchmark
+    python -m benchmarks.write_overlap_benchmark --overlaps 1000 50000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from packages.services.bars import Bars
+from packages.services.write import (
+    diff_old_overlapped_bars,
+    format_csv_rows,
+    parse_csv_rows,
+    write_to_file,
+)
+
+
+def make_bars(num_bars: int, start_ts: int = 1693550020, step: int = 60) -> Bars:
+    ts = start_ts + step * np.arange(num_bars, dtype=np.int64)
+    values = 26000.5 + np.random.default_rng(0).random((num_bars, 5)) * 100
+    return Bars(ts, values)
+
+
+def legacy_path(data: bytes, new_rows: np.ndarray) -> int:
+    old_rows = np.array(
+        [
+            [float(x.strip(" '.?!")) for x in line.decode().strip(" '.?!").split(",")]
+            for line in data.splitlines(keepends=True)
+        ],
+        dtype=np.float64,
+    )
+    diff_rows = []
+    if old_rows.shape == new_rows.shape:
+        diff_rows = old_rows[(old_rows != new_rows).any(axis=1)].tolist()
+    text = "".join(
+        "{}\n".format(",".join([str(v) for v in diff_row])) for diff_row in diff_rows
+    )
+    return len(text)
+
+
+def array_path(data: bytes, new_rows: np.ndarray) -> int:
+    old_rows = parse_csv_rows(data)
+    diff_rows, _ = diff_old_overlapped_bars(old_rows, new_rows)
+    return len(format_csv_rows(diff_rows))
+
+
+def measure(func, repeat: int, *args) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure_write(storage_dir: str, stored: Bars, new: Bars, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        shutil.rmtree(storage_dir, ignore_errors=True)
+        write_to_file(storage_dir, "BENCH:SYM", "1", stored)
+        start = time.perf_counter()
+        write_to_file(storage_dir, "BENCH:SYM", "1", new)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--overlaps", type=int, nargs="+", default=[1000, 5000, 10000, 50000]
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    storage_dir = os.path.join(tempfile.mkdtemp(), "storage")
+    try:
+        for overlap in args.overlaps:
+            stored = make_bars(overlap * 2)
+            new = stored[overlap:]
+            overlapped = new.rows()
+            # one in ten stored bars differs from the new one
+            changed = overlapped.copy()
+            changed[::10, 4] += 1
+            data = format_csv_rows(changed).encode("utf-8")
+
+            print(f"overlap of {overlap} bars ({len(data) / 1e6:.2f} MB)")
+            baseline = None
+            for path_name, func in [("legacy", legacy_path), ("array", array_path)]:
+                duration = measure(func, args.repeat, data, overlapped)
+                baseline = baseline or duration
+                print(
+                    "    {:<14s} {:10.3f} ms {:6.2f}x".format(
+                        path_name, duration * 1e3, baseline / duration
+                    )
+                )
+            duration = measure_write(storage_dir, stored, new, args.repeat)
+            print("    {:<14s} {:10.3f} ms".format("write_to_file", duration * 1e3))
+    finally:
+        shutil.rmtree(os.path.dirname(storage_dir), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Benchmark of the write phase of getBars.
+
+Handles the results of many pairs arriving every `--fetch-ms` (the network,
+a sleep), writing their bars to a fresh storage directory, then again with
+new bars overlapping the stored ones. The bars are written one pair after
+the other with `write_to_file` on the handling thread as the engine used to,
+then with a `WriterPool` of each number of threads, which writes while the
+next results arrive. `--fetch-ms 0` times the writes alone.
+
+Usage:
+    python -m benchmarks.writer_pool_benchmark
+    python -m benchmarks.writer_pool_benchmark --pairs 1000 --bars 5000 --threads 2 8
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from packages.services.bars import Bars
+from packages.services.write import write_to_file
+from packages.services.writer_pool import WriterPool
+
+
+def make_bars(num_bars: int, start_ts: int = 1693550020, step: int = 60) -> Bars:
+    ts = start_ts + step * np.arange(num_bars, dtype=np.int64)
+    values = 26000.5 + np.random.default_rng(0).random((num_bars, 5)) * 100
+    return Bars(ts, values)
+
+
+def sequential_write(
+    storage_dir: str, batch: list[tuple[str, str, Bars]], fetch_time: float
+):
+    for symbol, interval, bars in batch:
+        time.sleep(fetch_time)
+        write_to_file(storage_dir, symbol, interval, bars)
+
+
+def pool_write(
+    storage_dir: str,
+    batch: list[tuple[str, str, Bars]],
+    fetch_time: float,
+    threads: int,
+):
+    pool = WriterPool(storage_dir, threads)
+    for symbol, interval, bars in batch:
+        time.sleep(fetch_time)
+        pool.submit(symbol, interval, bars)
+    pool.close()
+
+
+def measure(func, storage_dir: str, batches: list[list], repeat: int, *args) -> list:
+    """best time of writing each batch in turn to a fresh storage"""
+    best = [float("inf")] * len(batches)
+    for _ in range(repeat):
+        shutil.rmtree(storage_dir, ignore_errors=True)
+        for i, batch in enumerate(batches):
+            start = time.perf_counter()
+            func(storage_dir, batch, *args)
+            best[i] = min(best[i], time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pairs", type=int, default=1000)
+    parser.add_argument("--bars", type=int, default=2000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--fetch-ms", type=float, default=5.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    bars = make_bars(args.bars + 100)
+    pairs = [(f"BENCH:SYM{i}", "1") for i in range(args.pairs)]
+    # new pairs, then the last 100 bars verified and 100 new ones
+    batches = [
+        [(symbol, interval, bars[: args.bars]) for symbol, interval in pairs],
+        [(symbol, interval, bars[-200:]) for symbol, interval in pairs],
+    ]
+
+    storage_dir = os.path.join(tempfile.mkdtemp(), "storage")
+    try:
+        print(
+            "{} pairs of {} bars, then 200 overlapping bars, "
+            "a result every {} ms".format(args.pairs, args.bars, args.fetch_ms)
+        )
+        fetch_time = args.fetch_ms / 1e3
+        baseline = measure(
+            sequential_write, storage_dir, batches, args.repeat, fetch_time
+        )
+        rows = [("sequential", baseline)]
+        for threads in args.threads:
+            rows.append(
+                (
+                    f"pool x{threads}",
+                    measure(
+                        pool_write,
+                        storage_dir,
+                        batches,
+                        args.repeat,
+                        fetch_time,
+                        threads,
+                    ),
+                )
+            )
+        for name, durations in rows:
+            print(
+                "    {:<14s} {}".format(
+                    name,
+                    "  ".join(
+                        "{:9.1f} ms {:5.2f}x".format(duration * 1e3, base / duration)
+                        for duration, base in zip(durations, baseline)
+                    ),
+                )
+            )
+    finally:
+        shutil.rmtree(os.path.dirname(storage_dir), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
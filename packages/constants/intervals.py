@@ -13,5 +13,26 @@ INTERVAL_LIST_DICT = {
     "all": SECONDS_LIST + NON_SECONDS_LIST,
 }
 
+# a pair is crawled again once MIN_INTERVAL_BARS new bars are due, at most
+# MAX_INTERVAL after its last bar, see get_schedule_period
 MIN_INTERVAL_BARS = int(2000)
 MAX_INTERVAL = int(60 * 60 * 24 * 7)
+# the minute intervals are crawled again at most after the time of
+# MIN_INTERVAL_BARS bars of 1 minute (33 h), the cadence they had before
+# interval_to_second read "15" as 15 minutes
+MAX_INTRADAY_INTERVAL = int(60 * MIN_INTERVAL_BARS)
+
+MAX_BARS = int(50000)
+# bars before the last stored one that are fetched again to be verified
+OVERLAP_BARS = int(10)
+# bars needed are rounded up to a bucket, so that a chart session can keep
+# its series (and max_bars) across pairs
+MAX_BARS_BUCKETS = [100, 300, 1000, 3000, 10000, 30000]
+# intervals fetched when the others are resampled from the stored bars
+RESAMPLE_BASE_INTERVALS = ["1S", "1", "1D", "1W", "1M"]
+# types of symbols traded around the clock, their intraday bars are aligned
+# to the day in UTC
+RESAMPLE_SYMBOL_TYPES = ["crypto"]
+# intervals stored in time partitions, a file per UTC day ("D") or month
+# ("M") of bars, so that the writes only touch the newest one
+PARTITION_UNITS = {"1S": "D", "5S": "D", "10S": "M", "15S": "M", "30S": "M"}
@@ -48,3 +48,6 @@ RESPONSE_TYPE = {
         "type": "error",
     },
 }
+
+# fields of the quote sessions: last price, volume and time of the last price
+QUOTE_FIELDS = ["lp", "volume", "lp_time"]
@@ -9,18 +9,41 @@ from datetime import timedelta
 from typing import Literal
 from ..types.task import TaskType
 from ..services.auth import get_auth
+from ..services.bars import Bars
+from ..services.metrics import get_metrics
+from ..services.resample import resample_file
+from ..services.storage_manifest import LAST_TS, StorageManifest
+from ..services.symbol_cache import MAX_BARS_WIDTH, SymbolCapabilityCache
+from ..services.writer_pool import WRITER_THREADS, WriterPool
 from ..utils.load_symbol_list import load_symbol_list
-from ..scrapers.tradingview import get_multiple_bars
-from ..utils.intervals import get_interval_list, interval_to_second
+from ..scrapers.tradingview import (
+    close_worker_connection,
+    get_multiple_bars,
+    iter_parallel_multiple_bars,
+)
+from ..scrapers.account_coordinator import ACCOUNT_RETRY_INTERVAL, AccountCoordinator
+from ..scrapers.quotes import QuoteStreamer
+from ..scrapers.realtime import SeriesStreamer
+from ..scrapers.worker_pool import ScraperWorkerPool
+from ..utils.intervals import (
+    get_interval_list,
+    get_max_bars,
+    get_schedule_period,
+    interval_to_second,
+)
+from ..schedulers.byte_budget import MAX_QUEUE_BYTES, ByteBudget, get_result_size
+from ..schedulers.resample_policy import ResamplePolicy
 from ..schedulers.symbol_pair_scheduler import SymbolPairScheduler
 from ..schedulers.task_scheduler import TaskScheduler, Task
 from ..services.write import (
-    get_last_line_ts,
-    get_symbol_pair_filepath,
+    compact_storage,
+    get_storage_format,
+    scan_storage,
     write_empty_file,
     write_to_file,
 )
-from ..constants.intervals import MIN_INTERVAL_BARS, MAX_INTERVAL
+from ..constants.intervals import OVERLAP_BARS
+from ..constants.websockets import URL
 
 
 class ScraperEngine:
@@ -37,7 +60,27 @@ class ScraperEngine:
         limit_per_load: int = 1000,
         num_process: int = 1,
         max_cs: int = 10,
+        url: str = URL,
+        timeout: int = 3,
+        keep_alive: bool = True,
+        stream: bool = False,
+        adaptive_cs: bool = False,
+        overlap_bars: int = OVERLAP_BARS,
+        realtime_pair_list: list[tuple[str, str]] | None = None,
+        resample_policy: ResamplePolicy | None = None,
+        quote_filepath: str | None = None,
+        account_list: list[tuple[str, str]] | None = None,
+        metrics_filepath: str | None = None,
+        max_queue_bytes: int = MAX_QUEUE_BYTES,
+        write_threads: int = WRITER_THREADS,
     ):
+        if account_list is not None and (stream or num_process > 1):
+            # the accounts fetch on one event loop and return all the results
+            # at once, without the worker processes and the write budget
+            raise ValueError(
+                "account_list can not be used with stream or num_process > 1"
+            )
+
         # basic settings
         self.engine_name = engine_name
         self.username = username
@@ -50,12 +93,94 @@ class ScraperEngine:
         self.num_processes = num_process
         self.max_cs = max_cs
         self.cache_dir = cache_dir
+        self.url = url
+        # seconds without a message from the server before the fetch of a
+        # batch backs off, used by every way of fetching the pairs
+        self.timeout = timeout
+
+        # connections are kept open across getBars calls, in this process
+        # when num_process is 1, otherwise in the long-lived worker processes
+        # that share the pairs of each call
+        self.keep_alive = keep_alive
+        self.worker_pool: ScraperWorkerPool | None = None
+
+        # handle (write and reschedule) each pair as soon as it is received,
+        # the fetching pauses while max_queue_bytes of bars wait to be written
+        self.stream = stream
+        self.write_budget = ByteBudget(max_queue_bytes) if stream else None
+
+        # grow and shrink the chart sessions in flight per connection with
+        # the health of the connection, max_cs is the upper bound; off by
+        # default, it starts at half of max_cs and its latency target does
+        # not allow for the time a large history takes to arrive
+        self.adaptive_cs = adaptive_cs
+
+        # only the bars since the last stored one are requested, plus
+        # overlap_bars stored bars to verify them
+        self.overlap_bars = overlap_bars
+
+        # pairs kept subscribed and written on each update instead of polled,
+        # the updates win over the resampling, a streamed pair is never
+        # resampled so that two writers do not race on its file
+        self.realtime_pair_list = realtime_pair_list or []
+        self.realtime_pair_set = set(self.realtime_pair_list)
+        self.streamer: SeriesStreamer | None = None
+
+        # latest quotes of all loaded symbols, appended to quote_filepath
+        self.quote_filepath = quote_filepath
+        self.quote_streamer: QuoteStreamer | None = None
+
+        # what is known about each symbol, so that pairs without bars to
+        # get are not requested every cycle
+        self.symbol_cache = SymbolCapabilityCache(cache_dir)
+        self.symbol_cache.load()
+
+        # intervals built from the stored bars of a fetched base interval,
+        # by (symbol, base interval)
+        self.resample_policy = resample_policy
+        self.resample_interval_dict: dict[tuple[str, str], set[str]] = {}
+
+        # frames, parse time and latency of the scraper, merged from the
+        # worker processes, exported to metrics_filepath after each getBars
+        self.metrics = get_metrics()
+        self.metrics_filepath = metrics_filepath
 
         # logger
         self.logger = logging.getLogger(self.engine_name)
         self.logger.setLevel(logging.INFO)
         self.updateLogger()
 
+        # what is stored for each pair, so that scheduling opens no data file
+        self.manifest = StorageManifest(cache_dir, get_storage_format())
+        self.load_manifest()
+
+        # the bars are written on write_threads threads while the next results
+        # are handled, 0 writes them on this thread
+        self.writer_pool: WriterPool | None = None
+        if write_threads > 0:
+            self.writer_pool = WriterPool(
+                storage_dir,
+                write_threads,
+                manifest=self.manifest,
+                budget=self.write_budget,
+                on_written=self._on_written,
+                logger=self.logger,
+            )
+
+        # pairs shared between several accounts instead of username, fetched
+        # concurrently in this process, one batch of results per call
+        self.account_coordinator: AccountCoordinator | None = None
+        if account_list is not None:
+            self.account_coordinator = AccountCoordinator(
+                logger=self.logger,
+                account_list=account_list,
+                cache_dir=self.cache_dir,
+                url=self.url,
+                timeout=self.timeout,
+                max_cs=self.max_cs,
+                adaptive_cs=self.adaptive_cs,
+            )
+
         # auth
         self.auth = None
         self.auth_token = None
@@ -97,6 +222,10 @@ class ScraperEngine:
         """
         update auth token
         """
+        if self.account_coordinator is not None:
+            self.account_coordinator.update_auth()
+            self._set_auth_token(self.account_coordinator.auth_token)
+            return
         self.logger.info("Getting auth token...")
         self.auth = get_auth(
             username=self.username,
@@ -108,9 +237,23 @@ class ScraperEngine:
         else:
             auth_token = self.auth["auth_token"]
             is_pro = self.auth["is_pro"]
-            self.auth_token = auth_token
+            self._set_auth_token(auth_token)
             self.logger.info(f"Got auth token: {auth_token}, is pro: {is_pro}")
 
+    def _set_auth_token(self, auth_token: str | None):
+        self.auth_token = auth_token
+        if auth_token is None:
+            return
+        if self.streamer is not None:
+            self.streamer.auth_token = auth_token
+        if self.quote_streamer is not None:
+            self.quote_streamer.auth_token = auth_token
+
+    def _is_pro(self) -> bool:
+        if self.account_coordinator is not None:
+            return self.account_coordinator.is_pro
+        return self.auth is not None and self.auth["is_pro"]
+
     def load_symbol_list(self) -> list[str]:
         self.logger.info("Loading symbol list...")
         raw_symbol_list = load_symbol_list(
@@ -137,13 +280,23 @@ class ScraperEngine:
         Ready: add it to the ready queue.
         Wait:  add it to the waiting queue.
         """
-        filepath = get_symbol_pair_filepath(self.storage_dir, symbol, interval)
         symbol_pair = (symbol, interval)
-        period = interval_to_second(interval) * MIN_INTERVAL_BARS
-        delta = datetime.timedelta(seconds=min(period, MAX_INTERVAL))
+        if symbol_pair in self.realtime_pair_set:
+            # kept up to date by the streamer
+            return
+        has_bars = self.manifest.get_last_ts(symbol, interval) is not None
+        skip = self.symbol_cache.skip_reason(symbol, interval, has_bars=has_bars)
+        if skip is not None:
+            # known to be useless, try again once the reason expires
+            delta = datetime.timedelta(seconds=skip[1])
+            self.symbol_pair_scheduler.wait(symbol_pair, delta)
+            return
+        period = get_schedule_period(interval)
+        delta = datetime.timedelta(seconds=period)
 
-        if os.path.exists(filepath):
-            last_timestamp = get_last_line_ts(filepath)
+        entry = self.manifest.get(symbol, interval)
+        if entry is not None:
+            last_timestamp = entry[LAST_TS]
 
             if last_timestamp is not None and last_timestamp <= time.time() - period:
                 # Last crawled too old
@@ -155,11 +308,31 @@ class ScraperEngine:
             # If file not exists, assume that we haven't crawled this pair
             self.symbol_pair_scheduler.ready(symbol_pair)
 
+    def load_manifest(self):
+        """Load the storage manifest, rebuild it from the files if it is
+        missing or stale"""
+        if self.manifest.load():
+            self.logger.info(
+                f"Loaded the storage manifest of {len(self.manifest)} pairs"
+            )
+            return
+        self.logger.info("Storage manifest missing or stale, scanning the storage...")
+        start = time.perf_counter()
+        self.manifest.rebuild(scan_storage(self.storage_dir, self.num_processes))
+        self.manifest.save()
+        self.logger.info(
+            "Rebuilt the storage manifest of {} pairs in {:.2f} sec".format(
+                len(self.manifest), time.perf_counter() - start
+            )
+        )
+
     def load_symbol_pair_list(self):
         symbol_list = self.load_symbol_list()
+        if self.quote_streamer is not None:
+            self.quote_streamer.add_symbols(symbol_list)
         for symbol in symbol_list:
             interval_list = []
-            is_pro = self.auth is not None and self.auth["is_pro"]
+            is_pro = self._is_pro()
             if self.symbol_data[symbol]["type"] == "economic":
                 # economic data is only available for pro users
                 if not is_pro:
@@ -172,8 +345,201 @@ class ScraperEngine:
 
             # schedule symbol pair
             for interval in interval_list:
+                if (
+                    self.resample_policy is not None
+                    and (symbol, interval) not in self.realtime_pair_set  # noqa: W503
+                ):
+                    base_interval = self.resample_policy.get_base_interval(
+                        self.symbol_data[symbol]["type"], interval, interval_list
+                    )
+                    if base_interval is not None:
+                        # resampled each time base_interval is written
+                        self.resample_interval_dict.setdefault(
+                            (symbol, base_interval), set()
+                        ).add(interval)
+                        continue
                 self._schedule_symbol_pair(symbol, interval)
 
+    def _get_worker_pool(self) -> ScraperWorkerPool | None:
+        if not self.keep_alive or self.num_processes == 1:
+            return None
+        if self.worker_pool is None:
+            self.worker_pool = ScraperWorkerPool(
+                logger=self.logger,
+                num_processes=self.num_processes,
+                url=self.url,
+                timeout=self.timeout,
+                max_cs=self.max_cs,
+                adaptive_cs=self.adaptive_cs,
+                budget=self.write_budget,
+            )
+        return self.worker_pool
+
+    def start_realtime(self):
+        if len(self.realtime_pair_list) == 0 or self.streamer is not None:
+            return
+        self.logger.info(f"Streaming {len(self.realtime_pair_list)} pairs")
+        self.streamer = SeriesStreamer(
+            logger=self.logger,
+            storage_dir=self.storage_dir,
+            auth_token=self.auth_token or "",
+            symbol_pair_list=self.realtime_pair_list,
+            url=self.url,
+            overlap_bars=self.overlap_bars,
+            manifest=self.manifest,
+            on_written=self._on_streamed,
+        )
+        self.streamer.start()
+
+    def start_quotes(self):
+        if self.quote_filepath is None or self.quote_streamer is not None:
+            return
+        self.logger.info(f"Streaming quotes to {self.quote_filepath}")
+        self.quote_streamer = QuoteStreamer(
+            logger=self.logger,
+            auth_token=self.auth_token or "",
+            symbol_list=list(self.symbol_data),
+            filepath=self.quote_filepath,
+            url=self.url,
+        )
+        self.quote_streamer.start()
+
+    def close(self):
+        if self.streamer is not None:
+            self.streamer.stop()
+            self.streamer = None
+        if self.quote_streamer is not None:
+            self.quote_streamer.stop()
+            self.quote_streamer = None
+        if self.account_coordinator is not None:
+            self.account_coordinator.close()
+        if self.worker_pool is not None:
+            self.worker_pool.close()
+            self.worker_pool = None
+        if self.writer_pool is not None:
+            self.writer_pool.close()
+            self.writer_pool = None
+        close_worker_connection()
+        self.symbol_cache.save()
+        self.manifest.save()
+
+    def _handle_result(
+        self, i: int, num_pairs: int, result: tuple[str, str, Bars | None, dict]
+    ) -> bool:
+        """Write the bars of a pair and schedule its next crawl
+
+        Returns:
+            bool: the bars were handed to the writer pool, which releases
+                them from the write budget once written
+        """
+        submitted = False
+        symbol, interval, bars, detail = result
+        if bars is None or len(bars) == 0:
+            # bars is empty, create empty file
+            message = f"Got no bars for pair ({symbol},{interval})"
+            write_empty_file(self.storage_dir, symbol, interval, manifest=self.manifest)
+            self.manifest.set_outcome(symbol, interval, "empty")
+            self.logger.warning(f"{i+1}/{num_pairs} {message}")
+        elif bars.width > MAX_BARS_WIDTH:
+            # Bars are invalid
+            # > 5 means that the bars are not in the form of [timestamp, open, high, low, close, volume]
+            message = f"Not supported pair ({symbol},{interval})\nbars[0]: {bars.rows()[0].tolist()}"
+            self.manifest.set_outcome(symbol, interval, "unsupported")
+            self.logger.warning(f"{i+1}/{num_pairs} {message}")
+        else:
+            # bars are valid write bars to file
+            message = "Got {:6d} bars for pair: ({:>20s},{:>5s}), range: ({:d}, {:d})".format(
+                len(bars),
+                symbol,
+                interval,
+                int(bars.ts[0]),
+                int(bars.ts[-1]),
+            )
+            self.logger.info(f"{i+1}/{num_pairs} {message}")
+            if self.writer_pool is not None:
+                self.writer_pool.submit(symbol, interval, bars)
+                submitted = True
+            else:
+                res = write_to_file(
+                    self.storage_dir, symbol, interval, bars, manifest=self.manifest
+                )
+                self._on_written(symbol, interval, res)
+
+        self.pair_set.add((symbol, interval))
+        width = None if bars is None or len(bars) == 0 else bars.width
+        self.symbol_cache.update(symbol, interval, width, detail)
+        has_bars = self.manifest.get_last_ts(symbol, interval) is not None
+        skip = self.symbol_cache.skip_reason(symbol, interval, has_bars=has_bars)
+        if skip is not None:
+            self.logger.warning(f"Skipping pair ({symbol},{interval}): {skip[0]}")
+            self.symbol_pair_scheduler.wait(
+                (symbol, interval), datetime.timedelta(seconds=skip[1])
+            )
+        elif bars is None or len(bars) == 0:
+            self.symbol_pair_scheduler.error((symbol, interval))
+        else:
+            delta = datetime.timedelta(seconds=get_schedule_period(interval))
+            self.symbol_pair_scheduler.wait((symbol, interval), delta)
+        return submitted
+
+    def _on_written(self, symbol: str, interval: str, res: dict):
+        """Record the outcome of the write of a pair and resample it, on the
+        writer threads when there is a writer pool"""
+        self.manifest.set_outcome(symbol, interval, res["status"])
+        if res["status"] != "ok":
+            self.logger.error(f"Write file: {json.dumps(res, indent=4, default=str)}")
+        self._resample(symbol, interval)
+
+    def _on_streamed(self, symbol: str, interval: str, res: dict):
+        """Resample the intervals derived from a streamed pair, on the
+        streaming thread, as every update is written"""
+        self._resample(symbol, interval, verbose=False)
+
+    def _resample(self, symbol: str, base_interval: str, verbose: bool = True):
+        """Update the intervals resampled from the bars of base_interval
+
+        Args:
+            symbol (str)
+            base_interval (str)
+            verbose (bool, optional): log the resampled bars. Defaults to True.
+        """
+        interval_set = self.resample_interval_dict.get((symbol, base_interval), set())
+        for interval in sorted(interval_set, key=interval_to_second):
+            try:
+                res = resample_file(
+                    self.storage_dir,
+                    symbol,
+                    base_interval,
+                    interval,
+                    manifest=self.manifest,
+                )
+            except Exception as e:
+                self.logger.error(f"Resample ({symbol},{interval}) error: {e}")
+                self.logger.error(f"Traceback: {traceback.format_exc()}")
+                continue
+            if not verbose:
+                continue
+            self.logger.info(
+                "Resampled {:3d} bars for pair: ({:>20s},{:>5s}) from {}".format(
+                    res["appended"] + res["replaced"], symbol, interval, base_interval
+                )
+            )
+
+    def _get_max_bars_dict(
+        self, symbol_pair_list: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], int]:
+        """Get the bars to request for each pair from its last stored bar"""
+        now = time.time()
+        max_bars_dict = {}
+        for symbol_pair in symbol_pair_list:
+            max_bars_dict[symbol_pair] = get_max_bars(
+                symbol_pair[1],
+                self.manifest.get_last_ts(*symbol_pair),
+                now,
+                overlap_bars=self.overlap_bars,
+            )
+        return max_bars_dict
+
     def getBars(self):
         # get scheduled symbol pair list
         symbol_pair_list = self.symbol_pair_scheduler.get(1000)
@@ -192,58 +558,85 @@ class ScraperEngine:
             )
         )
 
-        # get bars for each pair in symbol pair list
-        results = get_multiple_bars(
-            logger=self.logger,
-            auth_token=self.auth_token or "",
-            symbol_pair_list=symbol_pair_list,
-            num_processes=self.num_processes,
-            max_cs=self.max_cs,
-        )
+        # get bars for each pair in symbol pair list, in stream mode each
+        # result is handled as soon as it arrives, while the rest are fetched
+        if self.write_budget is not None:
+            self.write_budget.reset()
+        max_bars_dict = self._get_max_bars_dict(symbol_pair_list)
+        worker_pool = self._get_worker_pool()
+        if self.account_coordinator is not None:
+            pro_symbol_set = {
+                symbol
+                for symbol, _ in symbol_pair_list
+                if self.symbol_data.get(symbol, {}).get("type") == "economic"
+            }
+            results, unassigned = self.account_coordinator.get_bars(
+                symbol_pair_list, max_bars_dict, pro_symbol_set
+            )
+            # no account can fetch them for now
+            delta = datetime.timedelta(seconds=ACCOUNT_RETRY_INTERVAL)
+            for symbol_pair in unassigned:
+                self.symbol_pair_scheduler.wait(symbol_pair, delta)
+            unassigned_set = set(unassigned)
+            symbol_pair_list = [
+                symbol_pair
+                for symbol_pair in symbol_pair_list
+                if symbol_pair not in unassigned_set
+            ]
+        elif worker_pool is not None:
+            results = worker_pool.iter_bars(
+                self.auth_token or "", symbol_pair_list, max_bars_dict
+            )
+            if not self.stream:
+                results = list(results)
+        elif self.stream:
+            results = iter_parallel_multiple_bars(
+                logger=self.logger,
+                auth_token=self.auth_token or "",
+                symbol_pair_list=symbol_pair_list,
+                timeout=self.timeout,
+                num_processes=self.num_processes,
+                max_cs=self.max_cs,
+                url=self.url,
+                keep_alive=self.keep_alive,
+                adaptive_cs=self.adaptive_cs,
+                max_bars_dict=max_bars_dict,
+                budget=self.write_budget,
+            )
+        else:
+            results = get_multiple_bars(
+                logger=self.logger,
+                auth_token=self.auth_token or "",
+                symbol_pair_list=symbol_pair_list,
+                timeout=self.timeout,
+                num_processes=self.num_processes,
+                max_cs=self.max_cs,
+                url=self.url,
+                keep_alive=self.keep_alive,
+                adaptive_cs=self.adaptive_cs,
+                max_bars_dict=max_bars_dict,
+            )
 
         symbol_pair_set = set(symbol_pair_list)
 
         # iterate each pair in results
+        result_cnt = 0
         for i, result in enumerate(results):
-            symbol, interval, bars, _ = result
+            symbol, interval, _, _ = result
             if (symbol, interval) in symbol_pair_set:
                 symbol_pair_set.remove((symbol, interval))
             else:
                 assert False, "Got duplicate result or result not in requested"
 
-            if bars is None or len(bars) == 0:
-                # bars is empty, create empty file
-                message = f"Got no bars for pair ({symbol},{interval})"
-                write_empty_file(self.storage_dir, symbol, interval)
-                self.logger.warning(f"{i+1}/{len(results)} {message}")
-            elif "v" not in bars[0] or len(bars[0]["v"]) > 6:
-                # Bars are invalid
-                # > 6 means that the bars are not in the form of [timestamp, open, high, low, close, volume]
-                message = (
-                    f"Not supported pair ({symbol},{interval})\nbars[0]: {bars[0]}"
-                )
-                self.logger.warning(f"{i+1}/{len(results)} {message}")
-            else:
-                # bars are valid write bars to file
-                message = "Got {:6d} bars for pair: ({:>20s},{:>5s}), range: ({:d}, {:d})".format(
-                    len(bars),
-                    symbol,
-                    interval,
-                    int(bars[0]["v"][0]),
-                    int(bars[-1]["v"][0]),
-                )
-                res = write_to_file(self.storage_dir, symbol, interval, bars)
-                self.logger.info(f"{i+1}/{len(results)} {message}")
-                if res["status"] != "ok":
-                    self.logger.error(f"Write file: {json.dumps(res, indent=4)}")
-
-            self.pair_set.add((symbol, interval))
-            if bars is None or len(bars) == 0:
-                self.symbol_pair_scheduler.error((symbol, interval))
-            else:
-                period = interval_to_second(interval) * MIN_INTERVAL_BARS
-                delta = datetime.timedelta(seconds=min(period, MAX_INTERVAL))
-                self.symbol_pair_scheduler.wait((symbol, interval), delta)
+            start = time.perf_counter()
+            submitted = self._handle_result(i, len(symbol_pair_list), result)
+            self.metrics.record_handle(time.perf_counter() - start)
+            if self.write_budget is not None and not submitted:
+                self.write_budget.remove(get_result_size(result))
+            result_cnt += 1
+
+        if self.writer_pool is not None:
+            self._flush_writer_pool()
 
         duration = time.time() - self.start_time
         num_pairs = len(self.pair_set)
@@ -253,9 +646,70 @@ class ScraperEngine:
 
         if len(symbol_pair_set) > 0:
             self.logger.warning(
-                f"Got {len(results)} results, expected {len(symbol_pair_list)}"
+                f"Got {result_cnt} results, expected {len(symbol_pair_list)}"
             )
             self.symbol_pair_scheduler.extendReady(list(symbol_pair_set))
+        self.symbol_cache.save()
+        self.manifest.save()
+        # the metrics add up over the life of the process, as exported
+        self.logger.info(f"Since start: {self.metrics.summary()}")
+        self._export_metrics()
+        if self.write_budget is not None:
+            stats = self.write_queue_stats
+            self.logger.info(
+                "Write queue peak: {} results, {:.1f} MB, stalled {:.2f} sec".format(
+                    stats["peak_items"], stats["peak_bytes"] / 1e6, stats["stall_time"]
+                )
+            )
+
+    def _flush_writer_pool(self):
+        """Wait for the bars still to be written, log the write times"""
+        start = time.perf_counter()
+        self.writer_pool.flush()
+        stats = self.writer_pool.stats()
+        self.logger.info(
+            "Wrote {} bars in {} writes, {:.2f} sec, waited {:.2f} sec, "
+            "write p50 {} p99 {} sec".format(
+                stats["bars"],
+                stats["writes"],
+                stats["write_time"],
+                time.perf_counter() - start,
+                stats["p50"],
+                stats["p99"],
+            )
+        )
+        self.metrics.write_time.merge(self.writer_pool.write_time)
+        self.writer_pool.reset_stats()
+
+    @property
+    def write_queue_stats(self) -> dict | None:
+        """Depth and bytes of the results waiting to be written, their peaks
+        and the time the fetching stalled for them, in the last getBars"""
+        if self.write_budget is None:
+            return None
+        return self.write_budget.stats()
+
+    def _export_metrics(self):
+        if self.metrics_filepath is None:
+            return
+        os.makedirs(os.path.dirname(self.metrics_filepath) or ".", exist_ok=True)
+        tmp_filepath = self.metrics_filepath + ".tmp"
+        with open(tmp_filepath, "w") as f:
+            f.write(self.metrics.to_prometheus())
+        os.replace(tmp_filepath, self.metrics_filepath)
+
+    def compactStorage(self):
+        """Archive the partitions that are no longer written"""
+        start = time.perf_counter()
+        stats = compact_storage(self.storage_dir, self.num_processes)
+        self.logger.info(
+            "Archived {} partitions, {:.1f} MB to {:.1f} MB in {:.2f} sec".format(
+                stats["partitions"],
+                stats["bytes_before"] / 1e6,
+                stats["bytes_after"] / 1e6,
+                time.perf_counter() - start,
+            )
+        )
 
     def handleTask(self, task: Task):
         task_name = task.task_name
@@ -273,11 +727,15 @@ class ScraperEngine:
                     self.task_scheduler.push(Task("task_get_bars"), ready=True)
             case TaskType.UPDATE_LOGGER:
                 self.updateLogger()
+            case TaskType.COMPACT_STORAGE:
+                self.compactStorage()
         if task.task_repeat:
             self.task_scheduler.push(task, ready=False)
 
     def start(self):
         current_process = multiprocessing.current_process()
+        self.start_realtime()
+        self.start_quotes()
 
         self.task_scheduler.push(
             Task(TaskType.LOAD_SYMBOL.value, timedelta(minutes=1), True),
@@ -295,6 +753,10 @@ class ScraperEngine:
             Task(TaskType.UPDATE_AUTH.value, timedelta(hours=1), True),
             ready=False,
         )
+        self.task_scheduler.push(
+            Task(TaskType.COMPACT_STORAGE.value, timedelta(days=1), True),
+            ready=False,
+        )
 
         while current_process.exitcode is None:
             if self.task_scheduler.readySize() > 0:
@@ -308,3 +770,5 @@ class ScraperEngine:
             except Exception as e:
                 self.logger.error(f"Exception: {e}")
                 self.logger.error(f"Traceback: {traceback.format_exc()}")
+
+        self.close()
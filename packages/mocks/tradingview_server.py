@@ -0,0 +1,504 @@
+"""Local stand-in for the tradingview websocket server.
+
+Speaks the subset of the protocol described in `packages/constants/format.py`
+that the scrapers use, with configurable latency, bar counts and error rates,
+so throughput can be measured without hitting the live service.
+
+Usage:
+    python -m packages.mocks.tradingview_server --port 8765 --latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+
+from websockets import server
+from websockets.exceptions import ConnectionClosed
+
+from ..services.frame_decoder import FrameDecoder
+from ..services.websockets import create_message, prepend_header
+from ..types.frame import FrameType
+from ..utils.intervals import interval_to_second
+
+SERIES_ERROR_TYPES = ["series_error", "unsupported_resolution"]
+
+
+class MockChartSession:
+    def __init__(self, cs_id: str, connection_state: dict):
+        self.cs_id = cs_id
+        self.connection_state = connection_state
+        self.symbols: dict[str, dict] = {}
+        self.max_bars = 0
+        self.queue: asyncio.Queue = asyncio.Queue()
+        # sends the du updates of the current series
+        self.update_task: asyncio.Task | None = None
+
+    def stop_updates(self):
+        if self.update_task is not None:
+            self.update_task.cancel()
+            self.update_task = None
+
+
+class MockQuoteSession:
+    def __init__(self, qs_id: str):
+        self.qs_id = qs_id
+        self.fields: list[str] = []
+        # last price of each symbol
+        self.prices: dict[str, float] = {}
+        # sends the qsd updates of the symbols
+        self.update_task: asyncio.Task | None = None
+
+    def stop_updates(self):
+        if self.update_task is not None:
+            self.update_task.cancel()
+            self.update_task = None
+
+
+class MockTradingViewServer:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        interval_latency: dict[str, float] | None = None,
+        bar_count: int = 5000,
+        error_rate: float = 0.0,
+        error_types: list[str] = SERIES_ERROR_TYPES,
+        symbol_error_rate: float = 0.0,
+        no_bars_rate: float = 0.0,
+        data_frequency: str = "1S",
+        heartbeat_interval: float = 10.0,
+        close_after_series: int = 0,
+        update_interval: float = 0.0,
+        compression: str | None = "deflate",
+        seed: int = 0,
+    ):
+        """
+        Args:
+            latency (float): seconds before answering each request
+            latency_jitter (float): extra uniform random latency in seconds
+            interval_latency (dict[str, float] | None): latency of the series
+                of the given intervals, instead of latency
+            bar_count (int): bars available for every series, capped by max_bars
+            error_rate (float): ratio of series answered with one of error_types
+            error_types (list[str]): error responses to pick from
+            symbol_error_rate (float): ratio of symbols failing to resolve
+            no_bars_rate (float): ratio of series completed without bars
+            data_frequency (str): data_frequency reported in symbol_resolved
+            heartbeat_interval (float): seconds between heartbeats
+            close_after_series (int): drop each connection after answering this
+                many series, 0 to never drop
+            update_interval (float): seconds between the du updates of the
+                last bar of every completed series, and the qsd updates of the
+                quotes, 0 to send none
+            compression (str | None): websocket compression, "deflate" or None
+            seed (int): seed of the error injection
+        """
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.interval_latency = interval_latency or {}
+        self.bar_count = bar_count
+        self.error_rate = error_rate
+        self.error_types = error_types
+        self.symbol_error_rate = symbol_error_rate
+        self.no_bars_rate = no_bars_rate
+        self.data_frequency = data_frequency
+        self.heartbeat_interval = heartbeat_interval
+        self.close_after_series = close_after_series
+        self.update_interval = update_interval
+        self.compression = compression
+        self.random = random.Random(seed)
+
+        self.server = None
+        self.port = None
+        self.stats = {
+            "connections": 0,
+            "bytes_sent": 0,
+            "bytes_received": 0,
+            "heartbeats_echoed": 0,
+            "messages_received": {},
+            "messages_sent": {},
+        }
+        # serialized bars by (interval, count), shared by all symbols
+        self._bars_cache: dict[tuple[str, int], str] = {}
+
+    def _count(self, key: str, m: str):
+        self.stats[key][m] = self.stats[key].get(m, 0) + 1
+
+    async def _send(self, ws, func: str, params: list):
+        message = create_message(func, params)
+        self.stats["bytes_sent"] += len(message)
+        self._count("messages_sent", func)
+        await ws.send(message)
+
+    async def _send_raw(self, ws, func: str, message: str):
+        self.stats["bytes_sent"] += len(message)
+        self._count("messages_sent", func)
+        await ws.send(message)
+
+    async def _sleep(self, interval: str | None = None):
+        delay = self.interval_latency.get(interval, self.latency)
+        if self.latency_jitter > 0:
+            delay += self.random.uniform(0, self.latency_jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _bars_json(self, interval: str, count: int) -> str:
+        key = (interval, count)
+        if key not in self._bars_cache:
+            step = interval_to_second(interval)
+            end_ts = int(time.time()) // step * step
+            start_ts = end_ts - (count - 1) * step
+            price = 100.0
+            bars = []
+            for i in range(count):
+                open_ = price
+                price = round(price * (1 + self.random.uniform(-0.001, 0.001)), 4)
+                bars.append(
+                    {
+                        "i": i,
+                        "v": [
+                            float(start_ts + i * step),
+                            open_,
+                            max(open_, price),
+                            min(open_, price),
+                            price,
+                            float(self.random.randint(1, 10000)),
+                        ],
+                    }
+                )
+            self._bars_cache[key] = json.dumps(bars, separators=(",", ":"))
+        return self._bars_cache[key]
+
+    def _timescale_update(self, cs_id: str, sds_id: str, interval: str, count: int):
+        # splice the cached bars into the message instead of re-serializing them
+        placeholder = '"__bars__"'
+        content = json.dumps(
+            {
+                "m": "timescale_update",
+                "p": [
+                    cs_id,
+                    {
+                        sds_id: {
+                            "node": "mock",
+                            "s": "__bars__",
+                            "ns": {"d": "", "indexes": []},
+                            "t": "s1",
+                            "lbs": {"bar_close_time": int(time.time())},
+                        }
+                    },
+                    {"index": count - 1, "zoffset": 0, "changes": [], "marks": []},
+                ],
+            },
+            separators=(",", ":"),
+        )
+        content = content.replace(placeholder, self._bars_json(interval, count), 1)
+        return prepend_header(content)
+
+    async def _send_updates(self, ws, cs_id: str, sds_id: str, s_id: str, interval: str):
+        # the bar of the current period is updated, a new one starts with
+        # the next period
+        step = interval_to_second(interval)
+        price = 100.0
+        while True:
+            await asyncio.sleep(self.update_interval)
+            ts = int(time.time()) // step * step
+            price = round(price * (1 + self.random.uniform(-0.001, 0.001)), 4)
+            bar = {"i": 0, "v": [float(ts), 100.0, 101.0, 99.0, price, 1.0]}
+            await self._send(ws, "du", [cs_id, {sds_id: {"s": [bar], "t": s_id}}])
+
+    async def _handle_series(self, ws, session: MockChartSession, p: list, m: str):
+        cs_id, sds_id, s_id, sym_id, interval = p[:5]
+        session.stop_updates()
+        if m == "create_series":
+            session.max_bars = int(p[5])
+        symbol = session.symbols.get(sym_id)
+
+        await self._sleep(interval)
+        await self._send(ws, "series_loading", [cs_id, sds_id, s_id])
+        if symbol is None or symbol["error"]:
+            await self._send(ws, "series_error", [cs_id, sds_id, s_id, "invalid symbol"])
+            return
+
+        roll = self.random.random()
+        if roll < self.error_rate:
+            error_type = self.random.choice(self.error_types)
+            await self._send(ws, error_type, [cs_id, sds_id, s_id, "mock error"])
+            return
+
+        count = min(self.bar_count, session.max_bars)
+        if roll < self.error_rate + self.no_bars_rate or count <= 0:
+            await self._send(
+                ws, "timescale_update", [cs_id, {sds_id: {"s": [], "t": s_id}}, {}]
+            )
+        else:
+            message = self._timescale_update(cs_id, sds_id, interval, count)
+            await self._send_raw(ws, "timescale_update", message)
+        await self._send(
+            ws,
+            "series_completed",
+            [cs_id, sds_id, "streaming", s_id, {"rt_update_period": 1}],
+        )
+        if self.update_interval > 0:
+            session.update_task = asyncio.create_task(
+                self._send_updates(ws, cs_id, sds_id, s_id, interval)
+            )
+        session.connection_state["series_cnt"] += 1
+        series_cnt = session.connection_state["series_cnt"]
+        if self.close_after_series > 0 and series_cnt >= self.close_after_series:
+            await ws.close()
+
+    def _quote_values(self, session: MockQuoteSession, symbol: str) -> dict:
+        price = session.prices[symbol] * (1 + self.random.uniform(-0.001, 0.001))
+        price = session.prices[symbol] = round(price, 4)
+        values = {
+            "lp": price,
+            "volume": float(self.random.randint(1, 10000)),
+            "lp_time": int(time.time()),
+        }
+        return {field: values[field] for field in session.fields if field in values}
+
+    async def _send_quote_updates(self, ws, session: MockQuoteSession):
+        # only the fields that changed are sent
+        while True:
+            await asyncio.sleep(self.update_interval)
+            for symbol in list(session.prices):
+                values = self._quote_values(session, symbol)
+                values.pop("volume", None)
+                await self._send(
+                    ws, "qsd", [session.qs_id, {"n": symbol, "s": "ok", "v": values}]
+                )
+
+    async def _handle_quote_symbols(self, ws, session: MockQuoteSession, p: list):
+        qs_id, symbol_list = p[0], p[1:]
+        await self._sleep()
+        for symbol in symbol_list:
+            if self.random.random() < self.symbol_error_rate:
+                await self._send(
+                    ws, "qsd", [qs_id, {"n": symbol, "s": "error", "v": {}}]
+                )
+                continue
+            session.prices[symbol] = 100.0
+            values = self._quote_values(session, symbol)
+            await self._send(ws, "qsd", [qs_id, {"n": symbol, "s": "ok", "v": values}])
+            await self._send(ws, "quote_completed", [qs_id, symbol])
+        if self.update_interval > 0 and session.update_task is None:
+            session.update_task = asyncio.create_task(
+                self._send_quote_updates(ws, session)
+            )
+
+    async def _handle_resolve(self, ws, session: MockChartSession, p: list):
+        cs_id, sym_id, content = p[:3]
+        symbol_info = json.loads(content[1:]) if content.startswith("=") else {}
+        name = symbol_info.get("symbol", content)
+        error = self.random.random() < self.symbol_error_rate
+        session.symbols[sym_id] = {"name": name, "error": error}
+
+        await self._sleep()
+        if error:
+            await self._send(ws, "symbol_error", [cs_id, sym_id, "invalid symbol"])
+        else:
+            await self._send(
+                ws,
+                "symbol_resolved",
+                [
+                    cs_id,
+                    sym_id,
+                    {"name": name, "data_frequency": self.data_frequency},
+                ],
+            )
+
+    async def _session_worker(self, ws, session: MockChartSession):
+        # requests of a chart session are answered in order
+        while True:
+            m, p = await session.queue.get()
+            if m == "resolve_symbol":
+                await self._handle_resolve(ws, session, p)
+            elif m in ["create_series", "modify_series"]:
+                await self._handle_series(ws, session, p, m)
+            elif m == "remove_series":
+                # a modified series without a create_series gets no bars
+                session.max_bars = 0
+                session.stop_updates()
+
+    async def _heartbeat(self, ws):
+        idx = 0
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            idx += 1
+            await self._send_raw(ws, "heartbeat", prepend_header(f"~h~{idx}"))
+
+    async def handler(self, ws):
+        self.stats["connections"] += 1
+        connection_state = {"series_cnt": 0}
+        decoder = FrameDecoder()
+        sessions: dict[str, MockChartSession] = {}
+        quote_sessions: dict[str, MockQuoteSession] = {}
+        tasks: list[asyncio.Task] = [asyncio.create_task(self._heartbeat(ws))]
+
+        await self._send_raw(
+            ws,
+            "session",
+            prepend_header(json.dumps({"session_id": "mock", "timestamp": time.time()})),
+        )
+        try:
+            async for message in ws:
+                self.stats["bytes_received"] += len(message)
+                for frame in decoder.feed(message):
+                    if frame.frame_type == FrameType.HEARTBEAT:
+                        self.stats["heartbeats_echoed"] += 1
+                        continue
+                    m = frame.m
+                    p = frame.data["p"]
+                    self._count("messages_received", m)
+
+                    if m == "chart_create_session":
+                        sessions[p[0]] = MockChartSession(p[0], connection_state)
+                        tasks.append(
+                            asyncio.create_task(
+                                self._session_worker(ws, sessions[p[0]])
+                            )
+                        )
+                    elif m in [
+                        "resolve_symbol",
+                        "create_series",
+                        "modify_series",
+                        "remove_series",
+                    ]:
+                        if p[0] not in sessions:
+                            await self._send(ws, "protocol_error", [p[0], "no session"])
+                            continue
+                        sessions[p[0]].queue.put_nowait((m, p))
+                    elif m == "chart_delete_session":
+                        if p[0] in sessions:
+                            sessions.pop(p[0]).stop_updates()
+                    elif m == "quote_create_session":
+                        quote_sessions[p[0]] = MockQuoteSession(p[0])
+                    elif m in [
+                        "quote_set_fields",
+                        "quote_add_symbols",
+                        "quote_remove_symbols",
+                    ]:
+                        if p[0] not in quote_sessions:
+                            await self._send(ws, "protocol_error", [p[0], "no session"])
+                            continue
+                        quote_session = quote_sessions[p[0]]
+                        if m == "quote_set_fields":
+                            quote_session.fields = p[1:]
+                        elif m == "quote_add_symbols":
+                            tasks.append(
+                                asyncio.create_task(
+                                    self._handle_quote_symbols(ws, quote_session, p)
+                                )
+                            )
+                        else:
+                            for symbol in p[1:]:
+                                quote_session.prices.pop(symbol, None)
+                    elif m == "quote_delete_session":
+                        if p[0] in quote_sessions:
+                            quote_sessions.pop(p[0]).stop_updates()
+                    elif m not in [
+                        "set_auth_token",
+                        "set_locale",
+                        "switch_timezone",
+                    ]:
+                        await self._send(ws, "protocol_error", [m, "unknown method"])
+        except ConnectionClosed:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            for session in sessions.values():
+                session.stop_updates()
+            for quote_session in quote_sessions.values():
+                quote_session.stop_updates()
+
+    async def _process_request(self, path: str, request_headers):
+        # the scrapers send the browser headers of HEADER on top of the ones
+        # set by websockets, tradingview tolerates the duplicates, so do we
+        for name in set(request_headers.keys()):
+            values = request_headers.get_all(name)
+            if len(values) > 1:
+                del request_headers[name]
+                request_headers[name] = values[-1]
+        return None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving and return the websocket url"""
+        self.server = await server.serve(
+            self.handler,
+            host,
+            port,
+            max_size=None,
+            compression=self.compression,
+            process_request=self._process_request,
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+        return f"ws://{host}:{self.port}"
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+
+def start_mock_server_thread(
+    host: str = "127.0.0.1", port: int = 0, **kwargs
+) -> tuple[MockTradingViewServer, str, threading.Event]:
+    """Run a mock server on its own event loop in a daemon thread
+
+    Returns:
+        tuple: the server, its url and an event that stops it when set
+    """
+    mock = MockTradingViewServer(**kwargs)
+    started = threading.Event()
+    stop_event = threading.Event()
+    result = {}
+
+    async def run():
+        result["url"] = await mock.start(host, port)
+        started.set()
+        while not stop_event.is_set():
+            await asyncio.sleep(0.05)
+        await mock.stop()
+
+    threading.Thread(target=asyncio.run, args=(run(),), daemon=True).start()
+    started.wait()
+    return mock, result["url"], stop_event
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--bar-count", type=int, default=5000)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--symbol-error-rate", type=float, default=0.0)
+    parser.add_argument("--no-bars-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    mock = MockTradingViewServer(
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        bar_count=args.bar_count,
+        error_rate=args.error_rate,
+        symbol_error_rate=args.symbol_error_rate,
+        no_bars_rate=args.no_bars_rate,
+    )
+
+    async def run():
+        url = await mock.start(args.host, args.port)
+        logging.info(f"Mock tradingview server listening on {url}")
+        await asyncio.Future()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
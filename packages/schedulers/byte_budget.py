@@ -0,0 +1,75 @@
+import multiprocessing as mp
+from ..services.bars import Bars
+
+# bytes of received bars not handled yet before no new pairs are requested
+MAX_QUEUE_BYTES = 256 * 1024 * 1024
+
+# slots of the shared state
+_BYTES, _ITEMS, _PEAK_BYTES, _PEAK_ITEMS, _STALL_TIME = range(5)
+
+
+def get_result_size(result: tuple[str, str, Bars | None, dict]) -> int:
+    """bytes of the bars of a (symbol, interval, bars, detail) result"""
+    bars = result[2]
+    return 0 if bars is None else bars.nbytes
+
+
+class ByteBudget(object):
+    """Bytes of the results received and not handled yet, shared by the
+    producers (BarsBatch, in this process or in workers) and the consumer
+    writing the results.
+
+    A producer adds each result it receives, the consumer removes it once it
+    is written. While the budget is full the producers send no new request,
+    so a slow disk pauses the network instead of growing memory. The series
+    in flight still arrive, so the budget is exceeded by at most the results
+    of the chart sessions in flight.
+
+    The state lives in shared memory, the budget must be given to worker
+    processes when they are created (Process args or pool initializer).
+    """
+
+    def __init__(self, max_bytes: int = MAX_QUEUE_BYTES):
+        """
+        Args:
+            max_bytes (int, optional): Defaults to MAX_QUEUE_BYTES.
+        """
+        self.max_bytes = max_bytes
+        self.state = mp.Array("d", 5)
+
+    def add(self, size: int):
+        with self.state.get_lock():
+            self.state[_BYTES] += size
+            self.state[_ITEMS] += 1
+            self.state[_PEAK_BYTES] = max(self.state[_PEAK_BYTES], self.state[_BYTES])
+            self.state[_PEAK_ITEMS] = max(self.state[_PEAK_ITEMS], self.state[_ITEMS])
+
+    def remove(self, size: int):
+        with self.state.get_lock():
+            self.state[_BYTES] = max(self.state[_BYTES] - size, 0)
+            self.state[_ITEMS] = max(self.state[_ITEMS] - 1, 0)
+
+    def is_full(self) -> bool:
+        return self.state[_BYTES] >= self.max_bytes
+
+    def add_stall(self, duration: float):
+        """Count seconds a producer waited for room"""
+        with self.state.get_lock():
+            self.state[_STALL_TIME] += duration
+
+    def reset(self):
+        """Forget everything, when no result is in flight"""
+        with self.state.get_lock():
+            for i in range(len(self.state)):
+                self.state[i] = 0
+
+    def stats(self) -> dict:
+        """Results and bytes queued, their peaks and the stall time"""
+        with self.state.get_lock():
+            return {
+                "items": int(self.state[_ITEMS]),
+                "bytes": int(self.state[_BYTES]),
+                "peak_items": int(self.state[_PEAK_ITEMS]),
+                "peak_bytes": int(self.state[_PEAK_BYTES]),
+                "stall_time": self.state[_STALL_TIME],
+            }
@@ -0,0 +1,87 @@
+import time
+
+
+class ConcurrencyController(object):
+    """AIMD window of the chart sessions in flight on one connection.
+
+    The window grows by `increase` per window of series answered within
+    `latency_target` (additive increase), and is multiplied by `decrease` on
+    a timeout, a lost connection, `critical_error` or `protocol_error`
+    (multiplicative decrease). Backoffs closer than `backoff_interval` count
+    once, as one overload usually fails every series in flight.
+    """
+
+    def __init__(
+        self,
+        max_window: int = 10,
+        min_window: int = 1,
+        initial_window: int | None = None,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        latency_target: float = 1.5,
+        backoff_interval: float = 1.0,
+    ):
+        """
+        Args:
+            max_window (int, optional): Defaults to 10.
+            min_window (int, optional): Defaults to 1.
+            initial_window (int | None, optional): half of max_window if None.
+                Defaults to None.
+            increase (float, optional): growth per window of healthy series.
+                Defaults to 1.0.
+            decrease (float, optional): factor applied on backoff.
+                Defaults to 0.5.
+            latency_target (float, optional): seconds, slower series do not
+                grow the window. Defaults to 1.5.
+            backoff_interval (float, optional): seconds. Defaults to 1.0.
+        """
+        self.max_window = max_window
+        self.min_window = min(min_window, max_window)
+        if initial_window is None:
+            initial_window = max_window // 2
+        self.window = float(min(max(initial_window, self.min_window), max_window))
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.backoff_interval = backoff_interval
+
+        self.last_backoff = float("-inf")
+        self.increase_cnt = 0
+        self.backoff_cnt = 0
+
+    @property
+    def limit(self) -> int:
+        """number of chart sessions allowed in flight"""
+        return int(self.window)
+
+    def success(self, latency: float) -> bool:
+        """Record a series answered after latency seconds
+
+        Returns:
+            bool: whether the limit changed
+        """
+        if latency > self.latency_target:
+            return False
+        limit = self.limit
+        self.window = min(self.max_window, self.window + self.increase / self.window)
+        if self.limit != limit:
+            self.increase_cnt += 1
+            return True
+        return False
+
+    def backoff(self) -> bool:
+        """Record a sign of overload
+
+        Returns:
+            bool: whether the limit changed
+        """
+        now = time.monotonic()
+        if now - self.last_backoff < self.backoff_interval:
+            return False
+        self.last_backoff = now
+        limit = self.limit
+        self.window = max(self.min_window, self.window * self.decrease)
+        if self.limit != limit:
+            self.backoff_cnt += 1
+            return True
+        return False
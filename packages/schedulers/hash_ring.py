@@ -0,0 +1,59 @@
+import bisect
+import hashlib
+
+
+def _hash(key: str) -> int:
+    # stable across processes and runs, unlike hash()
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class ConsistentHashRing(object):
+    """Consistent hashing of keys onto nodes.
+
+    Each node is placed `replicas` times on the ring and a key belongs to the
+    first node after it, so adding or removing a node only moves the keys of
+    that node.
+    """
+
+    def __init__(self, nodes: list[str] = [], replicas: int = 100):
+        self.replicas = replicas
+        self.node_set: set[str] = set()
+        self.points: list[int] = []
+        self.point_nodes: list[str] = []
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self) -> int:
+        return len(self.node_set)
+
+    def __contains__(self, node: str) -> bool:
+        return node in self.node_set
+
+    def add(self, node: str):
+        if node in self.node_set:
+            return
+        self.node_set.add(node)
+        for i in range(self.replicas):
+            point = _hash(f"{node}#{i}")
+            idx = bisect.bisect(self.points, point)
+            self.points.insert(idx, point)
+            self.point_nodes.insert(idx, node)
+
+    def remove(self, node: str):
+        if node not in self.node_set:
+            return
+        self.node_set.remove(node)
+        kept = [
+            (point, point_node)
+            for point, point_node in zip(self.points, self.point_nodes)
+            if point_node != node
+        ]
+        self.points = [point for point, _ in kept]
+        self.point_nodes = [point_node for _, point_node in kept]
+
+    def get(self, key: str) -> str | None:
+        """Get the node of key, None if the ring is empty"""
+        if len(self.points) == 0:
+            return None
+        idx = bisect.bisect(self.points, _hash(key)) % len(self.points)
+        return self.point_nodes[idx]
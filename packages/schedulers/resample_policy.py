@@ -0,0 +1,58 @@
+from ..services.resample import is_derivable
+from ..utils.intervals import interval_to_second
+from ..constants.intervals import RESAMPLE_BASE_INTERVALS, RESAMPLE_SYMBOL_TYPES
+
+
+class ResamplePolicy(object):
+    """Which intervals of a symbol are fetched and which are resampled.
+
+    Only the base intervals are fetched, an interval derivable from one of
+    the base intervals scheduled for the symbol is built from its stored bars
+    instead, see resample.is_derivable. The bars of an exchange with sessions
+    are aligned to the session rather than to the day, so only the symbols of
+    symbol_type_list are resampled. A base interval only has as much history
+    as its max_bars, so resampled intervals have a shorter history than
+    fetched ones.
+    """
+
+    def __init__(
+        self,
+        base_interval_list: list[str] = RESAMPLE_BASE_INTERVALS,
+        symbol_type_list: list[str] = RESAMPLE_SYMBOL_TYPES,
+    ):
+        """
+        Args:
+            base_interval_list (list[str], optional): intervals always fetched.
+                Defaults to RESAMPLE_BASE_INTERVALS.
+            symbol_type_list (list[str], optional): types of the symbols to
+                resample. Defaults to RESAMPLE_SYMBOL_TYPES.
+        """
+        self.base_interval_list = base_interval_list
+        self.symbol_type_list = symbol_type_list
+
+    def get_base_interval(
+        self, symbol_type: str, interval: str, interval_list: list[str]
+    ) -> str | None:
+        """Get the interval to resample interval from
+
+        Args:
+            symbol_type (str): type of the symbol
+            interval (str): interval to get
+            interval_list (list[str]): intervals scheduled for the symbol
+
+        Returns:
+            str | None: the coarsest base interval of interval_list that
+                interval is derivable from, None if interval must be fetched
+        """
+        if symbol_type not in self.symbol_type_list:
+            return None
+        if interval in self.base_interval_list:
+            return None
+        base_interval_list = [
+            base_interval
+            for base_interval in self.base_interval_list
+            if base_interval in interval_list and is_derivable(base_interval, interval)
+        ]
+        if len(base_interval_list) == 0:
+            return None
+        return max(base_interval_list, key=interval_to_second)
@@ -0,0 +1,85 @@
+from collections import deque
+import multiprocessing as mp
+import multiprocessing.queues
+import multiprocessing.sharedctypes
+
+from ..utils.symbol_pairs import group_by_symbol
+
+
+class SharedPairSource:
+    """Hand out the pairs of a task queue shared by all workers
+
+    The queue holds the pairs of one symbol per item, so that a worker
+    resolves the symbol once for all its intervals. The items left are
+    counted in a shared value, an item is reserved by decrementing it before
+    it is taken from the queue, so a worker never blocks on an empty queue
+    and knows when the batch has no pairs left.
+
+    Each item is tagged with the id of its batch, the ids increase from one
+    batch to the next. A source drops the items of an earlier batch, left
+    over by a consumer that stopped early, and hands back the items of a
+    later batch, which a source still running for an earlier one must not
+    fetch.
+    """
+
+    def __init__(
+        self,
+        task_queue: mp.queues.Queue,
+        remaining: mp.sharedctypes.Synchronized,
+        batch_id: int = 0,
+    ):
+        self.task_queue = task_queue
+        self.remaining = remaining
+        self.batch_id = batch_id
+        self.exhausted = False
+        # pairs of the last symbol taken
+        self.symbol_pairs: deque[tuple[str, str]] = deque()
+
+    def put(self, symbol_pair_list: list[tuple[str, str]]) -> int:
+        """Add the pairs of this batch to the queue, grouped by symbol
+
+        Returns:
+            int: number of items added
+        """
+        groups = group_by_symbol(symbol_pair_list)
+        with self.remaining.get_lock():
+            self.remaining.value += len(groups)
+        for group in groups.values():
+            self.task_queue.put((self.batch_id, group))
+        return len(groups)
+
+    def _take(self) -> tuple[int, list[tuple[str, str]]] | None:
+        with self.remaining.get_lock():
+            if self.remaining.value <= 0:
+                return None
+            self.remaining.value -= 1
+        return self.task_queue.get()
+
+    def __call__(self) -> tuple[str, str] | None:
+        if len(self.symbol_pairs) > 0:
+            return self.symbol_pairs.popleft()
+        while not self.exhausted:
+            item = self._take()
+            if item is None:
+                self.exhausted = True
+            elif item[0] == self.batch_id:
+                self.symbol_pairs.extend(item[1])
+                return self.symbol_pairs.popleft()
+            elif item[0] > self.batch_id:
+                # the batch of this source is over
+                with self.remaining.get_lock():
+                    self.remaining.value += 1
+                self.task_queue.put(item)
+                self.exhausted = True
+        return None
+
+    def drain(self) -> int:
+        """Take the pairs left so that they are not fetched by a later batch
+
+        Returns:
+            int: number of pairs dropped
+        """
+        cnt = 0
+        while self() is not None:
+            cnt += 1
+        return cnt
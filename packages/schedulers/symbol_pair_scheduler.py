@@ -1,5 +1,6 @@
 import datetime
 import heapq
+from ..utils.symbol_pairs import group_by_symbol
 
 
 class SymbolPairScheduler(object):
@@ -36,7 +37,12 @@ class SymbolPairScheduler(object):
         symbol_pair_list = self.ready_symbol_pair_list[:limit]
         self.ready_symbol_pair_list = self.ready_symbol_pair_list[limit:]
 
-        return symbol_pair_list
+        # the intervals of a symbol are fetched together on a chart session
+        return [
+            symbol_pair
+            for group in group_by_symbol(symbol_pair_list).values()
+            for symbol_pair in group
+        ]
 
     def readySize(self) -> int:
         self.__update__()
@@ -0,0 +1,278 @@
+import time
+import asyncio
+import logging
+import traceback
+
+from .tradingview import BarsBatch
+from ..schedulers.hash_ring import ConsistentHashRing
+from ..services.auth import get_auth
+from ..services.bars import Bars
+from ..services.connection import TradingViewConnection
+from ..utils.symbol_pairs import group_by_symbol
+from ..constants.intervals import SECONDS_LIST
+from ..constants.websockets import URL
+
+# seconds before a failed account is given pairs again
+ACCOUNT_RETRY_INTERVAL = 60 * 10
+
+
+class Account:
+    def __init__(self, username: str, password: str | None):
+        self.username = username
+        self.password = password
+        self.auth_token: str | None = None
+        self.is_pro = False
+        self.failed_at: float | None = None
+        self.connection: TradingViewConnection | None = None
+
+
+class AccountCoordinator:
+    """Share the pairs of one engine between several accounts.
+
+    The symbols are spread over the accounts by consistent hashing, so that
+    every pair has exactly one account and all intervals of a symbol share
+    it. Pairs only available to pro users (seconds intervals, pro_symbol_set)
+    are spread over the pro accounts. An account failing to authenticate or
+    to fetch its pairs is taken off the rings, its pairs move to the other
+    accounts, the ones of the failed fetch are fetched again by them, and it
+    is given pairs again after retry_interval.
+
+    Each account keeps its own connection, the accounts fetch concurrently
+    on the event loop of the coordinator.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        account_list: list[tuple[str, str]],
+        cache_dir: str,
+        url: str = URL,
+        locale: list = ["en", "US"],
+        timeout: int = 3,
+        max_cs: int = 10,
+        adaptive_cs: bool = False,
+        retry_interval: float = ACCOUNT_RETRY_INTERVAL,
+    ):
+        """
+        Args:
+            logger (logging.Logger)
+            account_list (list[tuple[str, str]]): (username, password) of the
+                accounts
+            cache_dir (str): directory of the cached auth data
+            url (str, optional): websocket url. Defaults to URL.
+            locale (list, optional): Defaults to ["en", "US"].
+            timeout (int, optional): Defaults to 3.
+            max_cs (int, optional): chart sessions per account. Defaults to 10.
+            adaptive_cs (bool, optional): Defaults to False.
+            retry_interval (float, optional): seconds. Defaults to
+                ACCOUNT_RETRY_INTERVAL.
+        """
+        self.logger = logger
+        self.cache_dir = cache_dir
+        self.url = url
+        self.locale = locale
+        self.timeout = timeout
+        self.max_cs = max_cs
+        self.adaptive_cs = adaptive_cs
+        self.retry_interval = retry_interval
+
+        self.accounts: dict[str, Account] = {
+            username: Account(username, password) for username, password in account_list
+        }
+        # accounts given pairs, all of them and the pro ones
+        self.ring = ConsistentHashRing()
+        self.pro_ring = ConsistentHashRing()
+        self.loop = asyncio.new_event_loop()
+
+    @property
+    def is_pro(self) -> bool:
+        """whether a pro account is available"""
+        return len(self.pro_ring) > 0
+
+    @property
+    def auth_token(self) -> str | None:
+        """token of an available account, pro if possible"""
+        for ring in [self.pro_ring, self.ring]:
+            for username in sorted(ring.node_set):
+                return self.accounts[username].auth_token
+        return None
+
+    def set_auth(self, username: str, auth_token: str, is_pro: bool):
+        account = self.accounts[username]
+        account.auth_token = auth_token
+        account.is_pro = is_pro
+        account.failed_at = None
+        self.ring.add(username)
+        if is_pro:
+            self.pro_ring.add(username)
+        else:
+            self.pro_ring.remove(username)
+
+    def update_auth(self):
+        for account in self.accounts.values():
+            auth = get_auth(
+                username=account.username,
+                password=account.password,
+                cache_dir=self.cache_dir,
+            )
+            if auth is None:
+                self.mark_failed(account.username, "failed to get auth")
+            else:
+                self.set_auth(account.username, auth["auth_token"], auth["is_pro"])
+        self.logger.info(
+            "Accounts: {}/{}, pro: {}".format(
+                len(self.ring), len(self.accounts), len(self.pro_ring)
+            )
+        )
+
+    def mark_failed(self, username: str, reason: str):
+        account = self.accounts[username]
+        if account.failed_at is None:
+            self.logger.warning(f"Account {username} failed ({reason}), rebalancing")
+        account.failed_at = time.time()
+        self.ring.remove(username)
+        self.pro_ring.remove(username)
+
+    def _revive(self):
+        now = time.time()
+        for account in self.accounts.values():
+            if (
+                account.failed_at is not None
+                and account.auth_token is not None  # noqa: W503
+                and now - account.failed_at >= self.retry_interval  # noqa: W503
+            ):
+                self.logger.info(f"Account {account.username} is given pairs again")
+                self.set_auth(account.username, account.auth_token, account.is_pro)
+
+    def assign(
+        self,
+        symbol_pair_list: list[tuple[str, str]],
+        pro_symbol_set: set[str] = set(),
+    ) -> tuple[dict[str, list[tuple[str, str]]], list[tuple[str, str]]]:
+        """Get the account of each pair
+
+        Args:
+            symbol_pair_list (list[tuple[str, str]])
+            pro_symbol_set (set[str], optional): symbols only available to
+                pro users. Defaults to set().
+
+        Returns:
+            tuple: pairs of each account, grouped by symbol, and the pairs
+                without an available account
+        """
+        shard_dict: dict[str, list[tuple[str, str]]] = {}
+        unassigned = []
+        for symbol, group in group_by_symbol(symbol_pair_list).items():
+            for symbol_pair in group:
+                pro_only = symbol in pro_symbol_set or symbol_pair[1] in SECONDS_LIST
+                username = (self.pro_ring if pro_only else self.ring).get(symbol)
+                if username is None:
+                    unassigned.append(symbol_pair)
+                else:
+                    shard_dict.setdefault(username, []).append(symbol_pair)
+        return shard_dict, unassigned
+
+    async def _fetch(
+        self,
+        username: str,
+        symbol_pair_list: list[tuple[str, str]],
+        max_bars_dict: dict[tuple[str, str], int] | None,
+        results: list[tuple[str, str, Bars | None, dict]],
+    ) -> bool:
+        """Fetch the pairs of an account
+
+        Returns:
+            bool: whether every pair got a result
+        """
+        account = self.accounts[username]
+        if account.connection is None:
+            account.connection = TradingViewConnection(
+                self.logger, self.url, self.locale
+            )
+        batch = BarsBatch(
+            logger=self.logger,
+            connection=account.connection,
+            auth_token=account.auth_token or "",
+            symbol_pair_list=symbol_pair_list,
+            timeout=self.timeout,
+            max_cs=self.max_cs,
+            adaptive_cs=self.adaptive_cs,
+            max_bars_dict=max_bars_dict,
+        )
+        try:
+            async for result in batch.iter_results():
+                results.append(result)
+        except Exception as e:
+            self.logger.error(f"Account {username} error: {e}")
+            self.logger.error(f"Traceback: {traceback.format_exc()}")
+            await account.connection.close()
+            return False
+        return batch.is_done()
+
+    async def _fetch_all(
+        self,
+        symbol_pair_list: list[tuple[str, str]],
+        max_bars_dict: dict[tuple[str, str], int] | None,
+        pro_symbol_set: set[str],
+    ) -> tuple[list[tuple[str, str, Bars | None, dict]], list[tuple[str, str]]]:
+        results: list[tuple[str, str, Bars | None, dict]] = []
+        missing = symbol_pair_list
+        unassigned_list: list[tuple[str, str]] = []
+        # the pairs of the accounts failing in a round are fetched by the
+        # others in the next one
+        while len(missing) > 0:
+            shard_dict, unassigned = self.assign(missing, pro_symbol_set)
+            unassigned_list.extend(unassigned)
+            if len(shard_dict) == 0:
+                break
+            shard_results: dict[str, list] = {username: [] for username in shard_dict}
+            done_list = await asyncio.gather(
+                *[
+                    self._fetch(username, shard, max_bars_dict, shard_results[username])
+                    for username, shard in shard_dict.items()
+                ]
+            )
+            missing = []
+            for (username, shard), done in zip(shard_dict.items(), done_list):
+                results.extend(shard_results[username])
+                if not done:
+                    self.mark_failed(username, "fetch failed")
+                    received = {(r[0], r[1]) for r in shard_results[username]}
+                    missing.extend(pair for pair in shard if pair not in received)
+        return results, unassigned_list
+
+    def get_bars(
+        self,
+        symbol_pair_list: list[tuple[str, str]],
+        max_bars_dict: dict[tuple[str, str], int] | None = None,
+        pro_symbol_set: set[str] = set(),
+    ) -> tuple[list[tuple[str, str, Bars | None, dict]], list[tuple[str, str]]]:
+        """Fetch the pairs with the accounts they are assigned to
+
+        Args:
+            symbol_pair_list (list[tuple[str, str]])
+            max_bars_dict (dict, optional): bars to request per pair.
+                Defaults to None.
+            pro_symbol_set (set[str], optional): symbols only available to
+                pro users. Defaults to set().
+
+        Returns:
+            tuple: the results (symbol, interval, bars, detail), and the pairs
+                that no available account could fetch
+        """
+        self._revive()
+        results, unassigned = self.loop.run_until_complete(
+            self._fetch_all(symbol_pair_list, max_bars_dict, pro_symbol_set)
+        )
+        if len(unassigned) > 0:
+            self.logger.warning(f"No account available for {len(unassigned)} pairs")
+        return results, unassigned
+
+    def close(self):
+        if self.loop.is_closed():
+            return
+        for account in self.accounts.values():
+            if account.connection is not None:
+                self.loop.run_until_complete(account.connection.close())
+                account.connection = None
+        self.loop.close()
@@ -0,0 +1,285 @@
+import io
+import time
+import asyncio
+import logging
+import threading
+import traceback
+
+from websockets.exceptions import ConnectionClosed
+from ..services.connection import TradingViewConnection
+from ..services.frame_decoder import FrameDecoder
+from ..services.quote_table import QuoteTable
+from ..services.websockets import create_message, generate_quote_session_id
+from ..types.frame import FrameType
+from ..constants.websockets import QUOTE_FIELDS, URL
+from .realtime import LOG_PERIOD, RECONNECT_DELAY
+
+# symbols subscribed on one quote session
+MAX_QUOTE_SYMBOLS = 1000
+# symbols per quote_add_symbols message
+QUOTE_ADD_CHUNK = 100
+
+
+class QuoteStreamer:
+    """Keep the quotes of many symbols subscribed on a few quote sessions.
+
+    The symbols are added up to max_symbols per quote session, all on one
+    connection, and every `qsd` is merged into a QuoteTable. The row of each
+    updated symbol is appended to filepath (update_ts, symbol, fields), so
+    the file holds every snapshot and the table the latest one. If the
+    connection is lost, it is reopened and the symbols are subscribed again.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        auth_token: str,
+        symbol_list: list[str],
+        filepath: str | None = None,
+        locale: list = ["en", "US"],
+        url: str = URL,
+        fields: list[str] = QUOTE_FIELDS,
+        max_symbols: int = MAX_QUOTE_SYMBOLS,
+    ):
+        """
+        Args:
+            logger (logging.Logger)
+            auth_token (str): may be replaced while running, it is re-sent
+            symbol_list (list[str]): symbols to subscribe
+            filepath (str | None, optional): file the updated rows are
+                appended to, None to only keep the table. Defaults to None.
+            locale (list, optional): Defaults to ["en", "US"].
+            url (str, optional): websocket url. Defaults to URL.
+            fields (list[str], optional): Defaults to QUOTE_FIELDS.
+            max_symbols (int, optional): symbols per quote session.
+                Defaults to MAX_QUOTE_SYMBOLS.
+        """
+        self.logger = logger
+        self.auth_token = auth_token
+        self.filepath = filepath
+        self.fields = fields
+        self.max_symbols = max_symbols
+        self.connection = TradingViewConnection(logger, url, locale)
+        self.table = QuoteTable(fields)
+        self.table.add_symbols(symbol_list)
+
+        # symbols subscribed on each quote session of the connection
+        self.qs_symbols: dict[str, list[str]] = {}
+        # symbols whose first snapshot is complete
+        self.completed_set: set[str] = set()
+
+        # symbols added by other threads, subscribed by the streamer
+        self.lock = threading.Lock()
+        self.new_symbol_list: list[str] = []
+
+        self.stop_event = threading.Event()
+        self.thread: threading.Thread | None = None
+        self.update_cnt = 0
+
+    def add_symbols(self, symbol_list: list[str]):
+        """Subscribe more symbols, may be called from another thread"""
+        with self.lock:
+            self.new_symbol_list.extend(symbol_list)
+
+    async def _create_quote_session(self) -> str:
+        qs_id = generate_quote_session_id()
+        await self.connection.ws.send(create_message("quote_create_session", [qs_id]))
+        await self.connection.ws.send(
+            create_message("quote_set_fields", [qs_id] + self.fields)
+        )
+        self.qs_symbols[qs_id] = []
+        return qs_id
+
+    async def _subscribe(self, symbol_list: list[str]):
+        qs_id = next(reversed(self.qs_symbols), None)
+        start = 0
+        while start < len(symbol_list):
+            if qs_id is None or len(self.qs_symbols[qs_id]) >= self.max_symbols:
+                qs_id = await self._create_quote_session()
+            room = self.max_symbols - len(self.qs_symbols[qs_id])
+            chunk = symbol_list[start : start + min(room, QUOTE_ADD_CHUNK)]
+            await self.connection.ws.send(
+                create_message("quote_add_symbols", [qs_id] + chunk)
+            )
+            self.qs_symbols[qs_id].extend(chunk)
+            start += len(chunk)
+
+    async def _connect(self):
+        await self.connection.connect(self.auth_token)
+        self.qs_symbols = {}
+        self.completed_set = set()
+        await self._subscribe(self.table.symbol_list)
+        self.logger.info(
+            f"Subscribed to {len(self.table)} quotes on {len(self.qs_symbols)} sessions"
+        )
+
+    async def _add_new_symbols(self):
+        with self.lock:
+            new_symbol_list = self.new_symbol_list
+            self.new_symbol_list = []
+        new_symbol_list = self.table.add_symbols(new_symbol_list)
+        if len(new_symbol_list) > 0:
+            await self._subscribe(new_symbol_list)
+            self.logger.info(f"Subscribed to {len(new_symbol_list)} more quotes")
+
+    async def _maintain(self, file: io.TextIOBase | None):
+        if file is not None:
+            file.flush()
+        if (
+            self.connection.is_open
+            and self.connection.auth_token != self.auth_token  # noqa: W503
+        ):
+            # re-send the rotated auth token
+            await self.connection.ensure(self.auth_token, 0)
+        await self._add_new_symbols()
+
+    def _handle_frame(self, frame, now: float, file: io.TextIOBase | None):
+        m = frame.m
+        if m == "quote_completed":
+            self.completed_set.add(frame.data["p"][1])
+            return
+        if m != "qsd":
+            return
+        quote = frame.data["p"][1]
+        status = quote.get("s", "ok")
+        idx = self.table.update(quote.get("n", ""), status, quote.get("v", {}), now)
+        if idx is None:
+            return
+        if status == "error":
+            # no quote_completed follows
+            self.completed_set.add(quote["n"])
+            self.logger.warning(f"Quote error of {quote['n']}: {quote.get('v')}")
+            return
+        self.update_cnt += 1
+        if file is not None:
+            file.write(self.table.row_csv(idx))
+
+    async def _receive(self, file: io.TextIOBase | None, timeout: float | None = None):
+        """Handle the messages until stop, or until every symbol completed its
+        first snapshot or nothing was received for timeout seconds
+
+        Args:
+            file (io.TextIOBase | None): file the updated rows are appended to
+            timeout (float | None, optional): None to stream until stop.
+                Defaults to None.
+        """
+        decoder = FrameDecoder()
+        last_log = time.monotonic()
+        last_maintain = time.monotonic()
+        while not self.stop_event.is_set():
+            if timeout is not None and len(self.completed_set) >= len(self.table):
+                break
+            try:
+                message = await asyncio.wait_for(
+                    self.connection.ws.recv(), timeout=timeout or 1
+                )
+            except asyncio.TimeoutError:
+                if timeout is not None:
+                    self.logger.warning(
+                        f"Timeout, {len(self.completed_set)}/{len(self.table)} quotes"
+                    )
+                    break
+                last_maintain = time.monotonic()
+                await self._maintain(file)
+                continue
+
+            try:
+                frames = decoder.feed(message)
+            except ValueError as e:
+                self.logger.error(f"message {message[:100]!r} decode error: {e}")
+                continue
+            for error in decoder.errors:
+                self.logger.warning(f"message decode error: {error}")
+            now = time.time()
+            for frame in frames:
+                if frame.frame_type == FrameType.HEARTBEAT:
+                    await self.connection.ws.send(frame.encode())
+                elif frame.frame_type == FrameType.MESSAGE:
+                    self._handle_frame(frame, now, file)
+
+            if timeout is None and time.monotonic() - last_maintain >= 1:
+                last_maintain = time.monotonic()
+                await self._maintain(file)
+            if time.monotonic() - last_log >= LOG_PERIOD:
+                last_log = time.monotonic()
+                self.logger.info(f"Applied {self.update_cnt} quote updates")
+
+    async def snapshot(self, timeout: float = 3) -> QuoteTable:
+        """Get the latest quote of every symbol once
+
+        Args:
+            timeout (float, optional): seconds without a message before
+                giving up on the missing quotes. Defaults to 3.
+
+        Returns:
+            QuoteTable
+        """
+        try:
+            await self._connect()
+            if self.filepath is None:
+                await self._receive(None, timeout)
+            else:
+                with open(self.filepath, "a") as f:
+                    await self._receive(f, timeout)
+        finally:
+            await self.connection.close()
+        return self.table
+
+    async def run(self):
+        while not self.stop_event.is_set():
+            try:
+                await self._connect()
+                if self.filepath is None:
+                    await self._receive(None)
+                else:
+                    with open(self.filepath, "a") as f:
+                        await self._receive(f)
+            except (ConnectionClosed, OSError) as e:
+                self.logger.warning(f"Quote connection lost: {e!r}")
+            except Exception as e:
+                self.logger.error(f"Quote error: {e}")
+                self.logger.error(f"Traceback: {traceback.format_exc()}")
+            await self.connection.close()
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.stop_event.wait, RECONNECT_DELAY
+            )
+
+    def start(self):
+        """Run in a background thread until stop"""
+        self.stop_event.clear()
+        self.thread = threading.Thread(
+            target=asyncio.run, args=(self.run(),), daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
+def get_quotes(
+    logger: logging.Logger,
+    auth_token: str,
+    symbol_list: list[str],
+    filepath: str | None = None,
+    locale: list = ["en", "US"],
+    url: str = URL,
+    timeout: float = 3,
+) -> QuoteTable:
+    """Get the latest quote of many symbols on quote sessions, without a
+    chart series per symbol
+
+    Returns:
+        QuoteTable
+    """
+    streamer = QuoteStreamer(
+        logger=logger,
+        auth_token=auth_token,
+        symbol_list=symbol_list,
+        filepath=filepath,
+        locale=locale,
+        url=url,
+    )
+    return asyncio.run(streamer.snapshot(timeout))
@@ -0,0 +1,219 @@
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from typing import Callable
+
+from websockets.exceptions import ConnectionClosed
+from ..services.bars import Bars
+from ..services.connection import TradingViewConnection
+from ..services.frame_decoder import FrameDecoder
+from ..services.storage_manifest import StorageManifest
+from ..services.write import (
+    get_last_line_ts,
+    get_symbol_pair_filepath,
+    update_last_bars,
+    write_to_file,
+)
+from ..types.frame import FrameType
+from ..utils.intervals import get_max_bars
+from ..constants.intervals import OVERLAP_BARS
+from ..constants.websockets import URL, RESPONSE_TYPE
+
+# seconds between two reconnections
+RECONNECT_DELAY = 5
+# seconds between two logs of the number of updates
+LOG_PERIOD = 60
+
+
+class SeriesStreamer:
+    """Keep series subscribed and write their `du` updates as they arrive.
+
+    Every pair gets a chart session of its own on one connection. The first
+    timescale_update of a series catches up from the last stored bar and is
+    written with write_to_file, then each `du` replaces the last stored bar
+    or appends a new one. If the connection is lost, it is reopened and the
+    series are subscribed again, which fills the gap.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        storage_dir: str,
+        auth_token: str,
+        symbol_pair_list: list[tuple[str, str]],
+        locale: list = ["en", "US"],
+        url: str = URL,
+        overlap_bars: int = OVERLAP_BARS,
+        manifest: StorageManifest | None = None,
+        on_written: Callable[[str, str, dict], None] | None = None,
+    ):
+        """
+        Args:
+            logger (logging.Logger)
+            storage_dir (str)
+            auth_token (str): may be replaced while running, it is re-sent
+            symbol_pair_list (list[tuple[str, str]]): pairs to keep subscribed
+            locale (list, optional): Defaults to ["en", "US"].
+            url (str, optional): websocket url. Defaults to URL.
+            overlap_bars (int, optional): stored bars fetched again on
+                subscription. Defaults to OVERLAP_BARS.
+            manifest (StorageManifest, optional): gives the last stored bars
+                and is updated with the writes. Defaults to None.
+            on_written (Callable[[str, str, dict], None], optional): called
+                with the symbol, the interval and the result of each write,
+                on the streaming thread. Defaults to None.
+        """
+        self.logger = logger
+        self.storage_dir = storage_dir
+        self.auth_token = auth_token
+        self.symbol_pair_list = symbol_pair_list
+        self.overlap_bars = overlap_bars
+        self.manifest = manifest
+        self.on_written = on_written
+        self.connection = TradingViewConnection(logger, url, locale)
+        self.stop_event = threading.Event()
+        self.thread: threading.Thread | None = None
+
+        self.update_cnt = 0
+        self.write_cnt = 0
+
+    async def _subscribe(self):
+        cs_data_list = await self.connection.ensure(
+            self.auth_token, len(self.symbol_pair_list)
+        )
+        now = time.time()
+        for cs_data, symbol_pair in zip(cs_data_list, self.symbol_pair_list):
+            if self.manifest is not None:
+                last_ts = self.manifest.get_last_ts(*symbol_pair)
+            else:
+                filepath = get_symbol_pair_filepath(self.storage_dir, *symbol_pair)
+                last_ts = get_last_line_ts(filepath)
+            max_bars = get_max_bars(
+                symbol_pair[1],
+                last_ts,
+                now,
+                overlap_bars=self.overlap_bars,
+            )
+            await cs_data.send_request(
+                self.connection.ws,
+                self.connection.next_symbol_idx(),
+                symbol_pair,
+                max_bars,
+            )
+        self.logger.info(f"Subscribed to {len(cs_data_list)} series")
+
+    def _write(self, symbol_pair: tuple[str, str], series: list, m: str):
+        try:
+            bars = Bars.from_series(series)
+        except ValueError as e:
+            self.logger.error(f"{symbol_pair} {m} bars error: {e}")
+            return
+        if len(bars) == 0:
+            return
+
+        symbol, interval = symbol_pair
+        if m == "timescale_update":
+            res = write_to_file(
+                self.storage_dir, symbol, interval, bars, self.manifest
+            )
+            self.logger.info(
+                "Got {:6d} bars for pair: ({:>20s},{:>5s}), streaming".format(
+                    len(bars), symbol, interval
+                )
+            )
+        else:
+            res = update_last_bars(
+                self.storage_dir, symbol, interval, bars, self.manifest
+            )
+            self.update_cnt += 1
+        self.write_cnt += 1
+        if res["status"] != "ok":
+            self.logger.warning(f"Write file: {res}")
+        if self.on_written is not None:
+            try:
+                self.on_written(symbol, interval, res)
+            except Exception as e:
+                self.logger.error(f"{symbol_pair} on_written error: {e}")
+                self.logger.error(f"Traceback: {traceback.format_exc()}")
+
+    def _handle_frame(self, frame):
+        m = frame.m
+        is_error = RESPONSE_TYPE.get(m, {}).get("type") == "error"
+        if m not in ("timescale_update", "du") and not is_error:
+            return
+
+        p = frame.data["p"]
+        cs_data = self.connection.cs_info.get(p[0])
+        if cs_data is None or cs_data.current_symbol_pair is None:
+            return
+        if is_error:
+            self.logger.error(f"Error {m}: {p}, pair: {cs_data.current_symbol_pair}")
+            return
+        series = p[1].get(f"sds_{cs_data.chart_idx}", {})
+        if "s" in series:
+            self._write(cs_data.current_symbol_pair, series["s"], m)
+
+    async def _receive(self):
+        decoder = FrameDecoder()
+        last_log = time.monotonic()
+        while not self.stop_event.is_set():
+            try:
+                message = await asyncio.wait_for(self.connection.ws.recv(), timeout=1)
+            except asyncio.TimeoutError:
+                if (
+                    self.connection.is_open
+                    and self.connection.auth_token != self.auth_token  # noqa: W503
+                ):
+                    # re-send the rotated auth token
+                    await self.connection.ensure(
+                        self.auth_token, len(self.symbol_pair_list)
+                    )
+                continue
+
+            try:
+                frames = decoder.feed(message)
+            except ValueError as e:
+                self.logger.error(f"message {message[:100]!r} decode error: {e}")
+                continue
+            for error in decoder.errors:
+                self.logger.warning(f"message decode error: {error}")
+            for frame in frames:
+                if frame.frame_type == FrameType.HEARTBEAT:
+                    await self.connection.ws.send(frame.encode())
+                elif frame.frame_type == FrameType.MESSAGE:
+                    self._handle_frame(frame)
+
+            if time.monotonic() - last_log >= LOG_PERIOD:
+                last_log = time.monotonic()
+                self.logger.info(f"Applied {self.update_cnt} real-time updates")
+
+    async def run(self):
+        while not self.stop_event.is_set():
+            try:
+                await self._subscribe()
+                await self._receive()
+            except (ConnectionClosed, OSError) as e:
+                self.logger.warning(f"Real-time connection lost: {e!r}")
+            except Exception as e:
+                self.logger.error(f"Real-time error: {e}")
+                self.logger.error(f"Traceback: {traceback.format_exc()}")
+            await self.connection.close()
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.stop_event.wait, RECONNECT_DELAY
+            )
+
+    def start(self):
+        """Run in a background thread until stop"""
+        self.stop_event.clear()
+        self.thread = threading.Thread(
+            target=asyncio.run, args=(self.run(),), daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
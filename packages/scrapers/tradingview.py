@@ -1,21 +1,635 @@
-import re
+import os
 import time
-import json
 import math
+import atexit
+import itertools
+import queue
+import threading
 import logging
 import asyncio
 import traceback
+from collections import deque
+from typing import AsyncIterator, Callable, Iterator
 import multiprocessing as mp
+import multiprocessing.pool
+import multiprocessing.queues
 
-from websockets import client
-from ..services.websockets import (
-    generate_chart_session_id,
-    create_message,
-    ws_client_send_init,
-)
+from websockets.exceptions import ConnectionClosed
+from ..schedulers.byte_budget import ByteBudget, get_result_size
+from ..schedulers.concurrency_controller import ConcurrencyController
+from ..schedulers.shared_pair_source import SharedPairSource
+from ..services.bars import Bars
 from ..services.chart_session_data import ChartSessionData
+from ..services.connection import TradingViewConnection
+from ..services.frame_decoder import FrameDecoder
+from ..services.metrics import ScraperMetrics, get_metrics
+from ..types.frame import FrameType
 from ..utils.intervals import cmp_interval
-from ..constants.websockets import URL, ORIGIN, HEADER, RESPONSE_TYPE
+from ..utils.symbol_pairs import group_by_symbol
+from ..constants.websockets import URL, RESPONSE_TYPE
+
+MAX_RECONNECT = 3
+# seconds a series may go without a message before its chart session is
+# dropped, plus SERIES_TIMEOUT_PER_KBAR per 1000 bars of its max_bars, as a
+# first fetch of 50000 bars takes longer to arrive on a slow link
+SERIES_TIMEOUT = 15
+SERIES_TIMEOUT_PER_KBAR = 1.0
+# retries of a pair whose series timed out
+MAX_SERIES_RETRY = 2
+# seconds between checks of a full budget
+BUDGET_POLL_INTERVAL = 0.1
+# seconds between checks of the stop event of a stream
+STOP_POLL_INTERVAL = 0.1
+
+# error response types that back off the chart session window, with or
+# without a chart session
+CONNECTION_ERROR_TYPE = {"critical_error", "protocol_error"}
+
+# response types that do not affect the result of a batch
+SKIPPED_RESPONSE_TYPE = {
+    "qsd",
+    "quote_completed",
+    "series_loading",
+    "du",
+    "series_timeframe",
+    "study_loading",
+    "study_completed",
+}
+
+# event loop and connection kept alive across batches in this process
+_worker_pid: int | None = None
+_worker_loop: asyncio.AbstractEventLoop | None = None
+_worker_connection: TradingViewConnection | None = None
+_inherited_state: list = []
+
+# where the workers of a stream pool take their pairs and put their results,
+# and their budget
+_stream_result_queue: mp.queues.Queue | None = None
+_stream_pair_source: SharedPairSource | None = None
+_stream_budget: ByteBudget | None = None
+# ids of the calls of iter_parallel_multiple_bars in this process
+_stream_call_ids = itertools.count(1)
+
+
+class BarsBatch:
+    """Fetch the bars of a list of symbol pairs over one connection.
+
+    Every chart session works on one pair at a time and is handed the next
+    pair as soon as its series completes. If the connection is lost, it is
+    reopened up to MAX_RECONNECT times and the pairs in flight are re-sent.
+    A series not completed within series_timeout of its request or of its
+    last message, plus series_timeout_per_kbar per 1000 bars requested, only
+    costs its own chart session, which is dropped, and the pair is retried
+    up to max_retry times on the same connection.
+
+    The pairs are taken from symbol_pair_list, or pulled one at a time from
+    next_symbol_pair until it returns None, so that the pairs can be shared
+    with other batches. A chart session keeps the symbol it resolved and
+    walks its intervals with modify_series, the other sessions start other
+    symbols, so the pairs are best given grouped by symbol.
+
+    With adaptive_cs, the number of chart sessions in flight is set by the
+    ConcurrencyController of the connection, up to max_cs, instead of max_cs.
+
+    max_bars_dict gives the bars to request per pair, max_bars otherwise.
+
+    The frames received, their parse time and the latency of each pair are
+    recorded in metrics, the metrics of the process by default.
+
+    With a budget, each result is added to it until the consumer removes it,
+    and no new pair is sent while it is full.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        connection: TradingViewConnection,
+        auth_token: str,
+        symbol_pair_list: list[tuple[str, str]],
+        timeout: int = 3,
+        max_bars: int = 50000,
+        max_cs: int = 10,
+        next_symbol_pair: Callable[[], tuple[str, str] | None] | None = None,
+        adaptive_cs: bool = False,
+        max_bars_dict: dict[tuple[str, str], int] | None = None,
+        series_timeout: float = SERIES_TIMEOUT,
+        series_timeout_per_kbar: float = SERIES_TIMEOUT_PER_KBAR,
+        max_retry: int = MAX_SERIES_RETRY,
+        metrics: ScraperMetrics | None = None,
+        budget: ByteBudget | None = None,
+    ):
+        self.logger = logger
+        self.metrics = metrics if metrics is not None else get_metrics()
+        self.budget = budget
+        # since when new pairs wait for room in the budget
+        self.stall_start: float | None = None
+        self.connection = connection
+        self.auth_token = auth_token
+        self.timeout = timeout
+        self.series_timeout = series_timeout
+        self.series_timeout_per_kbar = series_timeout_per_kbar
+        self.max_retry = max_retry
+        self.max_bars = max_bars
+        self.max_bars_dict = max_bars_dict or {}
+        if next_symbol_pair is None:
+            self.pair_num = len(symbol_pair_list)
+            self.pair_source = (
+                symbol_pair
+                for group in group_by_symbol(symbol_pair_list).values()
+                for symbol_pair in group
+            )
+            self.max_cs = min(max_cs, self.pair_num)
+        else:
+            # unknown number of pairs
+            self.pair_num = None
+            self.pair_source = iter(next_symbol_pair, None)
+            self.max_cs = max_cs
+
+        self.controller = None
+        if adaptive_cs:
+            controller = connection.controller
+            if controller is None or controller.max_window != max_cs:
+                controller = ConcurrencyController(
+                    max_window=max_cs, latency_target=timeout / 2
+                )
+                connection.controller = controller
+            self.controller = controller
+
+        self.exhausted = False
+        self.retry_list: list[tuple[str, str]] = []
+        self.retry_cnt: dict[tuple[str, str], int] = {}
+        # pairs taken from the source but not sent yet, by symbol
+        self.pending: dict[str, deque[tuple[str, str]]] = {}
+        # chart sessions with a request whose series has not ended yet
+        self.open_cs_id_set: set[str] = set()
+        self.complete_cnt = 0
+        self.reconnect_cnt = 0
+        # received results not yet yielded
+        self.results: deque[tuple[str, str, Bars | None, dict]] = deque()
+
+    def _pop_pending(self, symbol: str) -> tuple[str, str]:
+        symbol_pairs = self.pending[symbol]
+        symbol_pair = symbol_pairs.popleft()
+        if len(symbol_pairs) == 0:
+            del self.pending[symbol]
+        return symbol_pair
+
+    def _next_pair(self, cs_data: ChartSessionData) -> tuple[str, str] | None:
+        if len(self.retry_list) > 0:
+            return self.retry_list.pop()
+        if cs_data.resolved_symbol in self.pending:
+            # next interval of the symbol resolved on the session
+            return self._pop_pending(cs_data.resolved_symbol)
+
+        # start a symbol that no other chart session is on
+        busy_symbol_set = {
+            self.connection.cs_info[cs_id].resolved_symbol
+            for cs_id in self.open_cs_id_set
+        }
+        for symbol in self.pending:
+            if symbol not in busy_symbol_set:
+                return self._pop_pending(symbol)
+        while not self.exhausted:
+            symbol_pair = next(self.pair_source, None)
+            if symbol_pair is None:
+                self.exhausted = True
+                break
+            self.pending.setdefault(symbol_pair[0], deque()).append(symbol_pair)
+            if symbol_pair[0] not in busy_symbol_set:
+                return self._pop_pending(symbol_pair[0])
+
+        # nothing else to do, help with the symbol with the most intervals left
+        if len(self.pending) > 0:
+            return self._pop_pending(
+                max(self.pending, key=lambda symbol: len(self.pending[symbol]))
+            )
+        return None
+
+    async def _send_next(self, cs_data: ChartSessionData):
+        symbol_pair = self._next_pair(cs_data)
+        if symbol_pair is None:
+            return
+        self.open_cs_id_set.add(cs_data.cs_id)
+        await cs_data.send_request(
+            self.connection.ws,
+            self.connection.next_symbol_idx(),
+            symbol_pair,
+            self.max_bars_dict.get(symbol_pair, self.max_bars),
+        )
+
+    def _paused(self) -> bool:
+        """whether new pairs wait for the consumer to catch up"""
+        if self.budget is None:
+            return False
+        if self.budget.is_full():
+            if self.stall_start is None:
+                self.stall_start = time.perf_counter()
+            return True
+        if self.stall_start is not None:
+            self.budget.add_stall(time.perf_counter() - self.stall_start)
+            self.stall_start = None
+        return False
+
+    def _window(self) -> int:
+        if self.controller is None:
+            return self.max_cs
+        return min(self.controller.limit, self.max_cs)
+
+    async def _fill_chart_sessions(self, reconnect: bool = True):
+        """Send pairs to the free chart sessions, up to the window
+
+        Args:
+            reconnect (bool, optional): reopen the connection if it is closed,
+                otherwise only open the missing chart sessions. Defaults to True.
+        """
+        window = self._window()
+        if reconnect:
+            cs_data_list = await self.connection.ensure(self.auth_token, window)
+        else:
+            while len(self.connection.cs_id_list) < window:
+                await self.connection.create_chart_session()
+            cs_data_list = [
+                self.connection.cs_info[cs_id]
+                for cs_id in self.connection.cs_id_list[:window]
+            ]
+        if self._paused():
+            return
+        for cs_data in cs_data_list:
+            if len(self.open_cs_id_set) >= window:
+                break
+            if (
+                cs_data.current_symbol_pair is None
+                and cs_data.cs_id not in self.open_cs_id_set  # noqa: W503
+            ):
+                await self._send_next(cs_data)
+
+    def _backoff(self, reason: str):
+        if self.controller is not None and self.controller.backoff():
+            self.logger.warning(
+                f"Chart session window: {self.controller.limit} ({reason})"
+            )
+
+    def _add_result(self, cs_data: ChartSessionData, bars: Bars | None, detail: dict):
+        symbol, interval = cs_data.current_symbol_pair
+        detail["latency"] = time.perf_counter() - cs_data.request_time
+        detail["max_bars"] = cs_data.max_bars
+        detail["data_frequency"] = cs_data.data_frequency
+        if cs_data.error is not None:
+            detail["error"] = cs_data.error
+        if self.controller is not None:
+            detail["window"] = self.controller.limit
+            if bars is not None and self.controller.success(detail["latency"]):
+                self.logger.info(f"Chart session window: {self.controller.limit}")
+        self.metrics.record_latency(detail["status"], detail["latency"])
+        if self.budget is not None:
+            self.budget.add(0 if bars is None else bars.nbytes)
+        self.results.append((symbol, interval, bars, detail))
+        cs_data.current_symbol_pair = None
+
+    async def _end_series(self, cs_data: ChartSessionData):
+        # end of an symbol
+        self.open_cs_id_set.discard(cs_data.cs_id)
+        self.complete_cnt += 1
+        pair_num = self.pair_num
+        if pair_num is not None:
+            one_fifth = int(math.ceil(pair_num / 20))
+            if self.complete_cnt % one_fifth == 0 or self.complete_cnt == pair_num:
+                self.logger.info(f"Progress: {self.complete_cnt}/{pair_num}")
+
+        await self._fill_chart_sessions(reconnect=False)
+
+    async def _handle_frame(self, frame):
+        if frame.frame_type == FrameType.HEARTBEAT:
+            self.metrics.record_message("heartbeat", len(frame.payload))
+            await self.connection.ws.send(frame.encode())
+            return
+        self.metrics.record_message(frame.m, len(frame.payload))
+        if frame.m in SKIPPED_RESPONSE_TYPE:
+            # nothing to do for these, do not pay for parsing them
+            return
+
+        # check if segment is json format
+        start = time.perf_counter()
+        try:
+            data = frame.data
+        except Exception as e:
+            self.logger.error(f"segment {frame.payload[:100]} parse error: {e}")
+            return
+        finally:
+            self.metrics.record_parse(frame.m, time.perf_counter() - start)
+
+        if "session_id" in data:
+            return
+        if "m" not in data or "p" not in data:
+            self.logger.error(f"Unknown message: {frame.payload[:100]}")
+            return
+
+        m = data["m"]
+        p = data["p"]
+
+        if m in CONNECTION_ERROR_TYPE:
+            # they may concern the whole connection, with no chart session
+            self._backoff(m)
+
+        assert isinstance(p, list) and len(p) > 0
+        assert isinstance(p[0], str)
+        cs_id = p[0]
+
+        if m not in RESPONSE_TYPE:
+            self.logger.error(f"Error: Unknown message type: {m} {p}")
+            return
+        if cs_id not in self.connection.cs_info:
+            if m in CONNECTION_ERROR_TYPE:
+                self.logger.error(f"Error {m}: {p}")
+            else:
+                self.logger.warning(
+                    f"{m} of unknown chart session: {frame.payload[:100]}"
+                )
+            return
+        cs_data = self.connection.cs_info[cs_id]
+        cs_data.activity_time = time.perf_counter()
+
+        done = False
+        error = False
+        if "type" in RESPONSE_TYPE[m] and RESPONSE_TYPE[m]["type"] == "error":
+            self.logger.error(f"Error {m}: {p}, pair: {cs_data.current_symbol_pair}")
+            if cs_data.error is None:
+                cs_data.error = m
+            if m == "symbol_error":
+                # resolve it again for the next interval
+                cs_data.resolved_symbol = None
+            if m != "symbol_error":
+                error = True  # ending
+        elif m == "symbol_resolved":
+            # check if interval is available for the symbol
+            data_frequency = None
+            cur_pair = cs_data.current_symbol_pair
+            cur_interval = None if cur_pair is None else cur_pair[1]
+            if "data_frequency" in p[2]:
+                data_frequency = p[2]["data_frequency"]
+                cs_data.data_frequency = data_frequency
+
+            if (
+                data_frequency is not None
+                and cur_interval is not None  # noqa: W503
+                and cmp_interval(data_frequency, cur_interval) > 0  # noqa: W503
+            ):
+                self.logger.warning(f"{cur_pair} should be at least {data_frequency}")
+        elif m == "series_completed":
+            done = True  # ending
+        elif m == "timescale_update":
+            series = p[1].get(f"sds_{cs_data.chart_idx}", {})
+            if (
+                "node" in series and cs_data.current_symbol_pair is not None
+            ):  # check if data contains bars
+                try:
+                    bars = Bars.from_series(series["s"])
+                except ValueError as e:
+                    self.logger.error(f"{cs_data.current_symbol_pair} bars error: {e}")
+                    self._add_result(
+                        cs_data,
+                        None,
+                        {"status": "error", "m": m, "p": frame.payload[:100]},
+                    )
+                else:
+                    self._add_result(
+                        cs_data,
+                        bars,
+                        {"status": "ok", "m": m, "p": frame.payload[:100]},
+                    )
+
+        if done or error:
+            if cs_data.current_symbol_pair is not None:
+                self._add_result(
+                    cs_data,
+                    None,
+                    {"status": "error", "m": m, "p": frame.payload[:100]},
+                )
+            await self._end_series(cs_data)
+
+    def is_done(self) -> bool:
+        return (
+            self.exhausted
+            and len(self.retry_list) == 0  # noqa: W503
+            and len(self.pending) == 0  # noqa: W503
+            and len(self.open_cs_id_set) == 0  # noqa: W503
+        )
+
+    def _series_deadline(self, cs_data: ChartSessionData) -> float:
+        """time the series of a chart session expires, series_timeout after
+        its last message plus the time its max_bars take to arrive"""
+        return (
+            cs_data.activity_time
+            + self.series_timeout  # noqa: W503
+            + cs_data.max_bars / 1000 * self.series_timeout_per_kbar  # noqa: W503
+        )
+
+    def _next_deadline(self) -> float | None:
+        if len(self.open_cs_id_set) == 0:
+            return None
+        return min(
+            self._series_deadline(self.connection.cs_info[cs_id])
+            for cs_id in self.open_cs_id_set
+        )
+
+    async def _expire_series(self):
+        """Drop the chart sessions whose series is late and retry their pair"""
+        now = time.perf_counter()
+        expired = False
+        for cs_id in list(self.open_cs_id_set):
+            cs_data = self.connection.cs_info[cs_id]
+            if now < self._series_deadline(cs_data):
+                continue
+            expired = True
+            symbol_pair = cs_data.current_symbol_pair
+            self.open_cs_id_set.discard(cs_id)
+            # the session may still answer, do not reuse it
+            await self.connection.delete_chart_session(cs_id)
+            self._backoff("series timeout")
+            if symbol_pair is None:
+                # got the bars, only series_completed is missing
+                self.complete_cnt += 1
+                continue
+
+            retry = self.retry_cnt.get(symbol_pair, 0)
+            if retry < self.max_retry:
+                self.logger.warning(
+                    f"{symbol_pair} timed out, retry {retry + 1}/{self.max_retry}"
+                )
+                self.retry_cnt[symbol_pair] = retry + 1
+                self.retry_list.append(symbol_pair)
+            else:
+                self.logger.error(f"{symbol_pair} timed out {retry + 1} times")
+                self._add_result(
+                    cs_data, None, {"status": "error", "m": "timeout", "p": ""}
+                )
+                self.complete_cnt += 1
+        if expired:
+            await self._fill_chart_sessions(reconnect=False)
+
+    async def _recover(self, e: Exception) -> bool:
+        """Requeue the pairs in flight and drop the connection
+
+        Returns:
+            bool: whether another reconnection may be tried
+        """
+        self.logger.warning(f"Connection lost: {e!r}")
+        self._backoff("connection lost")
+        for cs_id in self.open_cs_id_set:
+            cs_data = self.connection.cs_info[cs_id]
+            if cs_data.current_symbol_pair is not None:
+                self.retry_list.append(cs_data.current_symbol_pair)
+            else:
+                # got the bars, only series_completed is missing
+                self.complete_cnt += 1
+        self.open_cs_id_set.clear()
+        await self.connection.close()
+
+        self.reconnect_cnt += 1
+        if self.reconnect_cnt > MAX_RECONNECT:
+            self.logger.error(f"Reconnected {MAX_RECONNECT} times")
+            return False
+        return True
+
+    async def iter_results(self) -> AsyncIterator[tuple[str, str, Bars | None, dict]]:
+        """Yield each (symbol, interval, bars, detail) as soon as it is received"""
+        decoder = FrameDecoder()
+        need_fill = True
+        cont_timeout_cnt = 0
+
+        while not self.is_done():
+            try:
+                if need_fill:
+                    decoder.reset()
+                    await self._fill_chart_sessions()
+                    need_fill = False
+
+                # wake up for the next series deadline
+                timeout = self.timeout
+                deadline = self._next_deadline()
+                if deadline is not None:
+                    timeout = min(timeout, max(deadline - time.perf_counter(), 0))
+                if self.stall_start is not None:
+                    # wake up to check the budget
+                    timeout = min(timeout, BUDGET_POLL_INTERVAL)
+                try:
+                    message = await asyncio.wait_for(
+                        self.connection.ws.recv(), timeout=timeout
+                    )
+                except asyncio.TimeoutError:
+                    if timeout >= self.timeout:
+                        self.logger.warning("Timeout")
+                        self._backoff("timeout")
+                        cont_timeout_cnt += 1
+                        if cont_timeout_cnt >= 3:
+                            # nothing at all, not even heartbeats
+                            raise TimeoutError("Timeout continuously 3 times")
+                    await self._expire_series()
+                    if self.stall_start is not None:
+                        await self._fill_chart_sessions(reconnect=False)
+                    continue
+                else:
+                    cont_timeout_cnt = 0
+
+                start = time.perf_counter()
+                try:
+                    frames = decoder.feed(message)
+                except ValueError as e:
+                    self.logger.error(f"message {message[:100]!r} decode error: {e}")
+                    continue
+                finally:
+                    self.metrics.record_recv(len(message), time.perf_counter() - start)
+                for error in decoder.errors:
+                    self.logger.warning(f"message decode error: {error}")
+
+                for frame in frames:
+                    await self._handle_frame(frame)
+                await self._expire_series()
+                if self.stall_start is not None:
+                    await self._fill_chart_sessions(reconnect=False)
+            except (ConnectionClosed, OSError) as e:
+                if not await self._recover(e):
+                    break
+                need_fill = True
+                cont_timeout_cnt = 0
+
+            while len(self.results) > 0:
+                yield self.results.popleft()
+
+        while len(self.results) > 0:
+            yield self.results.popleft()
+
+        # chart sessions left waiting may still answer, do not reuse them
+        for cs_id in self.open_cs_id_set:
+            try:
+                await self.connection.delete_chart_session(cs_id)
+            except ConnectionClosed:
+                await self.connection.close()
+                break
+        self.open_cs_id_set.clear()
+
+    async def run(self) -> list[tuple[str, str, Bars | None, dict]]:
+        return [result async for result in self.iter_results()]
+
+
+async def async_iter_multiple_bars(
+    logger: logging.Logger,
+    auth_token: str,
+    symbol_pair_list: list[tuple[str, str]],
+    locale=["en", "US"],
+    timeout: int = 3,
+    max_bars: int = 50000,
+    max_cs: int = 10,
+    url: str = URL,
+    connection: TradingViewConnection | None = None,
+    adaptive_cs: bool = False,
+    max_bars_dict: dict[tuple[str, str], int] | None = None,
+    budget: ByteBudget | None = None,
+    next_symbol_pair: Callable[[], tuple[str, str] | None] | None = None,
+) -> AsyncIterator[tuple[str, str, Bars | None, dict]]:
+    """Yield (symbol, interval, bars, detail) of each pair as soon as its
+    series is received, bars is None if the pair failed
+
+    Args:
+        connection (TradingViewConnection, optional): connection to reuse,
+            a new one is opened and closed if None. Defaults to None.
+        adaptive_cs (bool, optional): adapt the number of chart sessions in
+            flight, up to max_cs. Defaults to False.
+        max_bars_dict (dict, optional): bars to request per pair, max_bars
+            for the pairs not in it. Defaults to None.
+        budget (ByteBudget, optional): the consumer removes each result
+            from it once handled, no new pair is sent while it is full.
+            Defaults to None.
+        next_symbol_pair (Callable, optional): pull the pairs from it until
+            it returns None, instead of symbol_pair_list. Defaults to None.
+    """
+    if len(symbol_pair_list) == 0 and next_symbol_pair is None:
+        logger.warning("Empty symbol pair list")
+        return
+
+    own_connection = connection is None
+    if connection is None:
+        connection = TradingViewConnection(logger, url, locale)
+
+    try:
+        batch = BarsBatch(
+            logger=logger,
+            connection=connection,
+            auth_token=auth_token,
+            symbol_pair_list=symbol_pair_list,
+            timeout=timeout,
+            max_bars=max_bars,
+            max_cs=max_cs,
+            adaptive_cs=adaptive_cs,
+            max_bars_dict=max_bars_dict,
+            budget=budget,
+            next_symbol_pair=next_symbol_pair,
+        )
+        async for result in batch.iter_results():
+            yield result
+    finally:
+        if own_connection:
+            await connection.close()
 
 
 async def async_get_multiple_bars(
@@ -26,186 +640,78 @@ async def async_get_multiple_bars(
     timeout: int = 3,
     max_bars: int = 50000,
     max_cs: int = 10,
-) -> list[tuple[str, str, list, list]] | None:
+    url: str = URL,
+    connection: TradingViewConnection | None = None,
+    adaptive_cs: bool = False,
+    max_bars_dict: dict[tuple[str, str], int] | None = None,
+) -> list[tuple[str, str, Bars | None, dict]] | None:
     if len(symbol_pair_list) == 0:
         logger.warning("Empty symbol pair list")
         return None
-    async with client.connect(
-        URL, origin=ORIGIN, max_size=None, extra_headers=HEADER  # type: ignore
-    ) as ws:
-        await ws_client_send_init(ws, auth_token, locale)
 
-        # create chart sessions
-        max_cs = min(max_cs, len(symbol_pair_list))
-        cs_id_list: list[str] = []
-        cs_info: dict[str, ChartSessionData] = {}
-
-        idx = 0
-        while idx < max_cs:
-            cs_id = generate_chart_session_id()
-            cs_id_list.append(cs_id)
-            cs_info[cs_id] = ChartSessionData(idx, cs_id)
+    return [
+        result
+        async for result in async_iter_multiple_bars(
+            logger=logger,
+            auth_token=auth_token,
+            symbol_pair_list=symbol_pair_list,
+            locale=locale,
+            timeout=timeout,
+            max_bars=max_bars,
+            max_cs=max_cs,
+            url=url,
+            connection=connection,
+            adaptive_cs=adaptive_cs,
+            max_bars_dict=max_bars_dict,
+        )
+    ]
 
-            await ws.send(create_message("chart_create_session", [cs_id, ""]))
 
-            # switch timezone
-            await ws.send(create_message("switch_timezone", [cs_id, "Etc/UTC"]))
+def get_worker_connection(
+    logger: logging.Logger, url: str = URL, locale: list = ["en", "US"]
+) -> tuple[asyncio.AbstractEventLoop, TradingViewConnection]:
+    """Get the event loop and connection kept alive in this process
 
-            # send request
-            await cs_info[cs_id].send_request(ws, idx, symbol_pair_list[idx], max_bars)
+    The connection is created on first use and reused by every following
+    call with the same url and locale, so its handshake, authentication and
+    chart sessions are paid once per process instead of once per batch.
+    """
+    global _worker_pid, _worker_loop, _worker_connection
+    if _worker_pid != os.getpid():
+        # inherited from the parent by fork, the socket belongs to the parent,
+        # keep a reference so that garbage collection does not touch it either
+        _inherited_state.append((_worker_loop, _worker_connection))
+        _worker_pid = os.getpid()
+        _worker_loop = None
+        _worker_connection = None
+    if _worker_loop is None or _worker_loop.is_closed():
+        _worker_loop = asyncio.new_event_loop()
+        _worker_connection = None
+    if (
+        _worker_connection is None
+        or _worker_connection.url != url  # noqa: W503
+        or _worker_connection.locale != locale  # noqa: W503
+    ):
+        if _worker_connection is not None:
+            _worker_loop.run_until_complete(_worker_connection.close())
+        _worker_connection = TradingViewConnection(logger, url, locale)
+    _worker_connection.logger = logger
+    return _worker_loop, _worker_connection
 
-            idx += 1
 
-        complete_cnt = 0
-        timeout_cnt = 0
-        cont_timeout_cnt = 0
-        while complete_cnt < len(symbol_pair_list):
-            try:
-                message = await asyncio.wait_for(ws.recv(), timeout=timeout)
-            except asyncio.TimeoutError:
-                logger.warning("Timeout")
-                timeout_cnt += 1
-                cont_timeout_cnt += 1
-                continue
-            else:
-                cont_timeout_cnt = 0
-            finally:
-                if cont_timeout_cnt >= 3:
-                    logger.error("Timeout continuously 3 times")
-                    break
-                if timeout_cnt >= 20:
-                    logger.error("Timeout 20 times")
-                    break
+def close_worker_connection():
+    global _worker_loop, _worker_connection
+    if _worker_pid != os.getpid():
+        return
+    if _worker_loop is not None and not _worker_loop.is_closed():
+        if _worker_connection is not None:
+            _worker_loop.run_until_complete(_worker_connection.close())
+        _worker_loop.close()
+    _worker_loop = None
+    _worker_connection = None
 
-            if re.match(r"~m~\d+~m~~h~\d+$", str(message)):
-                # This is a heartbeat message
-                await ws.send(message)
-            else:
-                segments = re.split(r"~m~\d+~m~", str(message))[1:]
-
-                for segment in segments:
-                    # check if segment is json format
-                    try:
-                        data = json.loads(segment)
-                    except Exception as e:
-                        logger.error(f"segment {segment} parse error: {e}")
-                        error = True
-                    else:
-                        if "session_id" in data:
-                            pass
-                        elif "m" in data and "p" in data:
-                            m = data["m"]
-                            p = data["p"]
-
-                            assert isinstance(p, list) and len(p) > 0
-                            assert isinstance(p[0], str)
-                            cs_id = p[0]
-
-                            done = False
-                            error = False
-
-                            if m not in RESPONSE_TYPE:
-                                logger.error(f"Error: Unknown message type: {m} {p}")
-                            elif (
-                                "type" in RESPONSE_TYPE[m]
-                                and RESPONSE_TYPE[m]["type"] == "error"  # noqa: W503
-                            ):
-                                logger.error(
-                                    f"Error {m}: {p}, pair: {cs_info[cs_id].current_symbol_pair}"
-                                )
-                                if m != "symbol_error":
-                                    error = True  # ending
-                            elif m == "symbol_resolved":
-                                # check if interval is available for the symbol
-                                data_frequency = None
-                                cur_pair = cs_info[cs_id].current_symbol_pair
-                                cur_interval = None if cur_pair is None else cur_pair[1]
-                                if "data_frequency" in p[2]:
-                                    data_frequency = p[2]["data_frequency"]
-
-                                if (
-                                    data_frequency is not None
-                                    and cur_interval is not None  # noqa: W503
-                                    and (  # noqa: W503
-                                        cmp_interval(data_frequency, cur_interval) > 0
-                                    )
-                                ):
-                                    logger.warning(
-                                        f"{cur_pair} should be at least {data_frequency}"
-                                    )
-                            elif m == "series_completed":
-                                done = True  # ending
-                            elif m == "timescale_update":
-                                if (
-                                    "node" in p[1][f"sds_{cs_info[cs_id].chart_idx}"]
-                                ):  # check if data contains bars
-                                    bars = p[1][f"sds_{cs_info[cs_id].chart_idx}"]["s"]
-                                    cs_info[cs_id].bars_list.append(bars)
-                                    cs_info[cs_id].symbol_pair_list.append(
-                                        cs_info[cs_id].current_symbol_pair
-                                    )
-                                    cs_info[cs_id].detail_list.append(
-                                        {
-                                            "status": "ok",
-                                            "m": m,
-                                            "p": json.dumps(p)[:100],
-                                        }
-                                    )
-                                    cs_info[cs_id].current_symbol_pair = None
-
-                            if done or error:
-                                # end of an symbol
-                                complete_cnt += 1
-                                pair_num = len(symbol_pair_list)
-                                one_fifth = int(math.ceil(pair_num / 20))
-                                if (
-                                    complete_cnt % one_fifth == 0
-                                    or complete_cnt == pair_num  # noqa: W503
-                                ):
-                                    logger.info(f"Progress: {complete_cnt}/{pair_num}")
-
-                                if cs_info[cs_id].current_symbol_pair is not None:
-                                    cs_info[cs_id].bars_list.append(None)
-                                    cs_info[cs_id].symbol_pair_list.append(
-                                        cs_info[cs_id].current_symbol_pair
-                                    )
-                                    cs_info[cs_id].detail_list.append(
-                                        {
-                                            "status": "error",
-                                            "m": m,
-                                            "p": json.dumps(p)[:100],
-                                        }
-                                    )
-                                    cs_info[cs_id].current_symbol_pair = None
-
-                                if idx < len(symbol_pair_list):
-                                    await cs_info[cs_id].send_request(
-                                        ws,
-                                        idx,
-                                        symbol_pair_list[idx],
-                                        max_bars,
-                                    )
-                                    idx += 1
-                        else:
-                            logger.error(f"Unknown message: {message}")
-
-    assert len(cs_id_list) == len(
-        cs_info
-    ), "Logical error: len(cs_id_list) != len(cs_info)"
 
-    bars_list = []
-    for cs_id in cs_id_list:
-        cs_data = cs_info[cs_id]
-        bars_list += [
-            (
-                cs_data.symbol_pair_list[idx][0],
-                cs_data.symbol_pair_list[idx][1],
-                cs_data.bars_list[idx],
-                cs_data.detail_list[idx],
-            )
-            for idx in range(len(cs_data.symbol_pair_list))
-        ]
-    return bars_list
+atexit.register(close_worker_connection)
 
 
 def sync_get_multiple_bars(
@@ -215,7 +721,11 @@ def sync_get_multiple_bars(
     locale=["en", "US"],
     timeout: int = 3,
     max_cs: int = 10,
-) -> list[tuple[str, str, list, list]] | None:
+    url: str = URL,
+    keep_alive: bool = False,
+    adaptive_cs: bool = False,
+    max_bars_dict: dict[tuple[str, str], int] | None = None,
+) -> list[tuple[str, str, Bars | None, dict]] | None:
     """get bars for multiple pairs
 
     Args:
@@ -224,31 +734,66 @@ def sync_get_multiple_bars(
         locale (list, optional): Defaults to ["en", "US"].
         symbol_pair_list (list, optional): Defaults to None.
         timeout (int, optional): Defaults to 3.
-        num_processes (int, optional): Defaults to 1.
+        max_cs (int, optional): Defaults to 10.
+        url (str, optional): websocket url. Defaults to URL.
+        keep_alive (bool, optional): reuse the connection of this process
+            across calls. Defaults to False.
+        adaptive_cs (bool, optional): adapt the number of chart sessions in
+            flight, up to max_cs. Defaults to False.
+        max_bars_dict (dict, optional): bars to request per pair.
+            Defaults to None.
 
     Returns:
-        list[tuple[str, str, list]]: list of tuple(symbol, interval, bars)
+        list[tuple[str, str, Bars | None, dict]]: list of tuple(symbol, interval,
+            bars, detail)
     """
     bars_list = []
     try:
-        bars_list = asyncio.run(
-            async_get_multiple_bars(
-                logger=logger,
-                auth_token=auth_token,
-                locale=locale,
-                symbol_pair_list=symbol_pair_list,
-                timeout=timeout,
-                max_cs=max_cs,
+        if keep_alive:
+            loop, connection = get_worker_connection(logger, url, locale)
+            bars_list = loop.run_until_complete(
+                async_get_multiple_bars(
+                    logger=logger,
+                    auth_token=auth_token,
+                    locale=locale,
+                    symbol_pair_list=symbol_pair_list,
+                    timeout=timeout,
+                    max_cs=max_cs,
+                    connection=connection,
+                    adaptive_cs=adaptive_cs,
+                    max_bars_dict=max_bars_dict,
+                )
+            )
+        else:
+            bars_list = asyncio.run(
+                async_get_multiple_bars(
+                    logger=logger,
+                    auth_token=auth_token,
+                    locale=locale,
+                    symbol_pair_list=symbol_pair_list,
+                    timeout=timeout,
+                    max_cs=max_cs,
+                    url=url,
+                    adaptive_cs=adaptive_cs,
+                    max_bars_dict=max_bars_dict,
+                )
             )
-        )
     except Exception as e:
         logger.error(f"Error getting bars for pairs: {symbol_pair_list}")
         logger.error(f"Traceback: {traceback.format_exc()}")
         logger.error(e)
+        if keep_alive:
+            # the state of the chart sessions is unknown, start over next time
+            close_worker_connection()
     finally:
         return bars_list
 
 
+def _pool_sync_get_multiple_bars(*args) -> tuple[list, ScraperMetrics]:
+    # the metrics of the worker go back with its results
+    return sync_get_multiple_bars(*args), get_metrics().take()
+
+
 def sync_parallel_get_multiple_bars(
     logger: logging.Logger,
     auth_token: str,
@@ -257,7 +802,12 @@ def sync_parallel_get_multiple_bars(
     timeout: int = 3,
     num_processes: int = 1,
     max_cs: int = 10,
-) -> list[tuple[str, str, list, list]]:
+    url: str = URL,
+    keep_alive: bool = False,
+    pool: mp.pool.Pool | None = None,
+    adaptive_cs: bool = False,
+    max_bars_dict: dict[tuple[str, str], int] | None = None,
+) -> list[tuple[str, str, Bars | None, dict]]:
     """get bars for multiple pairs in parallel
 
     Args:
@@ -267,9 +817,20 @@ def sync_parallel_get_multiple_bars(
         symbol_pair_list (list, optional): Defaults to None.
         timeout (int, optional): Defaults to 3.
         num_processes (int, optional): Defaults to 1.
+        max_cs (int, optional): Defaults to 10.
+        url (str, optional): websocket url. Defaults to URL.
+        keep_alive (bool, optional): reuse the connection of each process
+            across calls. Defaults to False.
+        pool (mp.pool.Pool, optional): long-lived pool to run on, instead of
+            a new pool per call. Defaults to None.
+        adaptive_cs (bool, optional): adapt the number of chart sessions in
+            flight, up to max_cs. Defaults to False.
+        max_bars_dict (dict, optional): bars to request per pair.
+            Defaults to None.
 
     Returns:
-        list[tuple[str, str, list]]: list of tuple(symbol, interval, bars)
+        list[tuple[str, str, Bars | None, dict]]: list of tuple(symbol, interval,
+            bars, detail)
     """
     result = []
     start = time.perf_counter()
@@ -282,6 +843,10 @@ def sync_parallel_get_multiple_bars(
                 symbol_pair_list=symbol_pair_list,
                 timeout=timeout,
                 max_cs=max_cs,
+                url=url,
+                keep_alive=keep_alive,
+                adaptive_cs=adaptive_cs,
+                max_bars_dict=max_bars_dict,
             )
         else:
             offset = int((len(symbol_pair_list) + num_processes - 1) / num_processes)
@@ -293,13 +858,22 @@ def sync_parallel_get_multiple_bars(
                     locale,
                     timeout,
                     max_cs,
+                    url,
+                    keep_alive,
+                    adaptive_cs,
+                    max_bars_dict,
                 )
                 for i in range(0, len(symbol_pair_list), offset)
             ]
-            with mp.Pool(processes=num_processes) as pool:
-                results = pool.starmap(sync_get_multiple_bars, arglist)
-                result = [item for sublist in results for item in sublist]
-                pool.close()
+            if pool is not None:
+                results = pool.starmap(_pool_sync_get_multiple_bars, arglist)
+            else:
+                with mp.Pool(processes=num_processes) as pool:
+                    results = pool.starmap(_pool_sync_get_multiple_bars, arglist)
+                    pool.close()
+            result = [item for sublist, _ in results for item in sublist]
+            for _, metrics in results:
+                get_metrics().merge(metrics)
     except Exception as e:
         logger.error(f"Error: {e}")
         logger.error(f"Traceback: {traceback.format_exc()}")
@@ -316,5 +890,279 @@ def sync_parallel_get_multiple_bars(
         return result if result is not None else []
 
 
+def stream_get_multiple_bars(
+    result_queue: queue.Queue | mp.queues.Queue,
+    logger: logging.Logger,
+    auth_token: str,
+    symbol_pair_list: list,
+    locale=["en", "US"],
+    timeout: int = 3,
+    max_cs: int = 10,
+    url: str = URL,
+    keep_alive: bool = False,
+    adaptive_cs: bool = False,
+    max_bars_dict: dict[tuple[str, str], int] | None = None,
+    send_metrics: bool = False,
+    budget: ByteBudget | None = None,
+    next_symbol_pair: Callable[[], tuple[str, str] | None] | None = None,
+    call_id: int | None = None,
+    stop_event: threading.Event | None = None,
+):
+    """put each (symbol, interval, bars, detail) on result_queue as soon as it
+    is received, then None once the pairs are done
+
+    Args:
+        result_queue (queue.Queue | mp.queues.Queue): where to put the results
+        send_metrics (bool, optional): put the ScraperMetrics of this process
+            before None, when running in another process. Defaults to False.
+        budget (ByteBudget, optional): see async_iter_multiple_bars.
+            Defaults to None.
+        next_symbol_pair (Callable, optional): see async_iter_multiple_bars.
+            Defaults to None.
+        call_id (int, optional): put each item as (call_id, item), to tell
+            apart the calls sharing result_queue. Defaults to None.
+        stop_event (threading.Event, optional): cancel the pairs in flight
+            and return once it is set, when running in another thread.
+            Defaults to None.
+        the rest as sync_get_multiple_bars
+    """
+
+    def put(item):
+        result_queue.put(item if call_id is None else (call_id, item))
+
+    async def produce(connection: TradingViewConnection | None):
+        async for result in async_iter_multiple_bars(
+            logger=logger,
+            auth_token=auth_token,
+            locale=locale,
+            symbol_pair_list=symbol_pair_list,
+            timeout=timeout,
+            max_cs=max_cs,
+            url=url,
+            connection=connection,
+            adaptive_cs=adaptive_cs,
+            max_bars_dict=max_bars_dict,
+            budget=budget,
+            next_symbol_pair=next_symbol_pair,
+        ):
+            put(result)
+
+    async def run(connection: TradingViewConnection | None):
+        task = asyncio.ensure_future(produce(connection))
+        while stop_event is not None and not task.done():
+            await asyncio.wait({task}, timeout=STOP_POLL_INTERVAL)
+            if stop_event.is_set():
+                task.cancel()
+        await task
+
+    try:
+        if keep_alive:
+            loop, connection = get_worker_connection(logger, url, locale)
+            loop.run_until_complete(run(connection))
+        else:
+            asyncio.run(run(None))
+    except asyncio.CancelledError:
+        if keep_alive:
+            # the chart sessions were left in the middle of their series
+            close_worker_connection()
+    except Exception as e:
+        logger.error(f"Error getting bars for pairs: {symbol_pair_list}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.error(e)
+        if keep_alive:
+            # the state of the chart sessions is unknown, start over next time
+            close_worker_connection()
+    finally:
+        if send_metrics:
+            put(get_metrics().take())
+        put(None)
+
+
+def init_stream_worker(
+    result_queue: mp.queues.Queue,
+    pair_source: SharedPairSource,
+    budget: ByteBudget | None = None,
+):
+    global _stream_result_queue, _stream_pair_source, _stream_budget
+    _stream_result_queue = result_queue
+    _stream_pair_source = pair_source
+    _stream_budget = budget
+
+
+def _pool_stream_get_multiple_bars(call_id: int, *args):
+    source = SharedPairSource(
+        _stream_pair_source.task_queue, _stream_pair_source.remaining, call_id
+    )
+    stream_get_multiple_bars(
+        _stream_result_queue,
+        *args,
+        send_metrics=True,
+        budget=_stream_budget,
+        next_symbol_pair=source,
+        call_id=call_id,
+    )
+
+
+def create_stream_pool(
+    num_processes: int, budget: ByteBudget | None = None
+) -> tuple[mp.pool.Pool, mp.queues.Queue, SharedPairSource]:
+    """Create a pool whose workers take the pairs from a shared queue and
+    stream the results back to this process
+
+    Args:
+        num_processes (int)
+        budget (ByteBudget, optional): shared by the workers, it can only be
+            given when they are created. Defaults to None.
+
+    Returns:
+        tuple[mp.pool.Pool, mp.queues.Queue, SharedPairSource]: the pool, the
+            queue of its results and the source of its pairs
+    """
+    result_queue = mp.Queue()
+    pair_source = SharedPairSource(mp.Queue(), mp.Value("i", 0))
+    pool = mp.Pool(
+        processes=num_processes,
+        initializer=init_stream_worker,
+        initargs=(result_queue, pair_source, budget),
+    )
+    return pool, result_queue, pair_source
+
+
+def iter_parallel_multiple_bars(
+    logger: logging.Logger,
+    auth_token: str,
+    symbol_pair_list: list,
+    locale=["en", "US"],
+    timeout: int = 3,
+    num_processes: int = 1,
+    max_cs: int = 10,
+    url: str = URL,
+    keep_alive: bool = False,
+    pool: mp.pool.Pool | None = None,
+    result_queue: mp.queues.Queue | None = None,
+    adaptive_cs: bool = False,
+    max_bars_dict: dict[tuple[str, str], int] | None = None,
+    budget: ByteBudget | None = None,
+    pair_source: SharedPairSource | None = None,
+) -> Iterator[tuple[str, str, Bars | None, dict]]:
+    """iterate the bars of multiple pairs as they are received
+
+    The pairs are fetched in a background thread, or in the processes of the
+    pool, while the caller consumes the results, so that handling a result
+    overlaps with receiving the next ones.
+
+    The pairs are put on a queue grouped by symbol, and each process takes
+    the next symbol whenever one of its chart sessions is free, so a process
+    given slow pairs takes fewer of them instead of holding up the call with
+    a fixed chunk. The items of both queues are tagged with the id of the
+    call: if the caller stops early, the pairs not taken yet are dropped and
+    the results still in flight are discarded by the next call on the pool.
+    The background thread is cancelled and joined before the caller gets
+    control back, so the event loop kept alive in this process is free for
+    the next call.
+
+    Args:
+        pool (mp.pool.Pool, optional): pool from create_stream_pool, a new
+            one is created if None. Defaults to None.
+        result_queue (mp.Queue, optional): queue from create_stream_pool.
+            Defaults to None.
+        budget (ByteBudget, optional): the caller removes each result from
+            it once handled, the fetching pauses while it is full. A given
+            pool uses the budget it was created with. Defaults to None.
+        pair_source (SharedPairSource, optional): source from
+            create_stream_pool. Defaults to None.
+        the rest as sync_parallel_get_multiple_bars
+
+    Yields:
+        tuple[str, str, Bars | None, dict]: (symbol, interval, bars, detail)
+    """
+    start = time.perf_counter()
+    call_id = next(_stream_call_ids)
+    own_pool = False
+    # the pairs are taken from the queue instead of symbol_pair_list
+    args = (
+        auth_token,
+        [],
+        locale,
+        timeout,
+        max_cs,
+        url,
+        keep_alive,
+        adaptive_cs,
+        max_bars_dict,
+    )
+    if num_processes == 1:
+        result_queue = queue.Queue()
+        source = SharedPairSource(queue.Queue(), mp.Value("i", 0), call_id)
+        source.put(symbol_pair_list)
+        stop_event = threading.Event()
+        thread = threading.Thread(
+            target=stream_get_multiple_bars,
+            args=(result_queue, logger, *args),
+            kwargs={
+                "budget": budget,
+                "next_symbol_pair": SharedPairSource(
+                    source.task_queue, source.remaining, call_id
+                ),
+                "call_id": call_id,
+                "stop_event": stop_event,
+            },
+            daemon=True,
+        )
+        thread.start()
+        num_tasks = 1
+    else:
+        if pool is None or result_queue is None or pair_source is None:
+            own_pool = True
+            pool, result_queue, pair_source = create_stream_pool(
+                num_processes, budget
+            )
+        source = SharedPairSource(
+            pair_source.task_queue, pair_source.remaining, call_id
+        )
+        num_tasks = min(num_processes, source.put(symbol_pair_list))
+        pool.starmap_async(
+            _pool_stream_get_multiple_bars,
+            [(call_id, logger, *args)] * num_tasks,
+        )
+
+    done_cnt = 0
+    result_cnt = 0
+    finished = False
+    try:
+        while done_cnt < num_tasks:
+            result_call_id, result = result_queue.get()
+            if isinstance(result, ScraperMetrics):
+                get_metrics().merge(result)
+            elif result_call_id != call_id:
+                # left over by an earlier call that stopped early
+                if result is not None and budget is not None:
+                    budget.remove(get_result_size(result))
+            elif result is None:
+                done_cnt += 1
+            else:
+                result_cnt += 1
+                yield result
+        finished = True
+    finally:
+        if own_pool:
+            pool.terminate()
+        elif num_processes == 1:
+            # the event loop of the thread may be the one kept alive in this
+            # process, it must not run anymore once the caller is back
+            stop_event.set()
+            thread.join()
+        elif not finished:
+            # the processes stop after their pairs in flight
+            source.drain()
+
+    duration = time.perf_counter() - start
+    logger.info(
+        "Streamed bars for {}/{} pairs in {:.2f} sec with {} processes".format(
+            result_cnt, len(symbol_pair_list), duration, num_processes
+        )
+    )
+
+
 # alias to sync_parallel_get_multiple_bars
 get_multiple_bars = sync_parallel_get_multiple_bars
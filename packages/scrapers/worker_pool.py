@@ -0,0 +1,332 @@
+import time
+import queue
+import logging
+import logging.handlers
+import traceback
+from typing import Iterator
+import multiprocessing as mp
+import multiprocessing.queues
+import multiprocessing.sharedctypes
+
+from .tradingview import (
+    MAX_RECONNECT,
+    BarsBatch,
+    close_worker_connection,
+    get_worker_connection,
+)
+from ..schedulers.byte_budget import ByteBudget
+from ..schedulers.shared_pair_source import SharedPairSource
+from ..services.bars import Bars
+from ..services.metrics import get_metrics
+from ..types.worker import WorkerMessageType
+from ..constants.websockets import URL
+
+
+class _ResultQueueHandler(logging.handlers.QueueHandler):
+    """Forward the log records of a worker to the process owning the pool"""
+
+    def enqueue(self, record: logging.LogRecord):
+        self.queue.put((WorkerMessageType.LOG, record))
+
+
+def _run_worker_batch(
+    logger: logging.Logger,
+    worker_id: int,
+    batch_id: int,
+    auth_token: str,
+    source: SharedPairSource,
+    result_queue: mp.queues.Queue,
+    url: str,
+    locale: list,
+    timeout: int,
+    max_cs: int,
+    adaptive_cs: bool,
+    max_bars_dict: dict[tuple[str, str], int] | None,
+    budget: ByteBudget | None,
+) -> int:
+    """Fetch pairs from source until it is exhausted
+
+    Returns:
+        int: number of results sent
+    """
+    result_cnt = 0
+
+    async def produce(connection) -> BarsBatch:
+        nonlocal result_cnt
+        batch = BarsBatch(
+            logger=logger,
+            connection=connection,
+            auth_token=auth_token,
+            symbol_pair_list=[],
+            timeout=timeout,
+            max_cs=max_cs,
+            next_symbol_pair=source,
+            adaptive_cs=adaptive_cs,
+            max_bars_dict=max_bars_dict,
+            budget=budget,
+        )
+        async for result in batch.iter_results():
+            result_queue.put((WorkerMessageType.RESULT, worker_id, batch_id, result))
+            result_cnt += 1
+        return batch
+
+    attempt = 0
+    while True:
+        batch = None
+        try:
+            loop, connection = get_worker_connection(logger, url, locale)
+            batch = loop.run_until_complete(produce(connection))
+        except Exception as e:
+            logger.error(f"Error getting bars: {e}")
+            logger.error(f"Traceback: {traceback.format_exc()}")
+        if batch is not None and batch.is_done():
+            break
+
+        # the pairs in flight are lost, the state of the chart sessions is
+        # unknown, start over with a new connection
+        close_worker_connection()
+        if source.exhausted:
+            break
+        attempt += 1
+        if attempt > MAX_RECONNECT:
+            logger.error(f"Dropped {source.drain()} pairs after {attempt} attempts")
+            break
+    return result_cnt
+
+
+def _worker_main(
+    worker_id: int,
+    logger_name: str,
+    url: str,
+    locale: list,
+    timeout: int,
+    max_cs: int,
+    adaptive_cs: bool,
+    control_queue: mp.queues.Queue,
+    task_queue: mp.queues.Queue,
+    remaining: mp.sharedctypes.Synchronized,
+    result_queue: mp.queues.Queue,
+    budget: ByteBudget | None,
+):
+    logger = logging.getLogger(f"{logger_name}.worker-{worker_id}")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(_ResultQueueHandler(result_queue))
+
+    while True:
+        message = control_queue.get()
+        if message is None:
+            break
+        batch_id, auth_token, max_bars_dict = message
+        start = time.perf_counter()
+        result_cnt = _run_worker_batch(
+            logger=logger,
+            worker_id=worker_id,
+            batch_id=batch_id,
+            auth_token=auth_token,
+            source=SharedPairSource(task_queue, remaining, batch_id),
+            result_queue=result_queue,
+            url=url,
+            locale=locale,
+            timeout=timeout,
+            max_cs=max_cs,
+            adaptive_cs=adaptive_cs,
+            max_bars_dict=max_bars_dict,
+            budget=budget,
+        )
+        stats = {
+            "pairs": result_cnt,
+            "busy": time.perf_counter() - start,
+            "metrics": get_metrics().take(),
+        }
+        result_queue.put((WorkerMessageType.DONE, worker_id, batch_id, stats))
+    close_worker_connection()
+
+
+class ScraperWorkerPool:
+    """Long-lived worker processes sharing one queue of pairs.
+
+    Each worker keeps its event loop, connection and chart sessions across
+    batches, and takes the next pair from the shared queue whenever one of
+    its chart sessions is free, so a worker given slow pairs takes fewer of
+    them instead of holding up the batch with a fixed chunk.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        num_processes: int,
+        url: str = URL,
+        locale: list = ["en", "US"],
+        timeout: int = 3,
+        max_cs: int = 10,
+        adaptive_cs: bool = False,
+        budget: ByteBudget | None = None,
+    ):
+        """
+        Args:
+            logger (logging.Logger): logger handling the records of the workers
+            num_processes (int): number of worker processes
+            url (str, optional): websocket url. Defaults to URL.
+            locale (list, optional): Defaults to ["en", "US"].
+            timeout (int, optional): Defaults to 3.
+            max_cs (int, optional): chart sessions per worker. Defaults to 10.
+            adaptive_cs (bool, optional): adapt the number of chart sessions
+                in flight of each worker, up to max_cs. Defaults to False.
+            budget (ByteBudget, optional): shared by the workers, the
+                consumer of iter_bars removes each result from it once
+                handled, the workers pause while it is full. Defaults to None.
+        """
+        self.logger = logger
+        self.num_processes = num_processes
+        self.url = url
+        self.locale = locale
+        self.timeout = timeout
+        self.max_cs = max_cs
+        self.adaptive_cs = adaptive_cs
+        self.budget = budget
+
+        self.processes: list[mp.Process] = []
+        self.control_queues: list[mp.queues.Queue] = []
+        self.task_queue: mp.queues.Queue | None = None
+        self.result_queue: mp.queues.Queue | None = None
+        self.remaining: mp.sharedctypes.Synchronized | None = None
+        self.batch_id = 0
+
+        # busy time and number of pairs of each worker in the last batch
+        self.worker_stats: list[dict] = []
+
+    def start(self):
+        if len(self.processes) > 0:
+            if all(process.is_alive() for process in self.processes):
+                return
+            self.logger.warning("Worker died, restarting the worker pool")
+            self.close()
+
+        self.task_queue = mp.Queue()
+        self.result_queue = mp.Queue()
+        self.remaining = mp.Value("i", 0)
+        self.control_queues = [mp.Queue() for _ in range(self.num_processes)]
+        self.processes = [
+            mp.Process(
+                target=_worker_main,
+                args=(
+                    worker_id,
+                    self.logger.name,
+                    self.url,
+                    self.locale,
+                    self.timeout,
+                    self.max_cs,
+                    self.adaptive_cs,
+                    self.control_queues[worker_id],
+                    self.task_queue,
+                    self.remaining,
+                    self.result_queue,
+                    self.budget,
+                ),
+                daemon=True,
+            )
+            for worker_id in range(self.num_processes)
+        ]
+        for process in self.processes:
+            process.start()
+
+    def close(self):
+        for control_queue, process in zip(self.control_queues, self.processes):
+            if process.is_alive():
+                control_queue.put(None)
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self.processes = []
+        self.control_queues = []
+        self.task_queue = None
+        self.result_queue = None
+        self.remaining = None
+
+    def iter_bars(
+        self,
+        auth_token: str,
+        symbol_pair_list: list[tuple[str, str]],
+        max_bars_dict: dict[tuple[str, str], int] | None = None,
+    ) -> Iterator[tuple[str, str, Bars | None, dict]]:
+        """iterate the bars of the pairs as they are received by the workers
+
+        Args:
+            auth_token (str)
+            symbol_pair_list (list[tuple[str, str]])
+            max_bars_dict (dict, optional): bars to request per pair.
+                Defaults to None.
+
+        Yields:
+            tuple[str, str, Bars | None, dict]: (symbol, interval, bars, detail)
+        """
+        self.start()
+        self.batch_id += 1
+        batch_id = self.batch_id
+        start = time.perf_counter()
+
+        SharedPairSource(self.task_queue, self.remaining, batch_id).put(
+            symbol_pair_list
+        )
+        for control_queue in self.control_queues:
+            control_queue.put((batch_id, auth_token, max_bars_dict))
+
+        worker_stats: dict[int, dict] = {}
+        result_cnt = 0
+        finished = False
+        try:
+            while len(worker_stats) < self.num_processes:
+                try:
+                    message = self.result_queue.get(timeout=1)
+                except queue.Empty:
+                    for worker_id, process in enumerate(self.processes):
+                        if worker_id not in worker_stats and not process.is_alive():
+                            self.logger.error(f"Worker {worker_id} died")
+                            worker_stats[worker_id] = {"pairs": 0, "busy": 0.0}
+                    continue
+                if message[0] == WorkerMessageType.LOG:
+                    if self.logger.isEnabledFor(message[1].levelno):
+                        self.logger.handle(message[1])
+                    continue
+                message_type, worker_id, message_batch_id, payload = message
+                if message_batch_id != batch_id:
+                    continue
+                if message_type == WorkerMessageType.DONE:
+                    # the metrics of the workers add up in this process
+                    get_metrics().merge(payload.pop("metrics"))
+                    worker_stats[worker_id] = payload
+                else:
+                    result_cnt += 1
+                    yield payload
+            finished = True
+        finally:
+            if not finished:
+                # the workers are still busy with this batch
+                self.close()
+
+        duration = time.perf_counter() - start
+        self.worker_stats = [
+            worker_stats[worker_id] for worker_id in range(self.num_processes)
+        ]
+        self.logger.info(
+            "Got bars for {}/{} pairs in {:.2f} sec with {} workers".format(
+                result_cnt, len(symbol_pair_list), duration, self.num_processes
+            )
+        )
+        self.logger.info(
+            "Worker utilization: {}".format(
+                ", ".join(
+                    "{}: {:.0%} ({} pairs)".format(
+                        worker_id,
+                        stats["busy"] / duration if duration > 0 else 0.0,
+                        stats["pairs"],
+                    )
+                    for worker_id, stats in enumerate(self.worker_stats)
+                )
+            )
+        )
@@ -0,0 +1,171 @@
+import io
+import os
+import zlib
+import struct
+import numpy as np
+from ..services.bars import Bars
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# extension of the archived partitions
+ARCHIVE_EXTENSION = ".tvz"
+# magic, format version, codec, values per bar, padding
+HEADER = struct.Struct("<4sHHH6x")
+# offset of the block index, number of blocks, magic
+TRAILER = struct.Struct("<QQ4s4x")
+MAGIC = b"TVBA"
+VERSION = 1
+# codecs of the blocks, zstd when zstandard is installed, else zlib (deflate,
+# as gzip) of the standard library
+CODEC_ZLIB, CODEC_ZSTD = range(2)
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+# bars per block, a range read decompresses the blocks it overlaps
+BLOCK_BARS = 4096
+# first and last timestamp, offset, compressed size and bars of each block
+INDEX_DTYPE = np.dtype(
+    [
+        ("first_ts", "<i8"),
+        ("last_ts", "<i8"),
+        ("offset", "<u8"),
+        ("size", "<u8"),
+        ("bar_cnt", "<u8"),
+    ]
+)
+
+
+def get_default_codec() -> int:
+    return CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+
+
+def _compress(codec: int, data: bytes) -> bytes:
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return zlib.compress(data, ZLIB_LEVEL)
+
+
+def _decompress(codec: int, data: bytes) -> bytes:
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("zstandard is needed to read a zstd archive")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def _encode_block(bars: Bars) -> bytes:
+    """timestamp deltas (the first one from 0) then the values, column by
+    column, so that each column compresses on its own"""
+    deltas = np.diff(bars.ts.astype("<i8"), prepend=0)
+    values = np.ascontiguousarray(bars.values.T, dtype="<f8")
+    return deltas.tobytes() + values.tobytes()
+
+
+def _decode_block(data: bytes, bar_cnt: int, width: int) -> Bars:
+    ts = np.cumsum(np.frombuffer(data, dtype="<i8", count=bar_cnt))
+    values = np.frombuffer(data, dtype="<f8", offset=8 * bar_cnt)
+    return Bars(ts.astype(np.int64), values.reshape(width, bar_cnt).T.copy())
+
+
+def write_archive(
+    filepath: str,
+    bars: Bars,
+    codec: int | None = None,
+    block_bars: int = BLOCK_BARS,
+) -> int:
+    """Write bars to a compressed archive of blocks
+
+    The blocks are followed by their index and a trailer pointing to it, the
+    file is written aside and moved in place.
+
+    Args:
+        filepath (str)
+        bars (Bars)
+        codec (int | None, optional): None for get_default_codec().
+            Defaults to None.
+        block_bars (int, optional): Defaults to BLOCK_BARS.
+
+    Returns:
+        int: size of the archive
+    """
+    if codec is None:
+        codec = get_default_codec()
+    width = bars.width if len(bars) > 0 else 0
+    starts = range(0, len(bars), block_bars)
+    index = np.empty(len(starts), dtype=INDEX_DTYPE)
+    tmp_filepath = filepath + ".tmp"
+    with open(tmp_filepath, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, codec, width))
+        for i, start in enumerate(starts):
+            block = bars[start : start + block_bars]
+            data = _compress(codec, _encode_block(block))
+            index[i] = (block.ts[0], block.ts[-1], f.tell(), len(data), len(block))
+            f.write(data)
+        index_offset = f.tell()
+        f.write(index.tobytes())
+        f.write(TRAILER.pack(index_offset, len(index), MAGIC))
+        file_size = f.tell()
+    os.replace(tmp_filepath, filepath)
+    return file_size
+
+
+def f_read_index(file: io.BufferedReader) -> tuple[int, int, np.ndarray]:
+    """Get the codec, the values per bar and the block index of an archive
+
+    Raises:
+        ValueError: the file is not an archive
+    """
+    file.seek(0, os.SEEK_SET)
+    header = file.read(HEADER.size)
+    file.seek(-TRAILER.size, os.SEEK_END)
+    trailer = file.read(TRAILER.size)
+    if len(header) < HEADER.size or len(trailer) < TRAILER.size:
+        raise ValueError(f"{file.name}: truncated archive")
+    magic, version, codec, width = HEADER.unpack(header)
+    index_offset, block_num, trailer_magic = TRAILER.unpack(trailer)
+    if magic != MAGIC or trailer_magic != MAGIC or version != VERSION:
+        raise ValueError(f"{file.name}: not an archive of version {VERSION}")
+    file.seek(index_offset, os.SEEK_SET)
+    index = np.frombuffer(
+        file.read(block_num * INDEX_DTYPE.itemsize), dtype=INDEX_DTYPE
+    )
+    return codec, width, index
+
+
+def read_bars(
+    filepath: str, start_ts: float | None = None, end_ts: float | None = None
+) -> Bars:
+    """Read the bars with start_ts <= timestamp <= end_ts of an archive, only
+    the blocks overlapping the range are read and decompressed"""
+    with open(filepath, "rb") as f:
+        codec, width, index = f_read_index(f)
+        mask = np.ones(len(index), dtype=bool)
+        if start_ts is not None:
+            mask &= index["last_ts"] >= start_ts
+        if end_ts is not None:
+            mask &= index["first_ts"] <= end_ts
+        bars_list = []
+        for block in index[mask]:
+            f.seek(int(block["offset"]), os.SEEK_SET)
+            data = _decompress(codec, f.read(int(block["size"])))
+            bars_list.append(_decode_block(data, int(block["bar_cnt"]), width))
+    if len(bars_list) == 0:
+        return Bars(np.empty(0, dtype=np.int64), np.empty((0, width)))
+    ts = np.concatenate([bars.ts for bars in bars_list])
+    values = np.concatenate([bars.values for bars in bars_list])
+    left = 0 if start_ts is None else int(np.searchsorted(ts, start_ts, "left"))
+    right = len(ts) if end_ts is None else int(np.searchsorted(ts, end_ts, "right"))
+    return Bars(ts[left:right], values[left:right])
+
+
+def get_summary(filepath: str) -> list:
+    """Get the last timestamp, the number of bars and the size of an archive,
+    from its index"""
+    with open(filepath, "rb") as f:
+        _, _, index = f_read_index(f)
+        f.seek(0, os.SEEK_END)
+        file_size = f.tell()
+    last_ts = float(index["last_ts"][-1]) if len(index) > 0 else None
+    return [last_ts, int(index["bar_cnt"].sum()), file_size]
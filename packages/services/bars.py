@@ -0,0 +1,77 @@
+import numpy as np
+from ..services.csv_format import format_bars
+
+
+class Bars:
+    """Bars of a series in columns.
+
+    `ts` holds the int64 timestamps and `values` the float64 values of each
+    bar (open, high, low, close and volume when available), one row per bar.
+    """
+
+    __slots__ = ("ts", "values")
+
+    def __init__(self, ts: np.ndarray, values: np.ndarray):
+        assert len(ts) == len(values), "ts and values must have the same length"
+        self.ts = ts
+        self.values = values
+
+    @classmethod
+    def from_series(cls, series: list[dict]) -> "Bars":
+        """Decode the "s" array of a timescale_update
+
+        A None value is read as nan and the bars with fewer values than the
+        others are padded with nan, as empty fields of the csv, so that one
+        bad bar does not cost the whole series. The bars without a timestamp
+        are dropped.
+
+        Args:
+            series (list[dict]): list of {"i": index, "v": [ts, open, ...]}
+
+        Raises:
+            ValueError: a bar has no "v", or the bars have no value besides
+                the timestamp
+
+        Returns:
+            Bars
+        """
+        if len(series) == 0:
+            return cls(np.empty(0, dtype=np.int64), np.empty((0, 0)))
+        try:
+            bar_values = [bar["v"] for bar in series]
+            try:
+                rows = np.array(bar_values, dtype=np.float64)
+            except ValueError:
+                # bars of different lengths
+                rows = np.full((len(bar_values), max(map(len, bar_values))), np.nan)
+                for row, values in zip(rows, bar_values):
+                    row[: len(values)] = values
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"invalid bar: {e!r}")
+        if rows.ndim != 2 or rows.shape[1] < 2:
+            raise ValueError(f"invalid bars of shape {rows.shape}")
+        rows = rows[~np.isnan(rows[:, 0])]
+        return cls(rows[:, 0].astype(np.int64), rows[:, 1:])
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def __getitem__(self, key: slice | np.ndarray) -> "Bars":
+        return Bars(self.ts[key], self.values[key])
+
+    @property
+    def width(self) -> int:
+        """number of values of each bar, without the timestamp"""
+        return self.values.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        return self.ts.nbytes + self.values.nbytes
+
+    def rows(self) -> np.ndarray:
+        """bars as float64 rows of [ts, open, ...], as they are stored"""
+        return np.column_stack((self.ts.astype(np.float64), self.values))
+
+    def to_csv(self) -> str:
+        """csv lines of the bars, see csv_format.format_bars"""
+        return format_bars(self.ts, self.values).decode("ascii")
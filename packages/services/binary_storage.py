@@ -0,0 +1,163 @@
+import io
+import os
+import mmap
+import struct
+import numpy as np
+from ..services.bars import Bars
+
+# magic, format version, values per record (0 until the first bars), padding
+HEADER = struct.Struct("<4sHH8x")
+MAGIC = b"TVBR"
+VERSION = 1
+
+
+def get_record_dtype(width: int) -> np.dtype:
+    """little-endian int64 timestamp followed by width float64 values"""
+    return np.dtype([("ts", "<i8"), ("values", "<f8", (width,))])
+
+
+def f_read_header(file: io.BufferedReader) -> int:
+    """Get the values per record of the file
+
+    Raises:
+        ValueError: the file is not a binary bar file
+    """
+    file.seek(0, os.SEEK_SET)
+    data = file.read(HEADER.size)
+    if len(data) < HEADER.size:
+        raise ValueError(f"{file.name}: truncated header")
+    magic, version, width = HEADER.unpack(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{file.name}: not a binary bar file of version {VERSION}")
+    return width
+
+
+def f_write_header(file: io.BufferedRandom, width: int):
+    file.seek(0, os.SEEK_SET)
+    file.write(HEADER.pack(MAGIC, VERSION, width))
+
+
+def f_get_record_num(file: io.BufferedReader, width: int) -> int:
+    """Number of complete records, a partly written last record is ignored"""
+    if width == 0:
+        return 0
+    file.seek(0, os.SEEK_END)
+    return (file.tell() - HEADER.size) // get_record_dtype(width).itemsize
+
+
+def f_get_last_ts(file: io.BufferedReader) -> float | None:
+    """Get the timestamp of the last record, one read at a known offset"""
+    width = f_read_header(file)
+    record_num = f_get_record_num(file, width)
+    if record_num == 0:
+        return None
+    file.seek(HEADER.size + (record_num - 1) * get_record_dtype(width).itemsize)
+    return float(np.frombuffer(file.read(8), dtype="<i8")[0])
+
+
+def f_truncate_records(file: io.BufferedRandom, width: int, record_idx: int):
+    """Drop the records from record_idx on"""
+    file.truncate(HEADER.size + record_idx * get_record_dtype(width).itemsize)
+
+
+def f_append_bars(file: io.BufferedRandom, width: int, bars: Bars):
+    """Append the bars after the last complete record in one write"""
+    records = np.empty(len(bars), dtype=get_record_dtype(width))
+    records["ts"] = bars.ts
+    records["values"] = bars.values
+    f_truncate_records(file, width, f_get_record_num(file, width))
+    file.seek(0, os.SEEK_END)
+    file.write(records.tobytes())
+
+
+def f_read_bars(
+    file: io.BufferedReader,
+    start_ts: float | None = None,
+    end_ts: float | None = None,
+) -> Bars:
+    """Read the records with start_ts <= timestamp <= end_ts
+
+    The file is memory-mapped and the range found by binary search on the
+    timestamps, only the pages of the search and of the range are read.
+
+    Args:
+        file (io.BufferedReader)
+        start_ts (float | None, optional): None from the first record.
+            Defaults to None.
+        end_ts (float | None, optional): None to the last record.
+            Defaults to None.
+
+    Returns:
+        Bars
+    """
+    width = f_read_header(file)
+    record_num = f_get_record_num(file, width)
+    if record_num == 0:
+        return Bars(np.empty(0, dtype=np.int64), np.empty((0, width)))
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        records = np.frombuffer(
+            mm, dtype=get_record_dtype(width), count=record_num, offset=HEADER.size
+        )
+        left = 0
+        right = record_num
+        if start_ts is not None:
+            left = int(np.searchsorted(records["ts"], start_ts, side="left"))
+        if end_ts is not None:
+            right = int(np.searchsorted(records["ts"], end_ts, side="right"))
+        ts = records["ts"][left:right].astype(np.int64)
+        values = records["values"][left:right].astype(np.float64)
+        # the views must be released before the map is closed
+        del records
+    return Bars(ts, values)
+
+
+def map_records(
+    filepath: str, start_ts: float | None = None, end_ts: float | None = None
+) -> np.ndarray:
+    """Get the records with start_ts <= timestamp <= end_ts as a view of the
+    memory-mapped file, nothing is read but the pages of the binary search
+
+    The map stays open while the view, or an array taken from it, is
+    referenced. The last records are rewritten when overlapping bars are
+    written, copy them to keep them while the file may be written.
+
+    Returns:
+        np.ndarray: records of get_record_dtype(width)
+    """
+    with open(filepath, "rb") as f:
+        width = f_read_header(f)
+        record_num = f_get_record_num(f, width)
+        dtype = get_record_dtype(width)
+        if record_num == 0:
+            return np.empty(0, dtype=dtype)
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    records = np.frombuffer(mm, dtype=dtype, count=record_num, offset=HEADER.size)
+    left = 0
+    right = record_num
+    if start_ts is not None:
+        left = int(np.searchsorted(records["ts"], start_ts, side="left"))
+    if end_ts is not None:
+        right = int(np.searchsorted(records["ts"], end_ts, side="right"))
+    return records[left:right]
+
+
+def get_last_ts(filepath: str) -> float | None:
+    try:
+        with open(filepath, "rb") as f:
+            return f_get_last_ts(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_bars(
+    filepath: str, start_ts: float | None = None, end_ts: float | None = None
+) -> Bars:
+    """Read the bars of a binary file in a range, see f_read_bars"""
+    with open(filepath, "rb") as f:
+        return f_read_bars(f, start_ts, end_ts)
+
+
+def write_empty_file(filepath: str):
+    if not os.path.exists(filepath):
+        with open(filepath, "wb") as f:
+            f_write_header(f, 0)
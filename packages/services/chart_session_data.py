@@ -1,4 +1,5 @@
 import json
+import time
 from ..services.websockets import create_message
 
 
@@ -8,11 +9,17 @@ class ChartSessionData:
         self.cs_id = cs_id
         self.series_idx = 0
         self.current_symbol_pair = None
-
-        # received data pairs
-        self.bars_list = []
-        self.symbol_pair_list = []
-        self.detail_list = []
+        self.request_time = 0.0
+        # last request or message of the current series
+        self.activity_time = 0.0
+        # max_bars of the current series, modify_series cannot change it
+        self.max_bars = 0
+        # what the server told about the current pair
+        self.data_frequency: str | None = None
+        self.error: str | None = None
+        # symbol resolved on the session, reused by its following intervals
+        self.resolved_symbol: str | None = None
+        self.symbol_idx = 0
 
     def _series_payload(self, idx, interval: str, max_bars: int):
         payload = [
@@ -26,7 +33,7 @@ class ChartSessionData:
         ]
 
         # max_bars is not needed for modify_series
-        if self.series_idx != 0:
+        if self.max_bars == max_bars:
             payload.pop(-2)
         return payload
 
@@ -48,14 +55,28 @@ class ChartSessionData:
         self, ws, idx, symbol_pair: tuple[str, str], max_bars: int = 50000
     ):
         self.current_symbol_pair = symbol_pair
+        self.request_time = time.perf_counter()
+        self.activity_time = self.request_time
+        self.error = None
         symbol, interval = symbol_pair
 
-        # resolve symbol
-        await ws.send(
-            create_message("resolve_symbol", self._resolve_payload(idx, symbol))
-        )
-        func_name = "create_series" if self.series_idx == 0 else "modify_series"
+        if symbol != self.resolved_symbol:
+            # resolve symbol
+            self.data_frequency = None
+            await ws.send(
+                create_message("resolve_symbol", self._resolve_payload(idx, symbol))
+            )
+            self.resolved_symbol = symbol
+            self.symbol_idx = idx
+        idx = self.symbol_idx
+        if self.series_idx != 0 and self.max_bars != max_bars:
+            # a series with another max_bars is needed
+            await ws.send(
+                create_message("remove_series", [self.cs_id, f"sds_{self.chart_idx}"])
+            )
+        func_name = "modify_series" if self.max_bars == max_bars else "create_series"
         await ws.send(
             create_message(func_name, self._series_payload(idx, interval, max_bars))
         )
+        self.max_bars = max_bars
         self.series_idx += 1
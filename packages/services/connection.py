@@ -0,0 +1,119 @@
+import logging
+
+from websockets import client
+
+from ..constants.websockets import HEADER, ORIGIN, URL
+from ..schedulers.concurrency_controller import ConcurrencyController
+from ..services.chart_session_data import ChartSessionData
+from ..services.websockets import (
+    create_message,
+    generate_chart_session_id,
+    ws_client_send_auth_token,
+    ws_client_send_init,
+)
+
+
+class TradingViewConnection:
+    """Long-lived websocket connection with its authenticated chart sessions.
+
+    The connection is opened on first use and reused across batches, the
+    chart sessions are kept open between batches. If the socket is closed it
+    is reopened (with new chart sessions) on the next `ensure`, and a rotated
+    auth token is re-sent on the open socket.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        url: str = URL,
+        locale: list = ["en", "US"],
+    ):
+        self.logger = logger
+        self.url = url
+        self.locale = locale
+
+        self.ws: client.WebSocketClientProtocol | None = None
+        self.auth_token: str | None = None
+        self.cs_id_list: list[str] = []
+        self.cs_info: dict[str, ChartSessionData] = {}
+
+        # symbol ids must stay unique for the whole life of the connection
+        self.symbol_idx = 0
+        self.connect_cnt = 0
+
+        # window of chart sessions in flight, learnt across batches
+        self.controller: ConcurrencyController | None = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.ws is not None and self.ws.open
+
+    def next_symbol_idx(self) -> int:
+        idx = self.symbol_idx
+        self.symbol_idx += 1
+        return idx
+
+    async def connect(self, auth_token: str):
+        await self.close()
+        self.ws = await client.connect(
+            self.url,
+            origin=ORIGIN,  # type: ignore
+            max_size=None,
+            extra_headers=HEADER,
+        )
+        self.connect_cnt += 1
+        self.auth_token = auth_token
+        await ws_client_send_init(self.ws, auth_token, self.locale)
+
+    async def create_chart_session(self) -> ChartSessionData:
+        assert self.ws is not None, "connection is not open"
+        cs_id = generate_chart_session_id()
+        cs_data = ChartSessionData(len(self.cs_id_list), cs_id)
+        self.cs_id_list.append(cs_id)
+        self.cs_info[cs_id] = cs_data
+
+        await self.ws.send(create_message("chart_create_session", [cs_id, ""]))
+
+        # switch timezone
+        await self.ws.send(create_message("switch_timezone", [cs_id, "Etc/UTC"]))
+        return cs_data
+
+    async def delete_chart_session(self, cs_id: str):
+        """Drop a chart session, e.g. when its series is left in an unknown state"""
+        if cs_id not in self.cs_info:
+            return
+        self.cs_id_list.remove(cs_id)
+        self.cs_info.pop(cs_id)
+        if self.is_open:
+            await self.ws.send(create_message("chart_delete_session", [cs_id]))
+
+    async def ensure(self, auth_token: str, num_cs: int) -> list[ChartSessionData]:
+        """Make sure the connection is open, authenticated with auth_token and
+        has at least num_cs chart sessions
+
+        Returns:
+            list[ChartSessionData]: the first num_cs chart sessions
+        """
+        if not self.is_open:
+            if self.ws is not None:
+                self.logger.warning("Connection closed, reconnecting...")
+            await self.connect(auth_token)
+        elif auth_token != self.auth_token:
+            self.logger.info("Auth token rotated, re-sending it")
+            assert self.ws is not None
+            await ws_client_send_auth_token(self.ws, auth_token)
+            self.auth_token = auth_token
+
+        while len(self.cs_id_list) < num_cs:
+            await self.create_chart_session()
+        return [self.cs_info[cs_id] for cs_id in self.cs_id_list[:num_cs]]
+
+    async def close(self):
+        if self.ws is not None:
+            try:
+                await self.ws.close()
+            except Exception:
+                pass
+        self.ws = None
+        self.cs_id_list = []
+        self.cs_info = {}
@@ -0,0 +1,56 @@
+import numpy as np
+
+# the values are formatted once per distinct value when they repeat this much,
+# as the prices of a series on a tick grid and round volumes do
+UNIQUE_RATIO = 0.5
+# bars of the sample counting the distinct values
+SAMPLE_BARS = 1024
+
+
+def _format_values(values: np.ndarray) -> list[list[str]]:
+    """repr of each value, by column
+
+    repr is the shortest string that parses back to the same float, so the
+    same value is always written the same way. np.unique does not tell
+    -0.0 from 0.0, the zeros are written by their sign.
+    """
+    sample = values[:SAMPLE_BARS]
+    if len(np.unique(sample)) > UNIQUE_RATIO * sample.size:
+        return [list(map(repr, column)) for column in values.T.tolist()]
+    unique, inverse = np.unique(values, return_inverse=True)
+    table = np.array(list(map(repr, unique.tolist())), dtype=object)
+    cells = table[inverse.reshape(values.shape)]
+    zero = values == 0
+    if zero.any():
+        negative = np.signbit(values)
+        cells[zero & negative] = "-0.0"
+        cells[zero & ~negative] = "0.0"
+    return [column.tolist() for column in cells.T]
+
+
+def format_bars(ts: np.ndarray, values: np.ndarray) -> bytes:
+    """csv lines of bars, formatted in bulk into one buffer
+
+    The timestamps are written as integers ("1693550000") and the values with
+    repr ("1.25", "100.0", "nan").
+
+    Args:
+        ts (np.ndarray): timestamps, one per bar
+        values (np.ndarray): float64 values, one row per bar
+
+    Returns:
+        bytes: the lines, each ending with "\\n"
+    """
+    if len(ts) == 0:
+        return b""
+    columns = [map(str, np.asarray(ts, dtype=np.int64).tolist())]
+    columns.extend(_format_values(np.asarray(values, dtype=np.float64)))
+    lines = "\n".join(map(",".join, zip(*columns)))
+    return (lines + "\n").encode("ascii")
+
+
+def format_rows(rows: np.ndarray) -> bytes:
+    """csv lines of float64 rows of [ts, open, ...], as format_bars"""
+    if len(rows) == 0:
+        return b""
+    return format_bars(rows[:, 0], rows[:, 1:])
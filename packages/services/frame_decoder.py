@@ -0,0 +1,183 @@
+import re
+import json
+
+from ..types.frame import FrameType
+
+HEADER_MARK = "~m~"
+HEARTBEAT_MARK = "~h~"
+MESSAGE_PREFIX = '{"m":"'
+
+# "~m~" + up to 12 length digits + "~m~"
+MAX_HEADER_LENGTH = 18
+HEADER_PATTERN = re.compile(r"~m~\d{1,12}~m~")
+# the start of a header split across messages, at the end of the buffer
+HEADER_START_PATTERN = re.compile(r"~(m(~(\d{0,12}(~m?)?)?)?)?")
+# the payload length may be counted in UTF-16 code units (javascript) or in
+# UTF-8 bytes rather than in characters, they only differ for non-ASCII
+# payloads, as (encoding, bytes per unit)
+LENGTH_UNITS = [("utf-16-le", 2), ("utf-8", 1)]
+
+_HEARTBEAT = FrameType.HEARTBEAT
+_MESSAGE = FrameType.MESSAGE
+_OTHER = FrameType.OTHER
+
+
+class Frame:
+    """A single decoded `~m~<len>~m~<payload>` frame.
+
+    The payload is kept as the raw string and only parsed as json on first
+    access of `data`, so frames whose content is not needed cost nothing.
+    """
+
+    __slots__ = ("frame_type", "m", "payload", "_data")
+
+    def __init__(self, frame_type: FrameType, payload: str, m: str | None = None):
+        self.frame_type = frame_type
+        self.payload = payload
+        self.m = m
+        self._data = None
+
+    @property
+    def data(self) -> dict:
+        if self._data is None:
+            self._data = json.loads(self.payload)
+        return self._data
+
+    def encode(self) -> str:
+        """Re-frame the payload, e.g. to echo a heartbeat back to the server"""
+        return f"{HEADER_MARK}{len(self.payload)}{HEADER_MARK}{self.payload}"
+
+
+def _is_frame_end(buf: str, pos: int, end: int) -> bool:
+    """pos is followed by a header, the start of one or the end of buf"""
+    if pos == end or HEADER_PATTERN.match(buf, pos) is not None:
+        return True
+    return HEADER_START_PATTERN.fullmatch(buf, pos) is not None
+
+
+def _find_payload_end(buf: str, start: int, length: int, end: int) -> int | None:
+    """End of a payload of length UTF-16 code units or UTF-8 bytes, when it is
+    followed by a header or the end of the buffer"""
+    data = buf[start : min(start + length, end)]
+    if data.isascii():
+        return None
+    for encoding, unit in LENGTH_UNITS:
+        encoded = data.encode(encoding, "surrogatepass")
+        if len(encoded) < length * unit:
+            continue
+        try:
+            payload = encoded[: length * unit].decode(encoding)
+        except UnicodeDecodeError:
+            # not on a character boundary
+            continue
+        payload_end = start + len(payload)
+        if _is_frame_end(buf, payload_end, end):
+            return payload_end
+    return None
+
+
+class FrameDecoder:
+    """Incremental decoder for the tradingview websocket framing.
+
+    This is the inverse of `prepend_header`: it walks the `~m~<len>~m~`
+    headers by length instead of scanning the payload, handles several frames
+    packed into one message and keeps a partial frame buffered until the rest
+    of it arrives in a following message.
+
+    Invalid data is skipped up to the next header rather than dropping the
+    buffer, and a payload whose length does not end on a header is measured
+    again in UTF-16 code units and UTF-8 bytes, see `_find_payload_end`. The
+    skipped data of the last `feed` is described in `errors`.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.errors: list[str] = []
+
+    def reset(self):
+        self.buffer = ""
+
+    def _resync(self, buf: str, pos: int, reason: str) -> int:
+        """Position of the next header after pos, the data before it is
+        skipped"""
+        match = HEADER_PATTERN.search(buf, pos + 1)
+        if match is not None:
+            next_pos = match.start()
+        else:
+            # keep what may be the start of a header split across messages
+            next_pos = buf.find("~", max(pos + 1, len(buf) - MAX_HEADER_LENGTH))
+            if next_pos == -1:
+                next_pos = len(buf)
+        self.errors.append(
+            f"{reason} at {pos}, skipped {next_pos - pos} chars: {buf[pos:pos + 20]!r}"
+        )
+        return next_pos
+
+    def feed(self, message: str | bytes) -> list[Frame]:
+        """Decode every complete frame in the buffered data plus `message`
+
+        Args:
+            message (str | bytes): a message received from the websocket
+
+        Raises:
+            UnicodeDecodeError: message is bytes but not UTF-8
+
+        Returns:
+            list[Frame]: the complete frames, in order
+        """
+        if isinstance(message, bytes):
+            message = message.decode("utf-8")
+        buf = self.buffer + message if self.buffer else message
+
+        self.errors = []
+        frames = []
+        pos = 0
+        end = len(buf)
+        while pos < end:
+            if not buf.startswith(HEADER_MARK, pos):
+                if HEADER_MARK.startswith(buf[pos:]):
+                    # header mark is split across messages
+                    break
+                pos = self._resync(buf, pos, "Invalid frame header")
+                continue
+
+            len_end = buf.find(HEADER_MARK, pos + 3, pos + MAX_HEADER_LENGTH)
+            if len_end == -1:
+                if HEADER_START_PATTERN.fullmatch(buf, pos):
+                    # header is split across messages
+                    break
+                pos = self._resync(buf, pos, "Invalid frame header")
+                continue
+
+            length_str = buf[pos + 3 : len_end]
+            if not length_str.isdecimal():
+                pos = self._resync(buf, pos, "Invalid frame length")
+                continue
+
+            payload_start = len_end + 3
+            length = int(length_str)
+            payload_end = payload_start + length
+            if payload_end != end and HEADER_PATTERN.match(buf, payload_end) is None:
+                # the length may be counted in other units than characters,
+                # else the start of a header split across messages or invalid
+                # data, skipped next, follows the frame
+                alt_end = _find_payload_end(buf, payload_start, length, end)
+                if alt_end is not None:
+                    payload_end = alt_end
+                elif payload_end > end:
+                    # payload is split across messages
+                    break
+
+            # classify by prefix, the payload is only parsed on demand
+            payload = buf[payload_start:payload_end]
+            if payload.startswith(HEARTBEAT_MARK):
+                frames.append(Frame(_HEARTBEAT, payload))
+            elif payload.startswith(MESSAGE_PREFIX):
+                m = payload[6 : payload.find('"', 6)]
+                frames.append(Frame(_MESSAGE, payload, m))
+            else:
+                frames.append(Frame(_OTHER, payload))
+            pos = payload_end
+
+        self.buffer = buf[pos:] if pos < end else ""
+        return frames
@@ -0,0 +1,217 @@
+import os
+import bisect
+from ..constants.websockets import RESPONSE_TYPE
+
+# upper bounds of the histogram buckets in seconds, 4 per decade from 10us
+# to 100s, the same in every process so that histograms can be merged
+LATENCY_BUCKETS = tuple(float(f"{10 ** (e / 4):.3g}") for e in range(-20, 9))
+
+# metrics of this process, recorded by every BarsBatch
+_metrics_pid: int | None = None
+_metrics: "ScraperMetrics | None" = None
+
+
+class Histogram:
+    """Counts of the observed values per bucket, with their sum.
+
+    A value falls in the first bucket whose upper bound is larger than or
+    equal to it, or in the last (+Inf) bucket. Histograms with the same
+    bounds are merged by adding their counts.
+    """
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other: "Histogram"):
+        if self.bounds != other.bounds:
+            raise ValueError("Cannot merge histograms with different buckets")
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.sum += other.sum
+        self.count += other.count
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q quantile, 0 if empty"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return self.bounds[-1]
+
+    def prometheus_lines(self, name: str, labels: str = "") -> list[str]:
+        """Lines of the histogram in the prometheus text format
+
+        Args:
+            name (str): metric name
+            labels (str, optional): e.g. 'm="du"'. Defaults to "".
+        """
+        prefix = f"{labels}," if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+
+class ScraperMetrics:
+    """What the scraper received and where the time went.
+
+    Per message type (the keys of RESPONSE_TYPE, "heartbeat" and "other"):
+    the number of frames, their bytes and the time spent parsing their json.
+    Per websocket message: its bytes and the time spent splitting it into
+    frames. Per pair: the latency from send_request to its result, by
+    status. Per result: the time spent handling it on the engine thread and
+    per file write the time spent writing it (see WriterPool).
+
+    The metrics of the worker processes are sent back with their results and
+    merged into the metrics of the process owning the pool, see get_metrics.
+    """
+
+    def __init__(self):
+        self.message_cnt: dict[str, int] = {}
+        self.message_bytes: dict[str, int] = {}
+        self.parse_time: dict[str, Histogram] = {}
+        self.recv_cnt = 0
+        self.recv_bytes = 0
+        self.decode_time = Histogram()
+        self.latency: dict[str, Histogram] = {}
+        self.handle_time = Histogram()
+        self.write_time = Histogram()
+
+    def record_message(self, m: str | None, size: int):
+        key = m if m in RESPONSE_TYPE or m == "heartbeat" else "other"
+        self.message_cnt[key] = self.message_cnt.get(key, 0) + 1
+        self.message_bytes[key] = self.message_bytes.get(key, 0) + size
+
+    def record_parse(self, m: str | None, duration: float):
+        key = m if m in RESPONSE_TYPE else "other"
+        if key not in self.parse_time:
+            self.parse_time[key] = Histogram()
+        self.parse_time[key].observe(duration)
+
+    def record_recv(self, size: int, duration: float):
+        self.recv_cnt += 1
+        self.recv_bytes += size
+        self.decode_time.observe(duration)
+
+    def record_latency(self, status: str, duration: float):
+        if status not in self.latency:
+            self.latency[status] = Histogram()
+        self.latency[status].observe(duration)
+
+    def record_handle(self, duration: float):
+        self.handle_time.observe(duration)
+
+    def merge(self, other: "ScraperMetrics"):
+        for key, count in other.message_cnt.items():
+            self.message_cnt[key] = self.message_cnt.get(key, 0) + count
+        for key, size in other.message_bytes.items():
+            self.message_bytes[key] = self.message_bytes.get(key, 0) + size
+        for target, source in [
+            (self.parse_time, other.parse_time),
+            (self.latency, other.latency),
+        ]:
+            for key, histogram in source.items():
+                if key not in target:
+                    target[key] = Histogram(histogram.bounds)
+                target[key].merge(histogram)
+        self.recv_cnt += other.recv_cnt
+        self.recv_bytes += other.recv_bytes
+        self.decode_time.merge(other.decode_time)
+        self.handle_time.merge(other.handle_time)
+        self.write_time.merge(other.write_time)
+
+    def take(self) -> "ScraperMetrics":
+        """Get the metrics recorded so far and start over"""
+        metrics = ScraperMetrics()
+        metrics.merge(self)
+        self.__init__()
+        return metrics
+
+    def to_prometheus(self, prefix: str = "tv_scraper") -> str:
+        """Export the metrics in the prometheus text format"""
+        lines = [f"# TYPE {prefix}_messages_total counter"]
+        for key in sorted(self.message_cnt):
+            count = self.message_cnt[key]
+            lines.append(f'{prefix}_messages_total{{m="{key}"}} {count}')
+        lines.append(f"# TYPE {prefix}_message_bytes_total counter")
+        for key in sorted(self.message_bytes):
+            size = self.message_bytes[key]
+            lines.append(f'{prefix}_message_bytes_total{{m="{key}"}} {size}')
+        lines.append(f"# TYPE {prefix}_parse_seconds histogram")
+        for key in sorted(self.parse_time):
+            lines.extend(
+                self.parse_time[key].prometheus_lines(
+                    f"{prefix}_parse_seconds", f'm="{key}"'
+                )
+            )
+        lines.append(f"# TYPE {prefix}_received_bytes_total counter")
+        lines.append(f"{prefix}_received_bytes_total {self.recv_bytes}")
+        lines.append(f"# TYPE {prefix}_decode_seconds histogram")
+        lines.extend(self.decode_time.prometheus_lines(f"{prefix}_decode_seconds"))
+        lines.append(f"# TYPE {prefix}_pair_latency_seconds histogram")
+        for key in sorted(self.latency):
+            lines.extend(
+                self.latency[key].prometheus_lines(
+                    f"{prefix}_pair_latency_seconds", f'status="{key}"'
+                )
+            )
+        lines.append(f"# TYPE {prefix}_handle_seconds histogram")
+        lines.extend(self.handle_time.prometheus_lines(f"{prefix}_handle_seconds"))
+        lines.append(f"# TYPE {prefix}_write_seconds histogram")
+        lines.extend(self.write_time.prometheus_lines(f"{prefix}_write_seconds"))
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """One line telling where the time went"""
+        parse_sum = sum(histogram.sum for histogram in self.parse_time.values())
+        latency = Histogram()
+        for histogram in self.latency.values():
+            latency.merge(histogram)
+        top = sorted(self.message_bytes, key=self.message_bytes.get, reverse=True)
+        return (
+            "Received {:.1f} MB in {} messages ({}), decode {:.2f} sec, "
+            "parse {:.2f} sec, handle {:.2f} sec, write {:.2f} sec, "
+            "pair latency p50 {} p99 {} sec"
+        ).format(
+            self.recv_bytes / 1e6,
+            self.recv_cnt,
+            ", ".join(
+                "{}: {}/{:.1f} MB".format(
+                    key, self.message_cnt[key], self.message_bytes[key] / 1e6
+                )
+                for key in top[:3]
+            ),
+            self.decode_time.sum,
+            parse_sum,
+            self.handle_time.sum,
+            self.write_time.sum,
+            latency.quantile(0.5),
+            latency.quantile(0.99),
+        )
+
+
+def get_metrics() -> ScraperMetrics:
+    """Get the metrics of this process, a forked process starts empty"""
+    global _metrics_pid, _metrics
+    if _metrics is None or _metrics_pid != os.getpid():
+        _metrics_pid = os.getpid()
+        _metrics = ScraperMetrics()
+    return _metrics
@@ -0,0 +1,121 @@
+import os
+import json
+import fcntl
+import contextlib
+import numpy as np
+from ..constants.intervals import PARTITION_UNITS
+
+INDEX_VERSION = 1
+INDEX_FILENAME = "index.json"
+# locked while the index is read, updated and written back
+INDEX_LOCK_FILENAME = "index.lock"
+
+
+def is_partitioned(interval: str) -> bool:
+    """The bars of interval are stored in time partitions, see
+    PARTITION_UNITS"""
+    return interval in PARTITION_UNITS
+
+
+def get_partition_names(interval: str, ts: np.ndarray) -> np.ndarray:
+    """Name of the partition of each timestamp, its UTC day ("2023-09-01")
+    or month ("2023-09"), the names sort as the partitions"""
+    seconds = np.asarray(ts, dtype=np.int64).astype("datetime64[s]")
+    return np.datetime_as_string(seconds, unit=PARTITION_UNITS[interval])
+
+
+def split_by_partition(interval: str, ts: np.ndarray) -> list[tuple[str, slice]]:
+    """Split sorted timestamps into the runs of the same partition
+
+    Returns:
+        list[tuple[str, slice]]: name and slice of the timestamps of each
+            partition, in order
+    """
+    if len(ts) == 0:
+        return []
+    names = get_partition_names(interval, ts)
+    starts = np.concatenate(([0], np.flatnonzero(names[1:] != names[:-1]) + 1))
+    ends = np.append(starts[1:], len(ts))
+    return [(str(names[s]), slice(int(s), int(e))) for s, e in zip(starts, ends)]
+
+
+def list_partitions(series_dir: str, extension: str) -> list[str]:
+    """Names of the partition files of a series, oldest first"""
+    try:
+        filenames = os.listdir(series_dir)
+    except FileNotFoundError:
+        return []
+    return sorted(
+        filename[: -len(extension)]
+        for filename in filenames
+        if filename.endswith(extension)
+    )
+
+
+def select_partitions(
+    names: list[str], start_ts: float | None, end_ts: float | None
+) -> list[str]:
+    """Keep the partitions holding bars of start_ts <= timestamp <= end_ts"""
+    if len(names) == 0:
+        return names
+    unit = "D" if len(names[0]) == 10 else "M"
+    if start_ts is not None:
+        start = np.datetime_as_string(np.datetime64(int(start_ts), "s"), unit=unit)
+        names = [name for name in names if name >= start]
+    if end_ts is not None:
+        end = np.datetime_as_string(np.datetime64(int(end_ts), "s"), unit=unit)
+        names = [name for name in names if name <= end]
+    return names
+
+
+def get_partition_filepath(series_dir: str, name: str, extension: str) -> str:
+    return os.path.join(series_dir, f"{name}{extension}")
+
+
+def read_index(series_dir: str) -> dict[str, list]:
+    """Summaries of the sealed partitions of a series
+
+    A partition is sealed, and never written again, once bars of a later
+    partition are written. Its summary is recorded then, so that the series
+    is summarized without opening its older partitions.
+
+    Returns:
+        dict[str, list]: [last_ts, bar_cnt, file_size] by partition name
+    """
+    try:
+        with open(os.path.join(series_dir, INDEX_FILENAME), "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != INDEX_VERSION:
+        return {}
+    return data["partitions"]
+
+
+@contextlib.contextmanager
+def lock_index(series_dir: str):
+    """Hold the lock of the index of a series
+
+    The index is updated by the writes of the series (a partition is sealed)
+    and by compact_series (a partition is archived), which may run in other
+    threads or processes, each read, update and write back of the index is
+    done holding the lock so that no update is lost.
+    """
+    with open(os.path.join(series_dir, INDEX_LOCK_FILENAME), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def write_index(series_dir: str, partitions: dict[str, list]):
+    filepath = os.path.join(series_dir, INDEX_FILENAME)
+    tmp_filepath = filepath + ".tmp"
+    with open(tmp_filepath, "w") as f:
+        json.dump(
+            {"version": INDEX_VERSION, "partitions": partitions},
+            f,
+            separators=(",", ":"),
+        )
+    os.replace(tmp_filepath, filepath)
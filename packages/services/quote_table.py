@@ -0,0 +1,96 @@
+import numpy as np
+from ..constants.websockets import QUOTE_FIELDS
+
+
+class QuoteTable:
+    """Latest quote of each symbol, one row per symbol.
+
+    `values` holds the float64 value of each field (NaN until received),
+    `update_ts` the time of the last update of each row and `status` whether
+    the symbol is pending, ok or in error. A `qsd` only carries the fields
+    that changed, they are merged into the row.
+    """
+
+    PENDING = 0
+    OK = 1
+    ERROR = 2
+
+    def __init__(self, fields: list[str] = QUOTE_FIELDS):
+        self.fields = fields
+        self.field_idx = {field: i for i, field in enumerate(fields)}
+        self.symbol_idx: dict[str, int] = {}
+        self.symbol_list: list[str] = []
+        self.values = np.empty((0, len(fields)), dtype=np.float64)
+        self.update_ts = np.empty(0, dtype=np.float64)
+        self.status = np.empty(0, dtype=np.int8)
+
+    def __len__(self) -> int:
+        return len(self.symbol_list)
+
+    def add_symbols(self, symbol_list: list[str]) -> list[str]:
+        """Add rows for the new symbols
+
+        Returns:
+            list[str]: the symbols that were not in the table
+        """
+        new_symbol_list = []
+        for symbol in symbol_list:
+            if symbol not in self.symbol_idx:
+                self.symbol_idx[symbol] = len(self.symbol_list)
+                self.symbol_list.append(symbol)
+                new_symbol_list.append(symbol)
+        num = len(new_symbol_list)
+        if num > 0:
+            self.values = np.vstack(
+                (self.values, np.full((num, len(self.fields)), np.nan))
+            )
+            self.update_ts = np.concatenate((self.update_ts, np.zeros(num)))
+            self.status = np.concatenate(
+                (self.status, np.full(num, self.PENDING, dtype=np.int8))
+            )
+        return new_symbol_list
+
+    def update(self, symbol: str, status: str, v: dict, now: float) -> int | None:
+        """Merge the fields of a qsd into the row of symbol
+
+        Args:
+            symbol (str)
+            status (str): "ok" or "error"
+            v (dict): fields that changed
+            now (float): time of the update
+
+        Returns:
+            int | None: the row, None if symbol is not in the table
+        """
+        idx = self.symbol_idx.get(symbol)
+        if idx is None:
+            return None
+        if status == "error":
+            self.status[idx] = self.ERROR
+        else:
+            self.status[idx] = self.OK
+            for field, value in v.items():
+                field_idx = self.field_idx.get(field)
+                if field_idx is not None and isinstance(value, (int, float)):
+                    self.values[idx, field_idx] = value
+        self.update_ts[idx] = now
+        return idx
+
+    def get(self, symbol: str) -> dict | None:
+        idx = self.symbol_idx.get(symbol)
+        if idx is None or self.status[idx] != self.OK:
+            return None
+        quote = {
+            field: float(value)
+            for field, value in zip(self.fields, self.values[idx])
+            if not np.isnan(value)
+        }
+        quote["update_ts"] = float(self.update_ts[idx])
+        return quote
+
+    def row_csv(self, idx: int) -> str:
+        """csv line of a row: update_ts, symbol and the fields, empty if unknown"""
+        line = [repr(float(self.update_ts[idx])), self.symbol_list[idx]]
+        for value in self.values[idx].tolist():
+            line.append("" if np.isnan(value) else repr(value))
+        return ",".join(line) + "\n"
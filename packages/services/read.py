@@ -0,0 +1,124 @@
+import os
+import numpy as np
+from ..services import archive, binary_storage
+from ..services.write import (
+    get_partition_filepaths,
+    get_symbol_pair_filepath,
+    is_archive_file,
+    is_binary_file,
+    read_csv_range,
+)
+
+# columns of the stored bars, a series without volume stops at close
+COLUMNS = ("timestamp", "open", "high", "low", "close", "volume")
+
+
+def _select_columns(
+    arrays: list[np.ndarray], columns: list[str] | None
+) -> dict[str, np.ndarray]:
+    """Name the arrays of the stored columns and keep the ones asked for
+
+    Raises:
+        ValueError: a column is unknown or not stored
+    """
+    stored = dict(zip(COLUMNS, arrays))
+    if columns is None:
+        return stored
+    missing = [column for column in columns if column not in stored]
+    if len(missing) > 0:
+        raise ValueError(f"columns {missing} not in {list(stored)}")
+    return {column: stored[column] for column in columns}
+
+
+def _read_file_range(
+    filepath: str, start_ts: float | None, end_ts: float | None
+) -> list[np.ndarray]:
+    """Read the columns of a file with start_ts <= timestamp <= end_ts, the
+    columns of a binary file are views of the memory-mapped file, only the
+    blocks of the range of an archive are decompressed"""
+    if is_archive_file(filepath):
+        bars = archive.read_bars(filepath, start_ts, end_ts)
+        return [bars.ts] + [bars.values[:, i] for i in range(bars.width)]
+    if is_binary_file(filepath):
+        records = binary_storage.map_records(filepath, start_ts, end_ts)
+        values = records["values"]
+        return [records["ts"]] + [values[:, i] for i in range(values.shape[1])]
+    rows = read_csv_range(filepath, start_ts, end_ts)
+    arrays = [rows[:, i] for i in range(rows.shape[1])]
+    if len(arrays) > 0:
+        arrays[0] = arrays[0].astype(np.int64)
+    return arrays
+
+
+def _read_partitions_range(
+    series_dir: str, start_ts: float | None, end_ts: float | None
+) -> list[np.ndarray]:
+    """_read_file_range of the partitions of a series, only the arrays of
+    several partitions are copied, to concatenate them"""
+    arrays_list = []
+    for filepath in get_partition_filepaths(series_dir, start_ts, end_ts):
+        arrays = _read_file_range(filepath, start_ts, end_ts)
+        if len(arrays) > 0 and len(arrays[0]) > 0:
+            arrays_list.append(arrays)
+    if len(arrays_list) == 0:
+        return []
+    if len(arrays_list) == 1:
+        return arrays_list[0]
+    return [np.concatenate(column) for column in zip(*arrays_list)]
+
+
+def read_bars(
+    storage_dir: str,
+    symbol: str,
+    interval: str,
+    start_ts: float | None = None,
+    end_ts: float | None = None,
+    columns: list[str] | None = None,
+    copy: bool = True,
+) -> dict[str, np.ndarray]:
+    """Read the stored bars of a pair with start_ts <= timestamp <= end_ts
+
+    Only the range is read: the file is binary searched for it. The arrays
+    of a binary file are copied out of the memory-mapped file, with
+    copy=False they are views of it and nothing is copied until they are
+    used; the lines of a csv file are parsed. Only the partitions of the
+    range of a partitioned interval are read, and their arrays concatenated
+    when there are several; only the blocks of the range of an archived
+    partition are decompressed. The result can be given to pandas.DataFrame
+    as it is.
+
+    Args:
+        storage_dir (str)
+        symbol (str)
+        interval (str)
+        start_ts (float | None, optional): None from the first bar.
+            Defaults to None.
+        end_ts (float | None, optional): None to the last bar.
+            Defaults to None.
+        columns (list[str] | None, optional): names of COLUMNS to read, None
+            for all the stored ones. Defaults to None.
+        copy (bool, optional): copy the arrays out of the map. The views of
+            copy=False are only safe while no writer runs on the file: a
+            write truncates the records it replaces, and reading a view past
+            the new end of the file crashes the process (SIGBUS).
+            Defaults to True.
+
+    Raises:
+        FileNotFoundError: no bars are stored for the pair
+        ValueError: a column is not stored, or the file is corrupted
+
+    Returns:
+        dict[str, np.ndarray]: int64 timestamps and float64 values by column
+    """
+    filepath = get_symbol_pair_filepath(storage_dir, symbol, interval)
+    if os.path.isdir(filepath):
+        arrays = _read_partitions_range(filepath, start_ts, end_ts)
+    else:
+        arrays = _read_file_range(filepath, start_ts, end_ts)
+    if len(arrays) == 0 or len(arrays[0]) == 0:
+        # no bar in the range, the stored columns may not be known
+        arrays = [np.empty(0, dtype=np.int64)] + [np.empty(0) for _ in COLUMNS[1:]]
+    selected = _select_columns(arrays, columns)
+    if copy:
+        return {column: array.copy() for column, array in selected.items()}
+    return selected
@@ -0,0 +1,177 @@
+import os
+import numpy as np
+from ..services.bars import Bars
+from ..services.storage_manifest import StorageManifest
+from ..services.write import (
+    get_last_line_ts,
+    get_partition_filepaths,
+    get_symbol_pair_filepath,
+    read_series_file,
+    record_error_file,
+    update_last_bars,
+)
+from ..utils.intervals import interval_to_second
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def _interval_months(interval: str) -> int | None:
+    """number of months of a month interval, None for other intervals"""
+    if not interval.endswith("M"):
+        return None
+    return int(interval[:-1] or 1)
+
+
+def is_derivable(base_interval: str, interval: str) -> bool:
+    """Tell whether the bars of interval can be built from the bars of
+    base_interval
+
+    Intraday buckets are aligned to the day (in UTC), so both intervals must
+    be intraday and the day a multiple of interval. Month buckets are aligned
+    to the year. Days and weeks follow the sessions of the exchange and are
+    not derived.
+
+    Args:
+        base_interval (str): finer interval, e.g. "1"
+        interval (str): coarser interval, e.g. "15"
+
+    Returns:
+        bool
+    """
+    if base_interval == interval:
+        return False
+    base_months = _interval_months(base_interval)
+    months = _interval_months(interval)
+    if base_months is not None or months is not None:
+        if base_months is None or months is None:
+            return False
+        return months % base_months == 0 and 12 % months == 0
+
+    if base_interval[-1] in "DW" or interval[-1] in "DW":
+        return False
+    base_step = interval_to_second(base_interval)
+    step = interval_to_second(interval)
+    return step % base_step == 0 and SECONDS_PER_DAY % step == 0
+
+
+def get_bucket_ts(ts: np.ndarray, interval: str) -> np.ndarray:
+    """Get the timestamp of the bar of interval that contains each timestamp
+
+    Args:
+        ts (np.ndarray): int64 timestamps
+        interval (str): intraday or month interval
+
+    Returns:
+        np.ndarray: int64 timestamps of the start of the buckets
+    """
+    months = _interval_months(interval)
+    if months is None:
+        step = interval_to_second(interval)
+        return ts // step * step
+    month_idx = ts.astype("datetime64[s]").astype("datetime64[M]").astype(np.int64)
+    month_idx = month_idx // months * months
+    return month_idx.astype("datetime64[M]").astype("datetime64[s]").astype(np.int64)
+
+
+def resample_bars(bars: Bars, interval: str) -> Bars:
+    """Aggregate bars into the bars of a coarser interval
+
+    The first value of a bucket gives its open, then the max of the second
+    its high, the min of the third its low, the last of the fourth its close
+    and the sum of the others (volume) their value.
+
+    Args:
+        bars (Bars): bars sorted by timestamp, with at least 4 values
+        interval (str): coarser interval, see is_derivable
+
+    Returns:
+        Bars
+    """
+    if len(bars) == 0:
+        return bars
+    assert bars.width >= 4, "bars must have open, high, low and close"
+    bucket_ts = get_bucket_ts(bars.ts, interval)
+    starts = np.flatnonzero(np.r_[True, bucket_ts[1:] != bucket_ts[:-1]])
+    ends = np.r_[starts[1:], len(bars)] - 1
+
+    values = np.empty((len(starts), bars.width), dtype=np.float64)
+    values[:, 0] = bars.values[starts, 0]
+    values[:, 1] = np.maximum.reduceat(bars.values[:, 1], starts)
+    values[:, 2] = np.minimum.reduceat(bars.values[:, 2], starts)
+    values[:, 3] = bars.values[ends, 3]
+    if bars.width > 4:
+        values[:, 4:] = np.add.reduceat(bars.values[:, 4:], starts, axis=0)
+    return Bars(bucket_ts[starts], values)
+
+
+def read_bars_since(filepath: str, start_ts: float | None) -> Bars:
+    """Read the stored bars with a timestamp larger than or equal to start_ts
+
+    Args:
+        filepath (str)
+        start_ts (float | None): None to read all bars
+
+    Returns:
+        Bars
+    """
+    empty = Bars(np.empty(0, dtype=np.int64), np.empty((0, 0)))
+    if not os.path.exists(filepath):
+        return empty
+    if os.path.isdir(filepath):
+        # the partitions of a partitioned interval
+        bars_list = []
+        for partition_filepath in get_partition_filepaths(filepath, start_ts):
+            bars = read_bars_since(partition_filepath, start_ts)
+            if len(bars) > 0:
+                bars_list.append(bars)
+        if len(bars_list) == 0:
+            return empty
+        return Bars(
+            np.concatenate([bars.ts for bars in bars_list]),
+            np.concatenate([bars.values for bars in bars_list]),
+        )
+    try:
+        return read_series_file(filepath, start_ts)
+    except ValueError:
+        record_error_file(filepath)
+        return empty
+
+
+def resample_file(
+    storage_dir: str,
+    symbol: str,
+    base_interval: str,
+    interval: str,
+    manifest: StorageManifest | None = None,
+) -> dict:
+    """Update the stored bars of interval from the stored bars of base_interval
+
+    Only the base bars since the last stored bar of interval are read, that
+    bar is replaced, as it may have been built before its period ended, and
+    the following ones are appended. When nothing is stored yet, the first
+    bucket is dropped if the base bars start after its beginning.
+
+    Args:
+        storage_dir (str)
+        symbol (str)
+        base_interval (str)
+        interval (str)
+        manifest (StorageManifest, optional): gives the last stored bar of
+            interval and is updated with the written file. Defaults to None.
+
+    Returns:
+        dict: result of update_last_bars
+    """
+    filepath = get_symbol_pair_filepath(storage_dir, symbol, interval)
+    if manifest is not None:
+        last_ts = manifest.get_last_ts(symbol, interval)
+    else:
+        last_ts = get_last_line_ts(filepath)
+    base_filepath = get_symbol_pair_filepath(storage_dir, symbol, base_interval)
+    base_bars = read_bars_since(base_filepath, last_ts)
+
+    bars = resample_bars(base_bars, interval)
+    if last_ts is None and len(bars) > 0 and base_bars.ts[0] != bars.ts[0]:
+        # the first bucket is partial
+        bars = bars[1:]
+    return update_last_bars(storage_dir, symbol, interval, bars, manifest)
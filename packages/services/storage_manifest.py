@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import threading
+
+MANIFEST_VERSION = 1
+# values of an entry
+LAST_TS, BAR_CNT, FILE_SIZE, OUTCOME, UPDATED_AT = range(5)
+
+
+class StorageManifest:
+    """What is stored for every pair, so that scheduling opens no data file.
+
+    An entry is kept per (symbol, interval) with the timestamp of the last
+    stored bar, the number of stored bars, the size of the file (of its
+    newest partition for a partitioned interval), the outcome of the last
+    fetch and when the entry was last updated. A pair without an entry has
+    no file.
+
+    The writers update the entries (write_to_file(manifest=...)) and the
+    manifest is saved to cache_dir. A marker file exists while there are
+    changes not saved yet: if it is found on load, the process stopped
+    before saving, the manifest is stale and load fails, as it does for a
+    missing manifest or one of another storage format. It must then be
+    rebuilt from the files, see scan_storage.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        storage_format: str,
+        filename: str = "storage_manifest.json",
+    ):
+        """
+        Args:
+            cache_dir (str): directory of the manifest file
+            storage_format (str): format of the described files
+            filename (str, optional): Defaults to "storage_manifest.json".
+        """
+        self.filepath = os.path.join(cache_dir, filename)
+        self.dirty_filepath = self.filepath + ".dirty"
+        self.storage_format = storage_format
+        self.pairs: dict[str, dict[str, list]] = {}
+        self.dirty = False
+        # updated by the engine and the realtime streamer threads
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(len(intervals) for intervals in self.pairs.values())
+
+    def load(self) -> bool:
+        """Load the saved manifest
+
+        Returns:
+            bool: False if it is missing, stale or of another format
+        """
+        if not os.path.exists(self.filepath) or os.path.exists(self.dirty_filepath):
+            return False
+        with open(self.filepath, "r") as f:
+            data = json.load(f)
+        if (
+            data.get("version") != MANIFEST_VERSION
+            or data.get("storage_format") != self.storage_format  # noqa: W503
+        ):
+            return False
+        with self.lock:
+            self.pairs = data["pairs"]
+            self.dirty = False
+        return True
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            data = {
+                "version": MANIFEST_VERSION,
+                "storage_format": self.storage_format,
+                "pairs": self.pairs,
+            }
+            tmp_filepath = self.filepath + ".tmp"
+            with open(tmp_filepath, "w") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp_filepath, self.filepath)
+            if os.path.exists(self.dirty_filepath):
+                os.remove(self.dirty_filepath)
+            self.dirty = False
+
+    def rebuild(self, pairs: dict[str, dict[str, list]]):
+        """Replace the entries, e.g. with the ones of scan_storage"""
+        with self.lock:
+            self.pairs = pairs
+            self._mark_dirty()
+
+    def _mark_dirty(self):
+        if self.dirty:
+            return
+        self.dirty = True
+        os.makedirs(os.path.dirname(self.filepath) or ".", exist_ok=True)
+        with open(self.dirty_filepath, "w"):
+            pass
+
+    def get(self, symbol: str, interval: str) -> list | None:
+        """Get [last_ts, bar_cnt, file_size, outcome, updated_at] of a pair,
+        None if it has no file"""
+        return self.pairs.get(symbol, {}).get(interval)
+
+    def get_last_ts(self, symbol: str, interval: str) -> float | None:
+        entry = self.get(symbol, interval)
+        return None if entry is None else entry[LAST_TS]
+
+    def update(
+        self,
+        symbol: str,
+        interval: str,
+        last_ts: float | None,
+        bar_delta: int,
+        file_size: int,
+    ):
+        """Record a write to the file of a pair
+
+        Args:
+            symbol (str)
+            interval (str)
+            last_ts (float | None): last stored bar, None if it did not change
+            bar_delta (int): bars added, minus the ones replaced
+            file_size (int)
+        """
+        with self.lock:
+            intervals = self.pairs.setdefault(symbol, {})
+            entry = intervals.get(interval)
+            if entry is None:
+                entry = intervals[interval] = [None, 0, 0, None, None]
+            if last_ts is not None:
+                entry[LAST_TS] = float(last_ts)
+            if entry[BAR_CNT] is not None:
+                entry[BAR_CNT] += bar_delta
+            entry[FILE_SIZE] = file_size
+            entry[UPDATED_AT] = time.time()
+            self._mark_dirty()
+
+    def set_outcome(self, symbol: str, interval: str, outcome: str):
+        """Record the outcome of the last fetch of a pair with a file"""
+        with self.lock:
+            entry = self.get(symbol, interval)
+            if entry is None:
+                return
+            entry[OUTCOME] = outcome
+            entry[UPDATED_AT] = time.time()
+            self._mark_dirty()
@@ -0,0 +1,160 @@
+import os
+import json
+import time
+from ..utils.intervals import cmp_interval
+
+# seconds a known useless pair is skipped before it is tried again
+CAPABILITY_TTL = 60 * 60 * 24 * 7
+# a symbol_error may be transient (server hiccup, auth), the symbol is skipped
+# for SYMBOL_ERROR_TTL seconds, and for the capability ttl only once it failed
+# to resolve SYMBOL_ERROR_STRIKES times in a row
+SYMBOL_ERROR_TTL = 60 * 60
+SYMBOL_ERROR_STRIKES = 3
+# errors telling that a pair will never have bars, unlike a timeout
+CACHED_ERROR_TYPES = ["symbol_error", "unsupported_resolution"]
+# bars with more values than [open, high, low, close, volume] are not stored
+MAX_BARS_WIDTH = 5
+
+
+class SymbolCapabilityCache:
+    """What the server told about each symbol, persisted in cache_dir.
+
+    An entry is kept per symbol with the data_frequency of its last
+    symbol_resolved, a symbol_error and the number of them in a row if it
+    failed to resolve, and per interval the status of its last series: "ok"
+    with the width of its bars, or the reason it is useless
+    ("unsupported_resolution", "width"). Reasons older than ttl are
+    forgotten so that the pair is tried again. A symbol_error is forgotten
+    after symbol_error_ttl until it repeats, and never skips an interval
+    that has bars.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        ttl: float = CAPABILITY_TTL,
+        filename: str = "symbol_capabilities.json",
+        symbol_error_ttl: float = SYMBOL_ERROR_TTL,
+        symbol_error_strikes: int = SYMBOL_ERROR_STRIKES,
+    ):
+        """
+        Args:
+            cache_dir (str): directory of the cache file
+            ttl (float, optional): seconds. Defaults to CAPABILITY_TTL.
+            filename (str, optional): Defaults to "symbol_capabilities.json".
+            symbol_error_ttl (float, optional): seconds a symbol_error is
+                kept before symbol_error_strikes of them in a row.
+                Defaults to SYMBOL_ERROR_TTL.
+            symbol_error_strikes (int, optional): symbol_errors in a row after
+                which it is kept for ttl. Defaults to SYMBOL_ERROR_STRIKES.
+        """
+        self.filepath = os.path.join(cache_dir, filename)
+        self.ttl = ttl
+        self.symbol_error_ttl = symbol_error_ttl
+        self.symbol_error_strikes = symbol_error_strikes
+        self.symbols: dict[str, dict] = {}
+        self.dirty = False
+
+    def load(self):
+        if not os.path.exists(self.filepath):
+            return
+        with open(self.filepath, "r") as f:
+            self.symbols = json.load(f)
+        self.dirty = False
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.filepath) or ".", exist_ok=True)
+        tmp_filepath = self.filepath + ".tmp"
+        with open(tmp_filepath, "w") as f:
+            json.dump(self.symbols, f)
+        os.replace(tmp_filepath, self.filepath)
+        self.dirty = False
+
+    def _entry(self, symbol: str) -> dict:
+        if symbol not in self.symbols:
+            self.symbols[symbol] = {"intervals": {}}
+        return self.symbols[symbol]
+
+    def update(self, symbol: str, interval: str, width: int | None, detail: dict):
+        """Record the result of a series
+
+        Args:
+            symbol (str)
+            interval (str)
+            width (int | None): values per bar, None if no bars were received
+            detail (dict): detail of the result, with "data_frequency" and
+                "error" when the server sent them
+        """
+        now = time.time()
+        entry = self._entry(symbol)
+        if detail.get("data_frequency") is not None:
+            entry["data_frequency"] = detail["data_frequency"]
+            entry["resolved_at"] = now
+            entry.pop("error", None)
+            entry.pop("error_cnt", None)
+        error = detail.get("error")
+        if error == "symbol_error":
+            entry["error"] = error
+            entry["error_at"] = now
+            entry["error_cnt"] = entry.get("error_cnt", 0) + 1
+        elif error in CACHED_ERROR_TYPES:
+            entry["intervals"][interval] = {"status": error, "at": now}
+        elif width is not None:
+            status = "ok" if width <= MAX_BARS_WIDTH else "width"
+            entry["intervals"][interval] = {"status": status, "width": width, "at": now}
+        self.dirty = True
+
+    def _symbol_error_ttl(self, entry: dict) -> float:
+        if entry.get("error_cnt", 1) >= self.symbol_error_strikes:
+            return self.ttl
+        return min(self.symbol_error_ttl, self.ttl)
+
+    def skip_reason(
+        self,
+        symbol: str,
+        interval: str,
+        now: float | None = None,
+        has_bars: bool = False,
+    ) -> tuple[str, float] | None:
+        """Tell whether the pair is known to be useless
+
+        Args:
+            symbol (str)
+            interval (str)
+            now (float | None, optional): Defaults to time.time().
+            has_bars (bool, optional): bars of the pair are stored, a
+                symbol_error does not skip it. Defaults to False.
+
+        Returns:
+            tuple[str, float] | None: (reason, seconds until it expires), None
+                if the pair should be requested
+        """
+        entry = self.symbols.get(symbol)
+        if entry is None:
+            return None
+        if now is None:
+            now = time.time()
+
+        state = entry["intervals"].get(interval)
+        has_bars = has_bars or (state is not None and state["status"] == "ok")
+        if "error" in entry and not has_bars:
+            ttl = self._symbol_error_ttl(entry)
+            if now - entry["error_at"] < ttl:
+                return entry["error"], entry["error_at"] + ttl - now
+
+        data_frequency = entry.get("data_frequency")
+        if data_frequency is not None and now - entry["resolved_at"] < self.ttl:
+            try:
+                coarser = cmp_interval(data_frequency, interval) > 0
+            except (AssertionError, ValueError):
+                coarser = False
+            if coarser:
+                return "data_frequency", entry["resolved_at"] + self.ttl - now
+
+        if state is None or state["status"] == "ok":
+            return None
+        if now - state["at"] < self.ttl:
+            return state["status"], state["at"] + self.ttl - now
+        return None
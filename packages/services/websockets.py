@@ -61,18 +61,30 @@ def create_message(func: str, paramList: list) -> str:
     )
 
 
-async def ws_client_send_init(
-    ws: client.WebSocketClientProtocol, auth_token: str, locale: list
+async def ws_client_send_auth_token(
+    ws: client.WebSocketClientProtocol, auth_token: str | None
 ):
     """Send auth token to websocket
 
     Args:
         ws (WebSocketClientProtocol): the websocket
-        auth_token (str): the auth token
+        auth_token (str | None): the auth token
     """
     if auth_token is None:
         await ws.send(create_message("set_auth_token", ["unauthorized_user_token"]))
     else:
         await ws.send(create_message("set_auth_token", [auth_token]))
 
+
+async def ws_client_send_init(
+    ws: client.WebSocketClientProtocol, auth_token: str, locale: list
+):
+    """Send auth token and locale to websocket
+
+    Args:
+        ws (WebSocketClientProtocol): the websocket
+        auth_token (str): the auth token
+        locale (list): the locale
+    """
+    await ws_client_send_auth_token(ws, auth_token)
     await ws.send(create_message("set_locale", locale))
@@ -1,9 +1,44 @@
 import io
 import os
+import multiprocessing as mp
+import numpy as np
 from dotenv import load_dotenv
+from ..services import archive, binary_storage
+from ..services.bars import Bars
+from ..services.csv_format import format_bars, format_rows
+from ..services.partitions import (
+    get_partition_filepath,
+    is_partitioned,
+    list_partitions,
+    lock_index,
+    read_index,
+    select_partitions,
+    split_by_partition,
+    write_index,
+)
+from ..services.storage_manifest import StorageManifest
 
 load_dotenv()
 
+# extension of the files of each storage format, see get_storage_format
+STORAGE_EXTENSIONS = {"csv": ".csv", "binary": ".bin"}
+
+
+def get_storage_format() -> str:
+    """Storage format of the bars, TV_STORAGE_FORMAT, "csv" by default"""
+    storage_format = os.getenv("TV_STORAGE_FORMAT") or "csv"
+    if storage_format not in STORAGE_EXTENSIONS:
+        raise ValueError(f"Unknown storage format: {storage_format}")
+    return storage_format
+
+
+def is_binary_file(filepath: str) -> bool:
+    return filepath.endswith(STORAGE_EXTENSIONS["binary"])
+
+
+def is_archive_file(filepath: str) -> bool:
+    return filepath.endswith(archive.ARCHIVE_EXTENSION)
+
 
 def record_error_file(filepath: str):
     error_file = os.getenv("ERROR_FILE") or "error_file.txt"
@@ -12,11 +47,37 @@ def record_error_file(filepath: str):
 
 
 def get_symbol_pair_filepath(
-    storage_dir: str, symbol: str, interval: str, extension: str = ".csv"
+    storage_dir: str, symbol: str, interval: str, extension: str | None = None
 ) -> str:
+    """Path of the stored bars of a pair, the directory of its partitions for
+    a partitioned interval, or of another file of the pair with extension"""
+    if extension is None:
+        if is_partitioned(interval):
+            return os.path.join(storage_dir, symbol, interval)
+        extension = STORAGE_EXTENSIONS[get_storage_format()]
     return os.path.join(storage_dir, symbol, f"{interval}{extension}")
 
 
+def get_partition_filepaths(
+    series_dir: str, start_ts: float | None = None, end_ts: float | None = None
+) -> list[str]:
+    """Paths of the partitions of a series holding bars of
+    start_ts <= timestamp <= end_ts, oldest first, the archive of an
+    archived partition"""
+    extension = STORAGE_EXTENSIONS[get_storage_format()]
+    stored = set(list_partitions(series_dir, extension))
+    archived = set(list_partitions(series_dir, archive.ARCHIVE_EXTENSION))
+    names = select_partitions(sorted(stored | archived), start_ts, end_ts)
+    return [
+        get_partition_filepath(
+            series_dir,
+            name,
+            extension if name in stored else archive.ARCHIVE_EXTENSION,
+        )
+        for name in names
+    ]
+
+
 def f_get_line_ts(file: io.BufferedReader, offset: int) -> float | None:
     """Get the timestamp of the line at offset.
 
@@ -90,6 +151,46 @@ def f_remove_last_line(file: io.BufferedReader):
         pass
 
 
+def parse_csv_rows(data: bytes) -> np.ndarray:
+    """Parse csv lines of numbers into float64 rows
+
+    The lines are parsed by numpy in one call, lines with stray characters
+    around the values (" '.?!") are then parsed one by one.
+
+    Raises:
+        ValueError: the lines do not have the same number of values, or a
+            value is not a number
+
+    Returns:
+        np.ndarray: one row per line
+    """
+    if len(data.strip()) == 0:
+        return np.empty((0, 0), dtype=np.float64)
+    try:
+        return np.loadtxt(io.BytesIO(data), delimiter=",", ndmin=2)
+    except ValueError:
+        return np.array(
+            [
+                [float(x.strip(" '.?!")) for x in line.strip(" '.?!").split(",")]
+                for line in data.decode().strip("\n").split("\n")
+            ],
+            dtype=np.float64,
+        )
+
+
+def count_csv_lines(data: bytes) -> int:
+    """number of lines parse_csv_rows reads in data, whether or not they
+    parse"""
+    if len(data.strip()) == 0:
+        return 0
+    return len(data.strip(b"\n").split(b"\n"))
+
+
+def format_csv_rows(rows: np.ndarray) -> str:
+    """csv lines of float64 rows, see csv_format.format_rows"""
+    return format_rows(rows).decode("ascii")
+
+
 def f_search_start_byte_of_line(
     file: io.BufferedReader, left: int, right: int, target_ts: float
 ) -> int:
@@ -120,11 +221,11 @@ def f_search_start_byte_of_line(
     return l_byte
 
 
-def search_idx_of_bars(bars: list, left: int, right: int, target_ts: float) -> int:
+def search_idx_of_bars(bars: Bars, left: int, right: int, target_ts: float) -> int:
     """Search for the index of the bar that contains timestamp less than or equal to target_ts.
 
     Args:
-        bars (list)
+        bars (Bars)
         left (int)
         right (int)
         target_ts (float)
@@ -132,19 +233,10 @@ def search_idx_of_bars(bars: list, left: int, right: int, target_ts: float) -> i
     Returns:
         int: index of the bar
     """
-    assert (
-        target_ts >= bars[left]["v"][0]
-    ), "target_ts {} < bars[left]['v'][0] {}".format(target_ts, bars[left]["v"][0])
-    l_idx = left
-    r_idx = right
-    while l_idx < r_idx:
-        m = (l_idx + r_idx) // 2
-        ts = bars[m]["v"][0]
-        if ts <= target_ts:
-            l_idx = m + 1
-        else:
-            r_idx = m
-    return l_idx - 1
+    assert target_ts >= bars.ts[left], "target_ts {} < bars.ts[left] {}".format(
+        target_ts, bars.ts[left]
+    )
+    return left + int(np.searchsorted(bars.ts[left:right], target_ts, side="right")) - 1
 
 
 def get_last_line_ts(filepath: str) -> float | None:
@@ -156,6 +248,17 @@ def get_last_line_ts(filepath: str) -> float | None:
     Returns:
         float
     """
+    if os.path.isdir(filepath):
+        # the newest partition
+        filepaths = get_partition_filepaths(filepath)
+        return get_last_line_ts(filepaths[-1]) if len(filepaths) > 0 else None
+    if is_archive_file(filepath):
+        try:
+            return archive.get_summary(filepath)[0]
+        except (OSError, ValueError):
+            return None
+    if is_binary_file(filepath):
+        return binary_storage.get_last_ts(filepath)
     try:
         with open(filepath, "rb") as f:
             return f_get_last_line_ts(f)
@@ -163,46 +266,362 @@ def get_last_line_ts(filepath: str) -> float | None:
         return None
 
 
-def write_empty_file(storage_dir: str, symbol: str, interval: str):
+def write_empty_file(
+    storage_dir: str,
+    symbol: str,
+    interval: str,
+    manifest: StorageManifest | None = None,
+):
     os.makedirs(os.path.join(storage_dir, symbol), exist_ok=True)
     filepath = get_symbol_pair_filepath(storage_dir, symbol, interval)
-    if not os.path.exists(filepath):
+    file_size = 0
+    if is_partitioned(interval):
+        # the partitions are created by the writes
+        os.makedirs(filepath, exist_ok=True)
+    elif is_binary_file(filepath):
+        binary_storage.write_empty_file(filepath)
+    elif not os.path.exists(filepath):
         # new file
         with open(filepath, "w") as f:
             f.write("timestamp,open,high,low,close,volume\n")
+    if not os.path.isdir(filepath):
+        file_size = os.path.getsize(filepath)
+    if manifest is not None:
+        manifest.update(symbol, interval, None, 0, file_size)
+
+
+def read_csv_range(
+    filepath: str, start_ts: float | None = None, end_ts: float | None = None
+) -> np.ndarray:
+    """Read the rows of a csv file with start_ts <= timestamp <= end_ts, the
+    byte range of the lines is found by binary search and read in one call"""
+    with open(filepath, "rb") as f:
+        f.readline()
+        left_byte = f.tell()
+        f.seek(0, os.SEEK_END)
+        right_byte = f.tell()
+        if start_ts is not None:
+            left_byte = f_search_start_byte_of_line(f, left_byte, right_byte, start_ts)
+        if end_ts is not None:
+            # start of the first line after end_ts
+            right_byte = f_search_start_byte_of_line(
+                f, left_byte, right_byte, np.nextafter(float(end_ts), np.inf)
+            )
+        f.seek(left_byte, os.SEEK_SET)
+        data = f.read(right_byte - left_byte)
+    return parse_csv_rows(data)
 
 
-def write_to_file(storage_dir: str, symbol: str, interval: str, bars: list) -> dict:
-    """write bars to csv file in storage directory,
-    if file does not exist, create new file, then append to file
-    else if file data do not overlap with bars, direct append to existing file
-    else if file has bars that overlap with bars, check if overlapped bars are same, if same, direct append to existing file, else return warning
+def _open_csv_file(filepath: str) -> io.BufferedRandom:
+    """Open the csv file of a pair for update, it is created with its
+    header line (and its directory) only when the open fails"""
+    try:
+        return open(filepath, "rb+")
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        f = open(filepath, "wb+")
+        f.write(b"timestamp,open,high,low,close,volume\n")
+        return f
+
+
+def _count_lines(file: io.BufferedReader, chunk_size: int = 1 << 20) -> int:
+    file.seek(0, os.SEEK_SET)
+    count = 0
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            return count
+        count += chunk.count(b"\n")
+
+
+def get_file_summary(filepath: str) -> list:
+    """Get the StorageManifest entry of a stored file, or of the directory of
+    a partitioned series: the size is the one of its newest partition
+
+    Returns:
+        list: [last_ts, bar_cnt, file_size, outcome (None), modification time]
+    """
+    if os.path.isdir(filepath):
+        return _get_series_summary(filepath)
+    if is_archive_file(filepath):
+        return archive.get_summary(filepath) + [None, os.path.getmtime(filepath)]
+    with open(filepath, "rb") as f:
+        if is_binary_file(filepath):
+            width = binary_storage.f_read_header(f)
+            bar_cnt = binary_storage.f_get_record_num(f, width)
+            last_ts = binary_storage.f_get_last_ts(f)
+        else:
+            # without the header line
+            bar_cnt = max(_count_lines(f) - 1, 0)
+            last_ts = f_get_last_line_ts(f)
+        f.seek(0, os.SEEK_END)
+        file_size = f.tell()
+    return [last_ts, bar_cnt, file_size, None, os.path.getmtime(filepath)]
+
+
+def _get_series_summary(series_dir: str) -> list:
+    """get_file_summary of a partitioned series, the sealed partitions are
+    summed up from the index"""
+    sealed = read_index(series_dir)
+    filepaths = get_partition_filepaths(series_dir)
+    last_ts = None
+    bar_cnt = 0
+    file_size = 0
+    for i, filepath in enumerate(filepaths):
+        name = os.path.splitext(os.path.basename(filepath))[0]
+        if name in sealed and i < len(filepaths) - 1:
+            summary = sealed[name]
+        else:
+            summary = get_file_summary(filepath)
+        last_ts = summary[0] if summary[0] is not None else last_ts
+        bar_cnt += summary[1]
+        file_size = summary[2]
+    return [last_ts, bar_cnt, file_size, None, os.path.getmtime(series_dir)]
+
+
+def _scan_symbol_dir(storage_dir: str, symbol: str, extension: str) -> dict:
+    summary_dict = {}
+    symbol_dir = os.path.join(storage_dir, symbol)
+    for entry in os.scandir(symbol_dir):
+        name = entry.name
+        if entry.is_dir():
+            if not is_partitioned(name):
+                continue
+            interval = name
+        elif not name.endswith(extension) or ".diff." in name:
+            continue
+        else:
+            interval = name[: -len(extension)]
+            if is_partitioned(interval):
+                # written before the interval was partitioned, the bars are
+                # moved to the partitions by the next write
+                continue
+        try:
+            summary_dict[interval] = get_file_summary(entry.path)
+        except (OSError, ValueError):
+            record_error_file(entry.path)
+    return summary_dict
+
+
+def scan_storage(storage_dir: str, num_processes: int = 1) -> dict[str, dict]:
+    """Get the StorageManifest entries of every file of the storage format,
+    the symbol directories are scanned in parallel
 
     Args:
         storage_dir (str)
-        symbol (str)
-        interval (str)
-        bars (list)
+        num_processes (int, optional): Defaults to 1.
+
+    Returns:
+        dict[str, dict]: entry by interval by symbol
     """
-    res = {
-        "status": "ok",
-        "message": "success",
-        "symbol": symbol,
-        "interval": interval,
-        "details": [],
+    if not os.path.isdir(storage_dir):
+        return {}
+    extension = STORAGE_EXTENSIONS[get_storage_format()]
+    symbol_list = [entry.name for entry in os.scandir(storage_dir) if entry.is_dir()]
+    arglist = [(storage_dir, symbol, extension) for symbol in symbol_list]
+    if num_processes == 1:
+        summary_list = [_scan_symbol_dir(*args) for args in arglist]
+    else:
+        with mp.Pool(processes=num_processes) as pool:
+            summary_list = pool.starmap(_scan_symbol_dir, arglist, chunksize=64)
+    return {
+        symbol: summary_dict
+        for symbol, summary_dict in zip(symbol_list, summary_list)
+        if len(summary_dict) > 0
     }
 
-    os.makedirs(os.path.join(storage_dir, symbol), exist_ok=True)
 
-    # write to csv
-    filepath = get_symbol_pair_filepath(storage_dir, symbol, interval)
+def compact_series(series_dir: str, codec: int | None = None) -> list[int]:
+    """Replace the sealed partitions of a series by compressed archives
+
+    A sealed partition is never written again, it is read back, archived
+    (see archive.write_archive) and only then removed, its summary in the
+    index gets the size of the archive. The index is updated holding its
+    lock, see lock_index, as the writes of the series may seal a partition
+    meanwhile.
+
+    Args:
+        series_dir (str)
+        codec (int | None, optional): see archive.write_archive.
+            Defaults to None.
+
+    Returns:
+        list[int]: partitions archived, their bytes before and after
+    """
+    extension = STORAGE_EXTENSIONS[get_storage_format()]
+    sealed = read_index(series_dir)
+    archive_sizes = {}
+    stats = [0, 0, 0]
+    for name in list_partitions(series_dir, extension):
+        if name not in sealed:
+            continue
+        filepath = get_partition_filepath(series_dir, name, extension)
+        archive_filepath = get_partition_filepath(
+            series_dir, name, archive.ARCHIVE_EXTENSION
+        )
+        bars = read_series_file(filepath)
+        archive_sizes[name] = archive.write_archive(archive_filepath, bars, codec)
+        stats[0] += 1
+        stats[1] += os.path.getsize(filepath)
+        stats[2] += archive_sizes[name]
+    if len(archive_sizes) == 0:
+        return stats
+    with lock_index(series_dir):
+        partitions = read_index(series_dir)
+        for name, archive_size in archive_sizes.items():
+            partitions[name][2] = archive_size
+        write_index(series_dir, partitions)
+    # the data files are read until the index has the archives
+    for name in archive_sizes:
+        os.remove(get_partition_filepath(series_dir, name, extension))
+    return stats
+
+
+def _compact_symbol_dir(
+    storage_dir: str, symbol: str, codec: int | None
+) -> list[int]:
+    stats = [0, 0, 0]
+    for entry in os.scandir(os.path.join(storage_dir, symbol)):
+        if not entry.is_dir() or not is_partitioned(entry.name):
+            continue
+        try:
+            series_stats = compact_series(entry.path, codec)
+        except (OSError, ValueError):
+            record_error_file(entry.path)
+            continue
+        stats = [total + value for total, value in zip(stats, series_stats)]
+    return stats
+
+
+def compact_storage(
+    storage_dir: str, num_processes: int = 1, codec: int | None = None
+) -> dict:
+    """Archive the sealed partitions of every series, the symbol directories
+    are compacted in parallel, see compact_series
+
+    The processes are spawned rather than forked, as the caller may have
+    threads running (streamers, writer pool) whose locks a fork would copy.
+
+    Args:
+        storage_dir (str)
+        num_processes (int, optional): Defaults to 1.
+        codec (int | None, optional): Defaults to None.
+
+    Returns:
+        dict: partitions archived, their bytes before and after
+    """
+    stats = [0, 0, 0]
+    if os.path.isdir(storage_dir):
+        arglist = [
+            (storage_dir, entry.name, codec)
+            for entry in os.scandir(storage_dir)
+            if entry.is_dir()
+        ]
+        if num_processes == 1:
+            stats_list = [_compact_symbol_dir(*args) for args in arglist]
+        else:
+            context = mp.get_context("spawn")
+            with context.Pool(processes=num_processes) as pool:
+                stats_list = pool.starmap(_compact_symbol_dir, arglist, chunksize=64)
+        for symbol_stats in stats_list:
+            stats = [total + value for total, value in zip(stats, symbol_stats)]
+    return {
+        "partitions": stats[0],
+        "bytes_before": stats[1],
+        "bytes_after": stats[2],
+    }
+
+
+def _record_overlap(
+    res: dict,
+    diff_filepath: str,
+    old_overlapped_bars: np.ndarray,
+    old_right_ts: float,
+    bars: Bars,
+):
+    """Compare the stored bars with the new bars up to old_right_ts, the last
+    stored one, record the differences in res and the stored bars that differ
+    in diff_filepath"""
+    # new overlapped
+    bars_overlapped_right_idx = search_idx_of_bars(
+        bars, 0, len(bars), old_right_ts
+    )
+    bars_overlapped_bars = bars[: bars_overlapped_right_idx + 1].rows()
+
+    # check if overlapped bars are same
+    diff_overlapped_bars, diff_details = diff_old_overlapped_bars(
+        old_overlapped_bars, bars_overlapped_bars
+    )
+
+    if len(diff_details) > 0:
+        res["status"] = "warning"
+        res["message"] = "overlapped bars are different"
+        res["details"].extend(diff_details)
+
+    if len(diff_overlapped_bars) > 0:
+        with open(diff_filepath, "ab") as df:
+            df.write(format_rows(diff_overlapped_bars))
+
+
+def _f_check_width(file: io.BufferedRandom, bars: Bars, res: dict) -> int | None:
+    """Get the values per record of a binary file, set by the first bars
+
+    Returns:
+        int | None: None if the bars do not fit the records, res tells why
+    """
+    width = binary_storage.f_read_header(file)
+    if width == 0 and len(bars) > 0:
+        width = bars.width
+        binary_storage.f_write_header(file, width)
+    if len(bars) > 0 and bars.width != width:
+        res["status"] = "error"
+        res["message"] = f"bars have {bars.width} values, the file has {width}"
+        return None
+    return width
 
-    if not os.path.exists(filepath):
-        # new file
-        with open(filepath, "w") as f:
-            f.write("timestamp,open,high,low,close,volume\n")
 
+def _write_to_binary_file(
+    filepath: str, diff_filepath: str, bars: Bars, res: dict
+) -> tuple[int, int] | None:
+    """_write_to_series_file for the binary format, the overlapped records
+    are found by binary search and the new bars appended in one write"""
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    binary_storage.write_empty_file(filepath)
     with open(filepath, "rb+") as f:
+        width = _f_check_width(f, bars, res)
+        if width is None:
+            return None
+        replaced = 0
+        old_right_ts = binary_storage.f_get_last_ts(f)
+        if old_right_ts is not None and old_right_ts >= bars.ts[0]:
+            old_overlapped = binary_storage.f_read_bars(f, bars.ts[0])
+            record_num = binary_storage.f_get_record_num(f, width)
+            _record_overlap(
+                res, diff_filepath, old_overlapped.rows(), old_right_ts, bars
+            )
+            # truncate the old overlapped bars
+            binary_storage.f_truncate_records(
+                f, width, record_num - len(old_overlapped)
+            )
+            replaced = len(old_overlapped)
+        binary_storage.f_append_bars(f, width, bars)
+        return len(bars) - replaced, f.tell()
+
+
+def _write_to_series_file(
+    filepath: str, diff_filepath: str, bars: Bars, res: dict
+) -> tuple[int, int] | None:
+    """Write bars to a file, replacing the stored bars they overlap, see
+    write_to_file
+
+    Returns:
+        tuple[int, int] | None: bars added minus the ones replaced and the
+            size of the file, None if the bars were not written
+    """
+    if is_binary_file(filepath):
+        return _write_to_binary_file(filepath, diff_filepath, bars, res)
+
+    with _open_csv_file(filepath) as f:
         # get old left and right byte and last timestamp
         f.readline()
         old_left_byte = f.tell()
@@ -210,89 +629,379 @@ def write_to_file(storage_dir: str, symbol: str, interval: str, bars: list) -> d
         old_right_byte = f.tell()
         old_right_ts = f_get_last_line_ts(f)
 
-        bars_left_ts = bars[0]["v"][0]
+        bars_left_ts = bars.ts[0]
+        replaced = 0
 
         if old_right_ts is not None and old_right_ts >= bars_left_ts:
             # old overlapped
-            old_overlapped_bars = []
+            old_overlapped_bars = np.empty((0, bars.width + 1))
             old_overlapped_left_byte = f_search_start_byte_of_line(
                 f, old_left_byte, old_right_byte, bars_left_ts
             )
             f.seek(old_overlapped_left_byte, os.SEEK_SET)
-            old_overlapped_lines = f.readlines(
-                old_right_byte - old_overlapped_left_byte
-            )
+            old_overlapped_data = f.read(old_right_byte - old_overlapped_left_byte)
             try:
-                old_overlapped_bars = [
-                    [
-                        float(x.strip(" '.?!"))
-                        for x in old_line.decode().strip(" '.?!").split(",")
-                    ]
-                    for old_line in old_overlapped_lines
-                ]
+                old_overlapped_bars = parse_csv_rows(old_overlapped_data)
+                replaced = len(old_overlapped_bars)
             except Exception:
                 record_error_file(filepath)
+                # the lines are truncated all the same, count them as replaced
+                replaced = count_csv_lines(old_overlapped_data)
 
-            # new overlapped
-            bars_overlapped_right_idx = search_idx_of_bars(
-                bars, 0, len(bars), old_right_ts
-            )
-            bars_overlapped_bars = bars[: bars_overlapped_right_idx + 1]
-
-            # check if overlapped bars are same
-            diff_overlapped_bars, diff_details = diff_old_overlapped_bars(
-                old_overlapped_bars, bars_overlapped_bars
+            _record_overlap(
+                res, diff_filepath, old_overlapped_bars, old_right_ts, bars
             )
 
-            if len(diff_details) > 0:
-                res["status"] = "warning"
-                res["message"] = "overlapped bars are different"
-                res["details"] = diff_details
-
-            if len(diff_overlapped_bars) > 0:
-                diff_filepath = get_symbol_pair_filepath(
-                    storage_dir, symbol, interval, extension=".diff.csv"
-                )
-                with open(diff_filepath, "a") as df:
-                    for diff_bar in diff_overlapped_bars:
-                        df.write("{}\n".format(",".join([str(v) for v in diff_bar])))
-
             # truncate the old overlapped bars
             f.seek(old_overlapped_left_byte, os.SEEK_SET)
             f.truncate()
 
         f.seek(0, os.SEEK_END)
         # append new bars
-        for bar in bars:
-            assert len(bar["v"]) > 1, "bar['v'] must have at least 2 values"
-            f.write("{}\n".format(",".join([str(v) for v in bar["v"]])).encode("utf-8"))
+        assert bars.width > 0, "bars must have at least 1 value besides ts"
+        f.write(format_bars(bars.ts, bars.values))
+        return len(bars) - replaced, f.tell()
+
+
+def read_series_file(filepath: str, start_ts: float | None = None) -> Bars:
+    """Read the bars of a csv, binary or archive file from start_ts on
+
+    Raises:
+        ValueError: the file is corrupt
+    """
+    if is_archive_file(filepath):
+        return archive.read_bars(filepath, start_ts)
+    if is_binary_file(filepath):
+        return binary_storage.read_bars(filepath, start_ts)
+    rows = read_csv_range(filepath, start_ts)
+    if rows.size == 0:
+        return Bars(np.empty(0, dtype=np.int64), np.empty((0, 0)))
+    return Bars(rows[:, 0].astype(np.int64), rows[:, 1:])
+
+
+def _seal_partition(series_dir: str, name: str, extension: str):
+    """Record the summary of a partition no longer written in the index"""
+    filepath = get_partition_filepath(series_dir, name, extension)
+    summary = get_file_summary(filepath)[:3]
+    with lock_index(series_dir):
+        partitions = read_index(series_dir)
+        partitions[name] = summary
+        write_index(series_dir, partitions)
+
+
+def _partition_series_file(series_dir: str, interval: str, extension: str):
+    """Move the bars of a file written before its interval was partitioned
+    to the partitions, before the first write of the partitions"""
+    filepath = series_dir + extension
+    if os.path.isdir(series_dir) or not os.path.exists(filepath):
+        return
+    bars = read_series_file(filepath)
+    os.makedirs(series_dir)
+    partitions = {}
+    for name, part in split_by_partition(interval, bars.ts):
+        partition_filepath = get_partition_filepath(series_dir, name, extension)
+        _write_to_series_file(partition_filepath, "", bars[part], {"details": []})
+        partitions[name] = get_file_summary(partition_filepath)[:3]
+    if len(partitions) > 0:
+        # the newest one is still written
+        partitions.pop(max(partitions))
+        with lock_index(series_dir):
+            write_index(series_dir, partitions)
+    os.remove(filepath)
+
+
+def _check_sealed_partition(
+    filepath: str, diff_filepath: str, bars: Bars, res: dict
+):
+    """Compare the bars of a sealed partition with the stored ones, as the
+    overlapped bars of a write, the bars are not written"""
+    archive_filepath = os.path.splitext(filepath)[0] + archive.ARCHIVE_EXTENSION
+    # the archive is written before the data file is removed, see
+    # compact_series
+    old_bars = bars[:0]
+    for partition_filepath in [filepath, archive_filepath]:
+        try:
+            old_bars = read_series_file(partition_filepath, bars.ts[0])
+            break
+        except FileNotFoundError:
+            # archived, or a gap between the partitions
+            continue
+    if len(old_bars) > 0:
+        old_right_ts = old_bars.ts[-1]
+        _record_overlap(res, diff_filepath, old_bars.rows(), old_right_ts, bars)
+        bars = bars[bars.ts > old_right_ts]
+    if len(bars) > 0:
+        res["status"] = "warning"
+        res["message"] = "bars of a sealed partition are not written"
+        res["details"].append(
+            {
+                "msg": res["message"],
+                "partition": os.path.basename(filepath),
+                "range(bars)": (int(bars.ts[0]), int(bars.ts[-1])),
+            }
+        )
+
+
+def _write_to_partitions(
+    series_dir: str, diff_filepath: str, interval: str, bars: Bars, res: dict
+) -> tuple[int, int] | None:
+    """_write_to_series_file for a partitioned interval
+
+    The bars are split by partition. The ones of the newest partition or of
+    later ones are written to their files, writing a later partition seals
+    the newest one. The ones of a sealed partition are only compared with
+    the stored bars.
+    """
+    extension = STORAGE_EXTENSIONS[get_storage_format()]
+    _partition_series_file(series_dir, interval, extension)
+    names = list_partitions(series_dir, extension)
+    newest = names[-1] if len(names) > 0 else None
+    written = None
+    for name, part in split_by_partition(interval, bars.ts):
+        filepath = get_partition_filepath(series_dir, name, extension)
+        if newest is not None and name < newest:
+            _check_sealed_partition(filepath, diff_filepath, bars[part], res)
+            continue
+        if newest is not None and name > newest:
+            _seal_partition(series_dir, newest, extension)
+        newest = name
+        written_part = _write_to_series_file(filepath, diff_filepath, bars[part], res)
+        if written_part is None:
+            break
+        bar_delta = written_part[0] + (written[0] if written is not None else 0)
+        written = (bar_delta, written_part[1])
+    return written
+
+
+def write_to_file(
+    storage_dir: str,
+    symbol: str,
+    interval: str,
+    bars: Bars,
+    manifest: StorageManifest | None = None,
+) -> dict:
+    """write bars to csv file in storage directory,
+    if file does not exist, create new file, then append to file
+    else if file data do not overlap with bars, direct append to existing file
+    else if file has bars that overlap with bars, check if overlapped bars are same, if same, direct append to existing file, else return warning
+
+    The bars of a partitioned interval are written to the newest partition,
+    see _write_to_partitions.
+
+    Args:
+        storage_dir (str)
+        symbol (str)
+        interval (str)
+        bars (Bars)
+        manifest (StorageManifest, optional): updated with the written file.
+            Defaults to None.
+    """
+    res = {
+        "status": "ok",
+        "message": "success",
+        "symbol": symbol,
+        "interval": interval,
+        "details": [],
+    }
+
+    filepath = get_symbol_pair_filepath(storage_dir, symbol, interval)
+    diff_filepath = get_symbol_pair_filepath(
+        storage_dir, symbol, interval, extension=".diff.csv"
+    )
+    if is_partitioned(interval):
+        written = _write_to_partitions(filepath, diff_filepath, interval, bars, res)
+    else:
+        written = _write_to_series_file(filepath, diff_filepath, bars, res)
+    if manifest is not None and written is not None:
+        bar_delta, file_size = written
+        manifest.update(symbol, interval, bars.ts[-1], bar_delta, file_size)
+
+    return res
+
+
+def update_last_bars(
+    storage_dir: str,
+    symbol: str,
+    interval: str,
+    bars: Bars,
+    manifest: StorageManifest | None = None,
+) -> dict:
+    """write the bars of a real-time update to the csv file in storage directory,
+    a bar with the timestamp of the last stored bar replaces it, newer bars are
+    appended and older ones are ignored. The last bar of a live series changes
+    until its period ends, so replacing it is not recorded as a difference.
+
+    Args:
+        storage_dir (str)
+        symbol (str)
+        interval (str)
+        bars (Bars)
+        manifest (StorageManifest, optional): updated with the written file.
+            Defaults to None.
+    """
+    res = {
+        "status": "ok",
+        "message": "success",
+        "symbol": symbol,
+        "interval": interval,
+        "replaced": 0,
+        "appended": 0,
+    }
+
+    filepath = get_symbol_pair_filepath(storage_dir, symbol, interval)
+    if is_partitioned(interval):
+        updated = _update_last_partition_bars(filepath, interval, bars, res)
+    else:
+        updated = _update_last_series_bars(filepath, bars, res)
+    if manifest is not None and updated is not None:
+        last_ts, file_size = updated
+        manifest.update(symbol, interval, last_ts, res["appended"], file_size)
 
     return res
 
 
-def diff_old_overlapped_bars(old_bars: list, new_bars: list) -> tuple[list, list]:
-    diff_bars = []
+def _update_last_series_bars(
+    filepath: str, bars: Bars, res: dict
+) -> tuple[float | None, int] | None:
+    """update_last_bars of a file, res counts the bars replaced and appended
+
+    Returns:
+        tuple[float | None, int] | None: last bar written and the size of the
+            file, None if the bars were not written
+    """
+    if is_binary_file(filepath):
+        return _update_last_binary_bars(filepath, bars, res)
+
+    with _open_csv_file(filepath) as f:
+        replaced = 0
+        last_ts = f_get_last_line_ts(f)
+        if last_ts is not None:
+            bars = bars[bars.ts >= last_ts]
+            if len(bars) > 0 and bars.ts[0] == last_ts:
+                f_remove_last_line(f)
+                replaced = 1
+
+        f.seek(0, os.SEEK_END)
+        f.write(format_bars(bars.ts, bars.values))
+        res["replaced"] += replaced
+        res["appended"] += len(bars) - replaced
+        return (bars.ts[-1] if len(bars) > 0 else None), f.tell()
+
+
+def _update_last_binary_bars(
+    filepath: str, bars: Bars, res: dict
+) -> tuple[float | None, int] | None:
+    """_update_last_series_bars for the binary format"""
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    binary_storage.write_empty_file(filepath)
+    with open(filepath, "rb+") as f:
+        width = _f_check_width(f, bars, res)
+        if width is None:
+            return None
+        replaced = 0
+        last_ts = binary_storage.f_get_last_ts(f)
+        if last_ts is not None:
+            bars = bars[bars.ts >= last_ts]
+            if len(bars) > 0 and bars.ts[0] == last_ts:
+                record_num = binary_storage.f_get_record_num(f, width)
+                binary_storage.f_truncate_records(f, width, record_num - 1)
+                replaced = 1
+
+        if len(bars) > 0:
+            binary_storage.f_append_bars(f, width, bars)
+        res["replaced"] += replaced
+        res["appended"] += len(bars) - replaced
+        f.seek(0, os.SEEK_END)
+        return (bars.ts[-1] if len(bars) > 0 else None), f.tell()
+
+
+def _update_last_partition_bars(
+    series_dir: str, interval: str, bars: Bars, res: dict
+) -> tuple[float | None, int] | None:
+    """_update_last_series_bars for a partitioned interval, the bars of a
+    sealed partition are older than the last stored one and ignored"""
+    extension = STORAGE_EXTENSIONS[get_storage_format()]
+    _partition_series_file(series_dir, interval, extension)
+    names = list_partitions(series_dir, extension)
+    newest = names[-1] if len(names) > 0 else None
+    updated = None
+    for name, part in split_by_partition(interval, bars.ts):
+        if newest is not None and name < newest:
+            continue
+        if newest is not None and name > newest:
+            _seal_partition(series_dir, newest, extension)
+        newest = name
+        filepath = get_partition_filepath(series_dir, name, extension)
+        updated_part = _update_last_series_bars(filepath, bars[part], res)
+        if updated_part is None:
+            break
+        updated = updated_part
+    return updated
+
+
+def diff_old_overlapped_bars(
+    old_bars: np.ndarray, new_bars: np.ndarray
+) -> tuple[np.ndarray, list]:
+    """Compare the stored bars with the new bars over the same range
+
+    The bars are matched by timestamp, a stored bar differs if the new bar of
+    its timestamp has other values (NaN equals NaN), or if there is none.
+
+    Args:
+        old_bars (np.ndarray): float64 rows of the stored bars
+        new_bars (np.ndarray): float64 rows of the new bars
+
+    Returns:
+        tuple[np.ndarray, list]: rows of the stored bars that differ, details
+            of the differences
+    """
     details = []
-    if len(old_bars) == len(new_bars):
-        for old_bar, new_bar in zip(old_bars, new_bars):
-            new_bar_convert = [float(x) for x in new_bar["v"]]
-            if old_bar != new_bar_convert:
-                diff_bars.append(old_bar)
-        if len(diff_bars):
-            details.append(
-                {
-                    "msg": "old_bars and new_bars are different",
-                    "len(diff_bars)": len(diff_bars),
-                }
-            )
+    if old_bars.shape == new_bars.shape and np.array_equal(
+        old_bars[:, :1], new_bars[:, :1]
+    ):
+        old_idx = np.arange(len(old_bars))
+        new_idx = old_idx
     else:
         details.append(
             {
                 "msg": "old_bars and new_bars have different length",
                 "len(old_bars)": len(old_bars),
                 "len(new_bars)": len(new_bars),
-                "range(old_bars)": (old_bars[0][0], old_bars[-1][0]),
-                "range(new_bars)": (new_bars[0]["v"][0], new_bars[-1]["v"][0]),
+                "range(old_bars)": (
+                    (old_bars[0][0], old_bars[-1][0]) if len(old_bars) else None
+                ),
+                "range(new_bars)": (
+                    (new_bars[0][0], new_bars[-1][0]) if len(new_bars) else None
+                ),
+            }
+        )
+        if len(old_bars) == 0:
+            # nothing stored to report, e.g. the stored lines did not parse
+            return old_bars, details
+        if old_bars.ndim != 2 or new_bars.ndim != 2:
+            return old_bars.reshape(len(old_bars), -1), details
+        _, old_idx, new_idx = np.intersect1d(
+            old_bars[:, 0], new_bars[:, 0], assume_unique=True, return_indices=True
+        )
+
+    diff_mask = np.ones(len(old_bars), dtype=bool)
+    if old_bars.shape[1] == new_bars.shape[1]:
+        old_matched = old_bars[old_idx]
+        new_matched = new_bars[new_idx]
+        changed = (old_matched != new_matched) & ~(
+            np.isnan(old_matched) & np.isnan(new_matched)
+        )
+        diff_mask[old_idx] = changed.any(axis=1)
+    diff_bars = old_bars[diff_mask]
+
+    if len(details) > 0:
+        details[0]["missing(old_bars)"] = len(old_bars) - len(old_idx)
+        details[0]["missing(new_bars)"] = len(new_bars) - len(new_idx)
+    elif len(diff_bars):
+        details.append(
+            {
+                "msg": "old_bars and new_bars are different",
+                "len(diff_bars)": len(diff_bars),
             }
         )
     return diff_bars, details
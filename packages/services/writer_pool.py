@@ -0,0 +1,187 @@
+import time
+import logging
+import threading
+import traceback
+import numpy as np
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable
+from ..schedulers.byte_budget import ByteBudget
+from ..services.bars import Bars
+from ..services.metrics import Histogram
+from ..services.storage_manifest import StorageManifest
+from ..services.write import write_to_file
+
+# threads writing the results of getBars
+WRITER_THREADS = 4
+
+
+def merge_bars(bars_list: list[Bars]) -> list[Bars]:
+    """Merge bars written one after the other to the same file
+
+    A write replaces the stored bars from its first timestamp on, so the
+    later bars replace the earlier ones they overlap. Bars with another
+    number of values are not merged and stay a write of their own.
+
+    Args:
+        bars_list (list[Bars]): in the order they were submitted
+
+    Returns:
+        list[Bars]: the bars to write, in order
+    """
+    merged = [bars_list[0]]
+    for bars in bars_list[1:]:
+        last = merged[-1]
+        if len(bars) == 0 or len(last) == 0 or bars.width != last.width:
+            merged.append(bars)
+            continue
+        last = last[last.ts < bars.ts[0]]
+        merged[-1] = Bars(
+            np.concatenate((last.ts, bars.ts)),
+            np.concatenate((last.values, bars.values)),
+        )
+    return merged
+
+
+class WriterPool:
+    """Writes the bars of many pairs on a few threads.
+
+    The bars submitted for a pair are queued per file, a file is written by
+    one thread at a time and the bars queued for it while it is written are
+    merged into the next write, so each file is opened once per batch and
+    its bars formatted into one buffer written in one call (write_to_file).
+
+    on_written is called on the writer thread after each write, with the
+    symbol, interval and result of write_to_file, its errors are logged. Once
+    written, or failed, the bytes of the bars leave the budget, letting the
+    fetching go on.
+    """
+
+    def __init__(
+        self,
+        storage_dir: str,
+        num_threads: int = WRITER_THREADS,
+        manifest: StorageManifest | None = None,
+        budget: ByteBudget | None = None,
+        on_written: Callable[[str, str, dict], None] | None = None,
+        logger: logging.Logger | None = None,
+    ):
+        """
+        Args:
+            storage_dir (str)
+            num_threads (int, optional): Defaults to WRITER_THREADS.
+            manifest (StorageManifest, optional): updated with the writes.
+                Defaults to None.
+            budget (ByteBudget, optional): the submitted bars are removed
+                from it once written. Defaults to None.
+            on_written (Callable[[str, str, dict], None], optional): called
+                after each write. Defaults to None.
+            logger (logging.Logger, optional): logs the errors of on_written.
+                Defaults to None.
+        """
+        self.storage_dir = storage_dir
+        self.manifest = manifest
+        self.budget = budget
+        self.on_written = on_written
+        self.logger = logger
+        self.executor = ThreadPoolExecutor(num_threads, thread_name_prefix="writer")
+        self.lock = threading.Lock()
+        # bars waiting to be written and the pairs being written
+        self.pending: dict[tuple[str, str], list[Bars]] = {}
+        self.active: set[tuple[str, str]] = set()
+        self.futures: list[Future] = []
+        self.write_cnt = 0
+        self.bar_cnt = 0
+        self.write_time = Histogram()
+
+    def submit(self, symbol: str, interval: str, bars: Bars):
+        """Queue the bars of a pair to be written"""
+        symbol_pair = (symbol, interval)
+        with self.lock:
+            self.pending.setdefault(symbol_pair, []).append(bars)
+            if symbol_pair in self.active:
+                # written after the current write of the file
+                return
+            self.active.add(symbol_pair)
+            self.futures.append(self.executor.submit(self._write_pair, symbol_pair))
+
+    def _write(self, symbol: str, interval: str, bars: Bars):
+        start = time.perf_counter()
+        try:
+            res = write_to_file(self.storage_dir, symbol, interval, bars, self.manifest)
+        except Exception as e:
+            res = {
+                "status": "error",
+                "message": repr(e),
+                "symbol": symbol,
+                "interval": interval,
+                "details": [],
+            }
+        duration = time.perf_counter() - start
+        with self.lock:
+            self.write_cnt += 1
+            self.bar_cnt += len(bars)
+            self.write_time.observe(duration)
+        if self.on_written is None:
+            return
+        try:
+            self.on_written(symbol, interval, res)
+        except Exception as e:
+            if self.logger is not None:
+                self.logger.error(f"({symbol},{interval}) on_written error: {e}")
+                self.logger.error(f"Traceback: {traceback.format_exc()}")
+
+    def _write_pair(self, symbol_pair: tuple[str, str]):
+        symbol, interval = symbol_pair
+        try:
+            while True:
+                with self.lock:
+                    bars_list = self.pending.pop(symbol_pair, None)
+                    if bars_list is None:
+                        self.active.discard(symbol_pair)
+                        return
+                try:
+                    for bars in merge_bars(bars_list):
+                        self._write(symbol, interval, bars)
+                finally:
+                    if self.budget is not None:
+                        for bars in bars_list:
+                            self.budget.remove(bars.nbytes)
+        except BaseException:
+            # the next submit of the pair writes its pending bars
+            with self.lock:
+                self.active.discard(symbol_pair)
+            raise
+
+    def flush(self):
+        """Wait until all the submitted bars are written"""
+        while True:
+            with self.lock:
+                futures = self.futures
+                self.futures = []
+            if len(futures) == 0:
+                return
+            wait(futures)
+            for future in futures:
+                future.result()
+
+    def stats(self) -> dict:
+        """Writes, bars written and the write time since the last reset, the
+        time of each write is in write_time"""
+        with self.lock:
+            return {
+                "writes": self.write_cnt,
+                "bars": self.bar_cnt,
+                "write_time": self.write_time.sum,
+                "p50": self.write_time.quantile(0.5),
+                "p99": self.write_time.quantile(0.99),
+            }
+
+    def reset_stats(self):
+        with self.lock:
+            self.write_cnt = 0
+            self.bar_cnt = 0
+            self.write_time = Histogram()
+
+    def close(self):
+        self.flush()
+        self.executor.shutdown()
@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class FrameType(str, Enum):
+    HEARTBEAT = "heartbeat"
+    MESSAGE = "message"
+    OTHER = "other"
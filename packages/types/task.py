@@ -6,3 +6,4 @@ class TaskType(str, Enum):
     GET_BARS = "task_get_bars"
     UPDATE_LOGGER = "task_update_logger"
     UPDATE_AUTH = "task_update_auth"
+    COMPACT_STORAGE = "task_compact_storage"
@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class WorkerMessageType(str, Enum):
+    RESULT = "result"
+    DONE = "done"
+    LOG = "log"
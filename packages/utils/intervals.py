@@ -1,5 +1,14 @@
+import math
 from typing import Literal
-from ..constants.intervals import INTERVAL_LIST_DICT
+from ..constants.intervals import (
+    INTERVAL_LIST_DICT,
+    MAX_BARS,
+    MAX_BARS_BUCKETS,
+    MAX_INTERVAL,
+    MAX_INTRADAY_INTERVAL,
+    MIN_INTERVAL_BARS,
+    OVERLAP_BARS,
+)
 
 
 def get_interval_list(
@@ -34,6 +43,9 @@ def interval_to_second(interval: str) -> int:
         int: seconds
     """
     unit = interval[-1]
+    if unit.isdigit():
+        # minutes, e.g. "1", "15", "240"
+        return int(interval) * 60
     val = int(interval[:-1] if interval[:-1] != "" else 1)
     try:
         match unit:
@@ -53,6 +65,24 @@ def interval_to_second(interval: str) -> int:
         return val
 
 
+def get_schedule_period(interval: str) -> int:
+    """Get the seconds between two crawls of a pair
+
+    The time of MIN_INTERVAL_BARS bars, at most MAX_INTRADAY_INTERVAL for the
+    seconds and minutes intervals and MAX_INTERVAL for the others.
+
+    Args:
+        interval (str): interval
+
+    Returns:
+        int: seconds
+    """
+    period = interval_to_second(interval) * MIN_INTERVAL_BARS
+    if interval_to_second(interval) < 24 * 60 * 60:
+        return min(period, MAX_INTRADAY_INTERVAL)
+    return min(period, MAX_INTERVAL)
+
+
 def cmp_interval(t1: str, t2: str) -> int:
     """Compare interval
 
@@ -64,3 +94,34 @@ def cmp_interval(t1: str, t2: str) -> int:
         int: -1 if t1 < t2, 0 if t1 == t2, 1 if t1 > t2
     """
     return interval_to_second(t1) - interval_to_second(t2)
+
+
+def get_max_bars(
+    interval: str,
+    last_ts: float | None,
+    now: float,
+    overlap_bars: int = OVERLAP_BARS,
+    max_bars: int = MAX_BARS,
+) -> int:
+    """Get the number of bars to request to catch up from last_ts
+
+    Args:
+        interval (str): interval
+        last_ts (float | None): timestamp of the last stored bar, None if
+            nothing is stored
+        now (float): current timestamp
+        overlap_bars (int, optional): stored bars to fetch again.
+            Defaults to OVERLAP_BARS.
+        max_bars (int, optional): Defaults to MAX_BARS.
+
+    Returns:
+        int: bars needed, rounded up to one of MAX_BARS_BUCKETS, at most max_bars
+    """
+    if last_ts is None:
+        return max_bars
+    needed = math.ceil(max(now - last_ts, 0) / interval_to_second(interval))
+    needed += overlap_bars
+    for bucket in MAX_BARS_BUCKETS:
+        if needed <= bucket:
+            return min(bucket, max_bars)
+    return max_bars
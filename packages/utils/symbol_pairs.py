@@ -0,0 +1,16 @@
+def group_by_symbol(
+    symbol_pair_list: list[tuple[str, str]]
+) -> dict[str, list[tuple[str, str]]]:
+    """Group pairs by symbol
+
+    Args:
+        symbol_pair_list (list[tuple[str, str]]): list of (symbol, interval)
+
+    Returns:
+        dict[str, list[tuple[str, str]]]: pairs of each symbol, the symbols
+            and their pairs keep the order of symbol_pair_list
+    """
+    groups: dict[str, list[tuple[str, str]]] = {}
+    for symbol_pair in symbol_pair_list:
+        groups.setdefault(symbol_pair[0], []).append(symbol_pair)
+    return groups
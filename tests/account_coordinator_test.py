@@ -0,0 +1,83 @@
+import logging
+
+from packages.mocks.tradingview_server import start_mock_server_thread
+from packages.schedulers.hash_ring import ConsistentHashRing
+from packages.scrapers.account_coordinator import AccountCoordinator
+from packages.services.connection import TradingViewConnection
+
+logger = logging.getLogger("test")
+
+
+def make_coordinator(url: str = "ws://127.0.0.1:1") -> AccountCoordinator:
+    coordinator = AccountCoordinator(
+        logger, [("a", ""), ("b", ""), ("pro", "")], cache_dir="", url=url, max_cs=2
+    )
+    coordinator.set_auth("a", "token_a", False)
+    coordinator.set_auth("b", "token_b", False)
+    coordinator.set_auth("pro", "token_pro", True)
+    return coordinator
+
+
+class TestClass:
+    def test_hash_ring_1(self):
+        ring = ConsistentHashRing(["a", "b", "c"])
+        keys = [f"MOCK:SYM{i}" for i in range(1000)]
+        before = {key: ring.get(key) for key in keys}
+        assert all(150 < list(before.values()).count(node) < 500 for node in "abc")
+
+        # only the keys of the removed node move
+        ring.remove("b")
+        for key in keys:
+            if before[key] != "b":
+                assert ring.get(key) == before[key]
+            else:
+                assert ring.get(key) in ("a", "c")
+        ring.add("b")
+        assert {key: ring.get(key) for key in keys} == before
+        assert ConsistentHashRing().get("MOCK:SYM0") is None
+
+    def test_account_coordinator_1(self):
+        coordinator = make_coordinator()
+        pairs = [(f"MOCK:SYM{i}", interval) for i in range(30) for interval in ["1S", "1", "1D"]]
+        pairs.append(("ECONOMICS:X", "1M"))
+        shard_dict, unassigned = coordinator.assign(pairs, pro_symbol_set={"ECONOMICS:X"})
+        assert unassigned == []
+        assert sorted(sum(shard_dict.values(), [])) == sorted(pairs)
+        assert len(shard_dict) == 3
+        for username, shard in shard_dict.items():
+            if username != "pro":
+                assert all(interval != "1S" for _, interval in shard)
+        assert ("ECONOMICS:X", "1M") in shard_dict["pro"]
+        # the other intervals of a symbol stay together
+        owner = {}
+        for username, shard in shard_dict.items():
+            for symbol, interval in shard:
+                if interval != "1S":
+                    assert owner.setdefault(symbol, username) == username
+
+        # without a pro account, pro only pairs have no account
+        coordinator.mark_failed("pro", "test")
+        shard_dict, unassigned = coordinator.assign(pairs, pro_symbol_set={"ECONOMICS:X"})
+        assert len(unassigned) == 31
+        assert set(shard_dict) == {"a", "b"}
+        coordinator.close()
+
+    def test_account_coordinator_2(self):
+        # the pairs of a failing account are fetched by the others
+        mock, url, stop = start_mock_server_thread(bar_count=10)
+        coordinator = make_coordinator(url)
+        coordinator.accounts["b"].connection = TradingViewConnection(
+            logger, "ws://127.0.0.1:1"
+        )
+        pairs = [(f"MOCK:SYM{i}", interval) for i in range(10) for interval in ["1S", "1D"]]
+        try:
+            results, unassigned = coordinator.get_bars(pairs)
+        finally:
+            coordinator.close()
+            stop.set()
+
+        assert unassigned == []
+        assert sorted((r[0], r[1]) for r in results) == sorted(pairs)
+        assert all(r[3]["status"] == "ok" for r in results)
+        assert "b" not in coordinator.ring
+        assert set(coordinator.ring.node_set) == {"a", "pro"}
@@ -0,0 +1,108 @@
+import os
+
+import numpy as np
+import pytest
+
+from packages.services import archive
+from packages.services.bars import Bars
+from packages.services.partitions import read_index
+from packages.services.read import read_bars
+from packages.services.write import (
+    compact_storage,
+    get_file_summary,
+    get_symbol_pair_filepath,
+    write_to_file,
+)
+
+DAY = 24 * 60 * 60
+
+
+def make_bars(start_ts: int, num: int, close: float = 1.25, step: int = 1) -> Bars:
+    ts = start_ts + step * np.arange(num, dtype=np.int64)
+    values = np.random.default_rng(0).random((num, 5))
+    values[:, 3] = close
+    return Bars(ts, values)
+
+
+class TestClass:
+    def test_archive_1(self, tmp_path, monkeypatch):
+        filepath = str(tmp_path / "bars.tvz")
+        bars = make_bars(1000, 10000)
+        archive.write_archive(filepath, bars, archive.CODEC_ZLIB, block_bars=1000)
+        assert archive.get_summary(filepath)[:2] == [10999, 10000]
+
+        read = archive.read_bars(filepath)
+        assert read.ts.tolist() == bars.ts.tolist()
+        assert np.array_equal(read.values, bars.values)
+
+        # only the blocks overlapping the range are decompressed
+        decompressed = []
+        decompress = archive._decompress
+
+        def spy_decompress(codec, data):
+            decompressed.append(len(data))
+            return decompress(codec, data)
+
+        monkeypatch.setattr(archive, "_decompress", spy_decompress)
+        read = archive.read_bars(filepath, 2500, 3500)
+        assert read.ts.tolist() == list(range(2500, 3501))
+        assert len(decompressed) == 2
+        assert len(archive.read_bars(filepath, 20000)) == 0
+
+    @pytest.mark.parametrize("storage_format", ["csv", "binary"])
+    def test_archive_2(self, tmp_path, monkeypatch, storage_format):
+        monkeypatch.setenv("TV_STORAGE_FORMAT", storage_format)
+        storage_dir = str(tmp_path)
+        bars = make_bars(DAY - 60000, 3 * 1440, step=60)
+        write_to_file(storage_dir, "MOCK:SYM", "1S", bars)
+        series_dir = get_symbol_pair_filepath(storage_dir, "MOCK:SYM", "1S")
+        expected = read_bars(storage_dir, "MOCK:SYM", "1S", copy=True)
+        summary = get_file_summary(series_dir)
+
+        stats = compact_storage(storage_dir, num_processes=2)
+        assert stats["partitions"] == 3
+        assert stats["bytes_after"] < stats["bytes_before"]
+        assert sorted(os.listdir(series_dir))[:3] == [
+            f"1970-01-0{i}.tvz" for i in range(1, 4)
+        ]
+        assert read_index(series_dir)["1970-01-01"][2] == os.path.getsize(
+            os.path.join(series_dir, "1970-01-01.tvz")
+        )
+        assert compact_storage(storage_dir)["partitions"] == 0
+
+        read = read_bars(storage_dir, "MOCK:SYM", "1S")
+        for column, array in expected.items():
+            assert np.array_equal(read[column], array)
+        read = read_bars(storage_dir, "MOCK:SYM", "1S", DAY - 60, DAY)
+        assert read["timestamp"].tolist() == [DAY - 60, DAY]
+        assert get_file_summary(series_dir)[:2] == summary[:2]
+
+        # the archived partitions are verified as the sealed ones
+        res = write_to_file(
+            storage_dir, "MOCK:SYM", "1S", make_bars(3 * DAY - 600, 10, 1.75, step=60)
+        )
+        assert res["status"] == "warning"
+        assert res["details"][0]["len(diff_bars)"] == 10
+
+    def test_archive_3(self, tmp_path, monkeypatch):
+        # a partition sealed by a write while the series is compacted is kept
+        # in the index
+        storage_dir = str(tmp_path)
+        write_to_file(storage_dir, "MOCK:SYM", "1S", make_bars(0, 2 * 1440, step=60))
+        series_dir = get_symbol_pair_filepath(storage_dir, "MOCK:SYM", "1S")
+        write_archive = archive.write_archive
+
+        def write_archive_and_seal(*args):
+            size = write_archive(*args)
+            bars = make_bars(2 * DAY, 10, step=60)
+            write_to_file(storage_dir, "MOCK:SYM", "1S", bars)
+            return size
+
+        monkeypatch.setattr(archive, "write_archive", write_archive_and_seal)
+        assert compact_storage(storage_dir)["partitions"] == 1
+        partitions = read_index(series_dir)
+        assert list(partitions) == ["1970-01-01", "1970-01-02"]
+        assert partitions["1970-01-01"][2] == os.path.getsize(
+            os.path.join(series_dir, "1970-01-01.tvz")
+        )
+        assert len(read_bars(storage_dir, "MOCK:SYM", "1S")["timestamp"]) == 2890
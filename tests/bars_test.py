@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from packages.services.bars import Bars
+
+
+class TestClass:
+    def test_bars_1(self):
+        bars = Bars.from_series(
+            [{"i": i, "v": [1693550000.0 + 60 * i, 1.0, 2.0, 0.5, 1.5, 10.0]} for i in range(3)]
+        )
+        assert len(bars) == 3
+        assert bars.width == 5
+        assert bars.ts.dtype == np.int64
+        assert bars.ts.tolist() == [1693550000, 1693550060, 1693550120]
+        assert bars[1:].ts.tolist() == [1693550060, 1693550120]
+        assert bars.to_csv().splitlines()[0] == "1693550000,1.0,2.0,0.5,1.5,10.0"
+
+    def test_bars_2(self):
+        assert len(Bars.from_series([])) == 0
+        # bars without volume
+        assert Bars.from_series([{"v": [1.0, 2.0, 3.0, 1.0, 2.0]}]).width == 4
+
+    def test_bars_3(self):
+        # a missing value or a short bar is nan, a bar without timestamp is
+        # dropped, the rest of the series is kept
+        bars = Bars.from_series(
+            [
+                {"v": [60.0, 1.0, 2.0]},
+                {"v": [120.0, 2.0, None]},
+                {"v": [180.0, 3.0]},
+                {"v": [None, 4.0, 5.0]},
+            ]
+        )
+        assert bars.ts.tolist() == [60, 120, 180]
+        assert np.array_equal(
+            bars.values, [[1.0, 2.0], [2.0, np.nan], [3.0, np.nan]], equal_nan=True
+        )
+        with pytest.raises(ValueError):
+            Bars.from_series([{"v": ["a", 1.0]}])
+        with pytest.raises(ValueError):
+            Bars.from_series([{"i": 0}])
+        with pytest.raises(ValueError):
+            Bars.from_series([{"v": [1.0]}])
@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+
+from packages.services import binary_storage
+from packages.services.bars import Bars
+from packages.services.resample import read_bars_since, resample_file
+from packages.services.write import (
+    get_last_line_ts,
+    get_symbol_pair_filepath,
+    update_last_bars,
+    write_to_file,
+)
+
+
+def make_bars(start_ts: int, num: int, close: float = 1.25) -> Bars:
+    ts = start_ts + 60 * np.arange(num, dtype=np.int64)
+    values = np.tile([1.5, 2.0, 1.0, close, 100.0], (num, 1))
+    return Bars(ts, values)
+
+
+class TestClass:
+    def test_binary_storage_1(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("TV_STORAGE_FORMAT", "binary")
+        storage_dir = str(tmp_path)
+        filepath = get_symbol_pair_filepath(storage_dir, "MOCK:SYM", "1")
+        assert filepath.endswith("1.bin")
+
+        res = write_to_file(storage_dir, "MOCK:SYM", "1", make_bars(60, 6))
+        assert res["status"] == "ok"
+        # overlapping bars are verified and replaced
+        res = write_to_file(storage_dir, "MOCK:SYM", "1", make_bars(240, 7))
+        assert res["status"] == "ok"
+        assert get_last_line_ts(filepath) == 60 * 10
+        assert os.path.getsize(filepath) == binary_storage.HEADER.size + 10 * 48
+
+        bars = binary_storage.read_bars(filepath)
+        assert bars.ts.tolist() == [60 * i for i in range(1, 11)]
+        assert bars.values.tolist() == make_bars(60, 10).values.tolist()
+        bars = binary_storage.read_bars(filepath, 150, 300)
+        assert bars.ts.tolist() == [180, 240, 300]
+
+        # a stored bar that changed is reported
+        res = write_to_file(storage_dir, "MOCK:SYM", "1", make_bars(540, 2, 1.75))
+        assert res["status"] == "warning"
+        diff_filepath = get_symbol_pair_filepath(
+            storage_dir, "MOCK:SYM", "1", ".diff.csv"
+        )
+        with open(diff_filepath) as f:
+            assert len(f.readlines()) == 2
+
+        # bars of another width do not fit the records
+        bars = Bars(np.array([660]), np.array([[1.0, 1.0, 1.0, 1.0]]))
+        res = write_to_file(storage_dir, "MOCK:SYM", "1", bars)
+        assert res["status"] == "error"
+        assert get_last_line_ts(filepath) == 600
+
+    def test_binary_storage_2(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("TV_STORAGE_FORMAT", "binary")
+        storage_dir = str(tmp_path)
+        filepath = get_symbol_pair_filepath(storage_dir, "MOCK:SYM", "1")
+        write_to_file(storage_dir, "MOCK:SYM", "1", make_bars(60, 3))
+
+        res = update_last_bars(storage_dir, "MOCK:SYM", "1", make_bars(120, 3, 1.5))
+        assert (res["replaced"], res["appended"]) == (1, 1)
+        bars = binary_storage.read_bars(filepath)
+        assert bars.ts.tolist() == [60, 120, 180, 240]
+        assert bars.values[:, 3].tolist() == [1.25, 1.25, 1.5, 1.5]
+
+        # a partly written record is ignored, then overwritten
+        with open(filepath, "ab") as f:
+            f.write(b"\x01\x02\x03")
+        assert get_last_line_ts(filepath) == 240
+        write_to_file(storage_dir, "MOCK:SYM", "1", make_bars(300, 1))
+        assert binary_storage.read_bars(filepath).ts.tolist() == [60, 120, 180, 240, 300]
+
+        assert read_bars_since(filepath, 200).ts.tolist() == [240, 300]
+        res = resample_file(storage_dir, "MOCK:SYM", "1", "5")
+        assert res["appended"] == 1
+        stored = read_bars_since(get_symbol_pair_filepath(storage_dir, "MOCK:SYM", "5"), None)
+        assert stored.ts.tolist() == [300]
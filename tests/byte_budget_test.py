@@ -0,0 +1,54 @@
+import time
+import logging
+
+from packages.mocks.tradingview_server import start_mock_server_thread
+from packages.schedulers.byte_budget import ByteBudget, get_result_size
+from packages.scrapers.tradingview import iter_parallel_multiple_bars
+
+logger = logging.getLogger("test")
+
+
+class TestClass:
+    def test_byte_budget_1(self):
+        budget = ByteBudget(max_bytes=100)
+        budget.add(60)
+        assert not budget.is_full()
+        budget.add(60)
+        assert budget.is_full()
+        budget.remove(60)
+        assert not budget.is_full()
+        budget.add_stall(0.5)
+        assert budget.stats() == {
+            "items": 1,
+            "bytes": 60,
+            "peak_items": 2,
+            "peak_bytes": 120,
+            "stall_time": 0.5,
+        }
+        budget.reset()
+        assert budget.stats()["peak_bytes"] == 0
+
+    def test_byte_budget_2(self):
+        # a slow consumer pauses the requests instead of letting the results
+        # pile up, the bars of 10 bars take 480 bytes
+        mock, url, stop = start_mock_server_thread(bar_count=10)
+        pairs = [(f"MOCK:SYM{i}", "1D") for i in range(8)]
+        budget = ByteBudget(max_bytes=1000)
+        results = []
+        try:
+            for result in iter_parallel_multiple_bars(
+                logger, "", pairs, max_cs=2, url=url, budget=budget
+            ):
+                time.sleep(0.1)
+                budget.remove(get_result_size(result))
+                results.append(result)
+        finally:
+            stop.set()
+
+        assert sorted(r[:2] for r in results) == sorted(pairs)
+        assert all(r[3]["status"] == "ok" for r in results)
+        stats = budget.stats()
+        assert stats["items"] == 0 and stats["bytes"] == 0
+        # full at 3 results, plus the 2 series in flight
+        assert stats["peak_items"] <= 5
+        assert stats["stall_time"] > 0
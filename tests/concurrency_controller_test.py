@@ -0,0 +1,86 @@
+import asyncio
+import logging
+
+from packages.mocks.tradingview_server import start_mock_server_thread
+from packages.schedulers.concurrency_controller import ConcurrencyController
+from packages.scrapers.tradingview import BarsBatch, async_get_multiple_bars
+from packages.services.connection import TradingViewConnection
+from packages.services.frame_decoder import FrameDecoder
+from packages.services.websockets import prepend_header
+
+logger = logging.getLogger("test")
+
+
+def make_pairs(num_symbols: int) -> list[tuple[str, str]]:
+    return [(f"MOCK:SYM{i}", interval) for i in range(num_symbols) for interval in ["1", "1D"]]
+
+
+class TestClass:
+    def test_concurrency_controller_1(self):
+        controller = ConcurrencyController(max_window=8, latency_target=1.0)
+        assert controller.limit == 4
+        # one more chart session per window of healthy series
+        for _ in range(5):
+            controller.success(0.1)
+        assert controller.limit == 5
+        # slow series do not grow the window
+        for _ in range(10):
+            controller.success(2.0)
+        assert controller.limit == 5
+        for _ in range(100):
+            controller.success(0.1)
+        assert controller.limit == 8
+
+    def test_concurrency_controller_2(self):
+        controller = ConcurrencyController(max_window=8, initial_window=8)
+        assert controller.backoff()
+        assert controller.limit == 4
+        # a burst of errors backs off once
+        assert not controller.backoff()
+        assert controller.limit == 4
+        controller.last_backoff = float("-inf")
+        controller.backoff()
+        controller.last_backoff = float("-inf")
+        controller.backoff()
+        controller.last_backoff = float("-inf")
+        controller.backoff()
+        assert controller.limit == 1
+
+    def test_concurrency_controller_3(self):
+        async def fetch(url: str) -> tuple[list, TradingViewConnection]:
+            connection = TradingViewConnection(logger, url)
+            results = await async_get_multiple_bars(
+                logger, "", make_pairs(20), max_cs=8, connection=connection, adaptive_cs=True
+            )
+            await connection.close()
+            return results, connection
+
+        # healthy connection, the window grows to max_cs
+        mock, url, stop = start_mock_server_thread(bar_count=10)
+        try:
+            results, connection = asyncio.run(fetch(url))
+        finally:
+            stop.set()
+        assert len(results) == 40
+        assert connection.controller.limit == 8
+
+        # critical errors, the window shrinks
+        mock, url, stop = start_mock_server_thread(
+            bar_count=10, error_rate=1.0, error_types=["critical_error"]
+        )
+        try:
+            results, connection = asyncio.run(fetch(url))
+        finally:
+            stop.set()
+        assert len(results) == 40
+        assert connection.controller.limit < 4
+
+    def test_concurrency_controller_4(self):
+        # an error of the connection, with no chart session, shrinks the window
+        connection = TradingViewConnection(logger, "ws://127.0.0.1:1")
+        batch = BarsBatch(logger, connection, "", [], max_cs=8, adaptive_cs=True)
+        assert batch.controller.limit == 4
+        payload = '{"m": "protocol_error", "p": ["wrong data"]}'
+        for frame in FrameDecoder().feed(prepend_header(payload)):
+            asyncio.run(batch._handle_frame(frame))
+        assert batch.controller.limit < 4
@@ -0,0 +1,206 @@
+import asyncio
+import logging
+
+from packages.mocks.tradingview_server import start_mock_server_thread
+from packages.scrapers.tradingview import (
+    BarsBatch,
+    async_get_multiple_bars,
+    close_worker_connection,
+    create_stream_pool,
+    iter_parallel_multiple_bars,
+    sync_get_multiple_bars,
+)
+from packages.services.connection import TradingViewConnection
+
+logger = logging.getLogger("test")
+
+
+def make_pairs(num_symbols: int) -> list[tuple[str, str]]:
+    return [(f"MOCK:SYM{i}", interval) for i in range(num_symbols) for interval in ["1", "1D"]]
+
+
+class TestClass:
+    def test_connection_1(self):
+        mock, url, stop = start_mock_server_thread(bar_count=10)
+        try:
+            for auth_token in ["token_a", "token_a", "token_b"]:
+                results = sync_get_multiple_bars(
+                    logger, auth_token, make_pairs(3), max_cs=2, url=url, keep_alive=True
+                )
+                assert len(results) == 6
+                assert all(r[3]["status"] == "ok" for r in results)
+        finally:
+            close_worker_connection()
+            stop.set()
+
+        # one handshake and two chart sessions for all batches,
+        # the rotated token is re-sent on the open connection
+        assert mock.stats["connections"] == 1
+        assert mock.stats["messages_received"]["chart_create_session"] == 2
+        assert mock.stats["messages_received"]["set_auth_token"] == 2
+
+    def test_connection_2(self):
+        mock, url, stop = start_mock_server_thread(bar_count=10, close_after_series=3)
+
+        async def run():
+            connection = TradingViewConnection(logger, url)
+            try:
+                return await async_get_multiple_bars(
+                    logger, "", make_pairs(3), max_cs=2, connection=connection
+                )
+            finally:
+                await connection.close()
+
+        try:
+            results = asyncio.run(run())
+        finally:
+            stop.set()
+
+        # pairs in flight when the server dropped the connection are re-sent
+        assert sorted((r[0], r[1]) for r in results) == sorted(make_pairs(3))
+        assert all(r[3]["status"] == "ok" for r in results)
+        assert mock.stats["connections"] > 1
+
+    def test_connection_3(self):
+        # the "1" series never come in time, only their chart sessions are
+        # dropped and the "1D" series keep flowing on the same connection
+        mock, url, stop = start_mock_server_thread(
+            bar_count=10, interval_latency={"1": 2.0}
+        )
+
+        async def run():
+            connection = TradingViewConnection(logger, url)
+            batch = BarsBatch(
+                logger,
+                connection,
+                "",
+                make_pairs(3),
+                max_cs=2,
+                series_timeout=0.3,
+                series_timeout_per_kbar=0,
+                max_retry=1,
+            )
+            try:
+                return [result async for result in batch.iter_results()]
+            finally:
+                await connection.close()
+
+        try:
+            results = asyncio.run(run())
+        finally:
+            stop.set()
+
+        assert sorted((r[0], r[1]) for r in results) == sorted(make_pairs(3))
+        for symbol, interval, bars, detail in results:
+            if interval == "1":
+                assert bars is None and detail["m"] == "timeout"
+            else:
+                assert detail["status"] == "ok" and len(bars) == 10
+        assert mock.stats["connections"] == 1
+        # each "1" pair is tried twice
+        assert mock.stats["messages_received"]["chart_delete_session"] >= 6
+
+    def test_connection_4(self):
+        # a symbol is resolved once and its intervals follow with modify_series,
+        # even when the pairs are not given grouped by symbol
+        mock, url, stop = start_mock_server_thread(bar_count=10)
+        pairs = [(f"MOCK:SYM{i}", interval) for interval in ["1", "5", "1D"] for i in range(3)]
+        try:
+            results = sync_get_multiple_bars(logger, "", pairs, max_cs=1, url=url)
+        finally:
+            stop.set()
+
+        assert sorted((r[0], r[1]) for r in results) == sorted(pairs)
+        assert all(r[3]["status"] == "ok" for r in results)
+        assert all(r[3]["data_frequency"] == "1S" for r in results)
+        assert mock.stats["messages_received"]["resolve_symbol"] == 3
+        assert mock.stats["messages_received"]["modify_series"] == 8
+
+    def test_connection_5(self):
+        # a large series gets more time to arrive than a small one
+        mock, url, stop = start_mock_server_thread(
+            bar_count=10, interval_latency={"1": 0.6}
+        )
+        pairs = [("MOCK:SYM0", "1"), ("MOCK:SYM1", "1")]
+
+        async def run():
+            connection = TradingViewConnection(logger, url)
+            batch = BarsBatch(
+                logger,
+                connection,
+                "",
+                pairs,
+                max_cs=2,
+                max_bars_dict={pairs[0]: 50000, pairs[1]: 100},
+                series_timeout=0.3,
+                series_timeout_per_kbar=0.02,
+                max_retry=0,
+            )
+            try:
+                return [result async for result in batch.iter_results()]
+            finally:
+                await connection.close()
+
+        try:
+            results = asyncio.run(run())
+        finally:
+            stop.set()
+
+        status = {(r[0], r[1]): r[3].get("m") for r in results}
+        assert status[pairs[0]] != "timeout"
+        assert status[pairs[1]] == "timeout"
+
+    def test_connection_6(self):
+        # a caller stopping early leaves no pairs or results for the next call
+        # on the same pool
+        mock, url, stop = start_mock_server_thread(
+            bar_count=10, interval_latency={"1": 0.2}
+        )
+        pairs = [(f"MOCK:SYM{i}", "1") for i in range(8)]
+        pool, result_queue, pair_source = create_stream_pool(2)
+        kwargs = dict(
+            num_processes=2,
+            max_cs=1,
+            url=url,
+            pool=pool,
+            result_queue=result_queue,
+            pair_source=pair_source,
+        )
+        try:
+            for result in iter_parallel_multiple_bars(logger, "", pairs, **kwargs):
+                break
+            other_pairs = [(f"MOCK:SYM{i}", "1D") for i in range(4)]
+            results = list(
+                iter_parallel_multiple_bars(logger, "", other_pairs, **kwargs)
+            )
+        finally:
+            pool.terminate()
+            stop.set()
+
+        assert sorted(r[:2] for r in results) == sorted(other_pairs)
+        assert all(r[3]["status"] == "ok" for r in results)
+        # the pairs not taken by the first call were never requested
+        received = mock.stats["messages_received"]
+        assert received["create_series"] + received["modify_series"] < len(pairs) + 4
+
+    def test_connection_7(self):
+        # a caller stopping early leaves the connection kept alive in this
+        # process ready for the next call
+        mock, url, stop = start_mock_server_thread(
+            bar_count=10, interval_latency={"1": 0.5}
+        )
+        pairs = [(f"MOCK:SYM{i}", "1") for i in range(4)]
+        kwargs = dict(max_cs=2, url=url, keep_alive=True)
+        try:
+            for result in iter_parallel_multiple_bars(logger, "", pairs, **kwargs):
+                break
+            other_pairs = [(f"MOCK:SYM{i}", "1D") for i in range(4)]
+            results = list(
+                iter_parallel_multiple_bars(logger, "", other_pairs, **kwargs)
+            )
+            close_worker_connection()
+        finally:
+            stop.set()
+
+        assert sorted(r[:2] for r in results) == sorted(other_pairs)
+        assert all(r[3]["status"] == "ok" for r in results)
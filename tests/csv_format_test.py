@@ -0,0 +1,35 @@
+import numpy as np
+
+from packages.services.csv_format import format_bars, format_rows
+from packages.services.write import parse_csv_rows
+
+
+class TestClass:
+    def test_csv_format_1(self):
+        ts = np.array([60, 120, 180])
+        values = np.array([[1.5, 0.1, np.nan], [1.5, 1e-07, -0.0], [1.5, 0.1, 100.0]])
+        data = format_bars(ts, values)
+        assert data == b"60,1.5,0.1,nan\n120,1.5,1e-07,-0.0\n180,1.5,0.1,100.0\n"
+        rows = np.column_stack((ts.astype(np.float64), values))
+        assert format_rows(rows) == data
+        parsed = parse_csv_rows(data)
+        assert np.array_equal(parsed, rows, equal_nan=True)
+        assert np.array_equal(np.signbit(parsed), np.signbit(rows))
+        assert format_bars(ts[:0], values[:0]) == b""
+
+    def test_csv_format_2(self):
+        # distinct and repeated values are written the same, as repr
+        rng = np.random.default_rng(0)
+        ts = 1693550000 + 60 * np.arange(1000)
+        distinct = rng.random((1000, 5)) * 100
+        repeated = np.round(distinct) / 4
+        # signed zeros, among repeated values and among distinct ones
+        repeated[::7, 1] = -0.0
+        repeated[::5, 2] = 0.0
+        distinct[::9, 3] = -0.0
+        for values in [distinct, repeated]:
+            lines = format_bars(ts, values).decode().splitlines()
+            assert lines == [
+                ",".join([str(t)] + [repr(v) for v in row])
+                for t, row in zip(ts.tolist(), values.tolist())
+            ]
@@ -0,0 +1,237 @@
+import logging
+import os
+import time
+
+import pytest
+
+from packages.engines.tradingview_engine import ScraperEngine
+from packages.mocks.tradingview_server import start_mock_server_thread
+from packages.schedulers.resample_policy import ResamplePolicy
+from packages.scrapers import tradingview
+from packages.services.write import get_last_line_ts, get_symbol_pair_filepath
+
+
+def make_engine(tmp_path, url: str, **kwargs) -> ScraperEngine:
+    return ScraperEngine(
+        engine_name="test",
+        username=None,
+        password=None,
+        log_dir=str(tmp_path),
+        log_formatter=logging.Formatter("%(message)s"),
+        storage_dir=os.path.join(tmp_path, "storage"),
+        cache_dir=os.path.join(tmp_path, "cache"),
+        db_url="",
+        url=url,
+        **kwargs,
+    )
+
+
+class TestClass:
+    @pytest.mark.parametrize(
+        "num_process,stream", [(1, False), (1, True), (2, False), (2, True)]
+    )
+    def test_engine_1(self, tmp_path, num_process, stream):
+        mock, url, stop = start_mock_server_thread(bar_count=50)
+        engine = make_engine(tmp_path, url, num_process=num_process, stream=stream, max_cs=2)
+        pairs = [(f"MOCK:SYM{i}", interval) for i in range(4) for interval in ["1", "1D"]]
+        try:
+            for pair in pairs:
+                engine.symbol_pair_scheduler.ready(pair)
+            engine.getBars()
+        finally:
+            engine.close()
+            stop.set()
+
+        assert engine.pair_set == set(pairs)
+        assert engine.symbol_pair_scheduler.waitingSize() == len(pairs)
+        for symbol, interval in pairs:
+            filepath = get_symbol_pair_filepath(engine.storage_dir, symbol, interval)
+            assert get_last_line_ts(filepath) is not None
+
+    def test_engine_2(self, tmp_path):
+        # the second fetch only asks for the bars since the last stored one
+        mock, url, stop = start_mock_server_thread(bar_count=500)
+        engine = make_engine(tmp_path, url, max_cs=1)
+        pairs = [("MOCK:SYM0", "1"), ("MOCK:SYM1", "1")]
+        try:
+            details = []
+            for _ in range(2):
+                engine.symbol_pair_scheduler.extendReady(pairs)
+                max_bars_dict = engine._get_max_bars_dict(pairs)
+                details.append(max_bars_dict)
+                engine.getBars()
+        finally:
+            engine.close()
+            stop.set()
+
+        assert details[0] == {pair: 50000 for pair in pairs}
+        assert details[1] == {pair: 100 for pair in pairs}
+        # the session series is created again with the smaller max_bars once
+        assert mock.stats["messages_received"]["remove_series"] == 1
+        for symbol, interval in pairs:
+            filepath = get_symbol_pair_filepath(engine.storage_dir, symbol, interval)
+            with open(filepath) as f:
+                assert len(f.readlines()) == 501
+
+    def test_engine_3(self, tmp_path):
+        # streamed pairs are not polled
+        engine = make_engine(
+            tmp_path, "ws://127.0.0.1:1", realtime_pair_list=[("MOCK:SYM0", "1")]
+        )
+        engine._schedule_symbol_pair("MOCK:SYM0", "1")
+        engine._schedule_symbol_pair("MOCK:SYM0", "1D")
+        assert engine.symbol_pair_scheduler.get() == [("MOCK:SYM0", "1D")]
+
+    def test_engine_4(self, tmp_path):
+        # pairs known to be useless are not requested again, even by a new
+        # engine
+        mock, url, stop = start_mock_server_thread(
+            bar_count=10, error_rate=1.0, error_types=["unsupported_resolution"]
+        )
+        engine = make_engine(tmp_path, url, max_cs=2)
+        pairs = [("MOCK:SYM0", "1S"), ("MOCK:SYM1", "1S")]
+        try:
+            engine.symbol_pair_scheduler.extendReady(pairs)
+            engine.getBars()
+        finally:
+            engine.close()
+            stop.set()
+        assert engine.symbol_pair_scheduler.errorSize() == 0
+        assert engine.symbol_pair_scheduler.waitingSize() == 2
+
+        engine = make_engine(tmp_path, "ws://127.0.0.1:1")
+        for symbol, interval in pairs + [("MOCK:SYM0", "1D")]:
+            engine._schedule_symbol_pair(symbol, interval)
+        assert engine.symbol_pair_scheduler.get() == [("MOCK:SYM0", "1D")]
+        assert engine.symbol_pair_scheduler.waitingSize() == 2
+
+    def test_engine_5(self, tmp_path, monkeypatch):
+        # only the base intervals are fetched, the others are resampled
+        mock, url, stop = start_mock_server_thread(bar_count=600)
+        engine = make_engine(tmp_path, url, max_cs=2, resample_policy=ResamplePolicy())
+        monkeypatch.setattr(engine, "load_symbol_list", lambda: ["MOCK:SYM0"])
+        engine.symbol_data["MOCK:SYM0"] = {"type": "crypto"}
+        try:
+            engine.load_symbol_pair_list()
+            engine.getBars()
+        finally:
+            engine.close()
+            stop.set()
+
+        fetched = {interval for _, interval in engine.pair_set}
+        assert fetched == {"1", "1D", "1W", "1M"}
+        filepath = get_symbol_pair_filepath(engine.storage_dir, "MOCK:SYM0", "5")
+        with open(filepath) as f:
+            assert 119 <= len(f.readlines()) - 1 <= 120
+        for interval in ["15", "240", "3M", "12M"]:
+            filepath = get_symbol_pair_filepath(engine.storage_dir, "MOCK:SYM0", interval)
+            assert os.path.exists(filepath)
+
+    def test_engine_6(self, tmp_path):
+        # a pair is crawled again once its schedule period has passed since
+        # its last bar, 33 h for the minute intervals
+        engine = make_engine(tmp_path, "ws://127.0.0.1:1")
+        now = time.time()
+        last_ts_dict = {
+            ("MOCK:SYM0", "15"): now - 2 * 24 * 60 * 60,
+            ("MOCK:SYM1", "15"): now - 60 * 60,
+            ("MOCK:SYM0", "240"): now - 2 * 24 * 60 * 60,
+            ("MOCK:SYM0", "1D"): now - 8 * 24 * 60 * 60,
+            ("MOCK:SYM1", "1D"): now - 2 * 24 * 60 * 60,
+        }
+        for (symbol, interval), last_ts in last_ts_dict.items():
+            engine.manifest.update(symbol, interval, last_ts, 1, 100)
+            engine._schedule_symbol_pair(symbol, interval)
+        engine.close()
+        assert sorted(engine.symbol_pair_scheduler.get()) == [
+            ("MOCK:SYM0", "15"),
+            ("MOCK:SYM0", "1D"),
+            ("MOCK:SYM0", "240"),
+        ]
+        assert engine.symbol_pair_scheduler.waitingSize() == 2
+
+    def test_engine_7(self, tmp_path, monkeypatch):
+        # the intervals derived from a streamed pair are resampled as its
+        # updates are written
+        mock, url, stop = start_mock_server_thread(bar_count=600, update_interval=0.05)
+        engine = make_engine(
+            tmp_path,
+            url,
+            resample_policy=ResamplePolicy(),
+            realtime_pair_list=[("MOCK:SYM0", "1")],
+        )
+        monkeypatch.setattr(engine, "load_symbol_list", lambda: ["MOCK:SYM0"])
+        engine.symbol_data["MOCK:SYM0"] = {"type": "crypto"}
+        try:
+            engine.load_symbol_pair_list()
+            engine.start_realtime()
+            time.sleep(1)
+        finally:
+            engine.close()
+            stop.set()
+
+        base_ts = get_last_line_ts(
+            get_symbol_pair_filepath(engine.storage_dir, "MOCK:SYM0", "1")
+        )
+        filepath = get_symbol_pair_filepath(engine.storage_dir, "MOCK:SYM0", "5")
+        assert get_last_line_ts(filepath) == base_ts // 300 * 300
+
+    def test_engine_8(self, tmp_path):
+        # the accounts and the worker pool fetch with the timeout of the engine
+        engine = make_engine(
+            tmp_path,
+            "ws://127.0.0.1:1",
+            timeout=7,
+            account_list=[("a", None)],
+        )
+        try:
+            assert engine.account_coordinator.timeout == 7
+        finally:
+            engine.close()
+        engine = make_engine(tmp_path, "ws://127.0.0.1:1", timeout=7, num_process=2)
+        try:
+            assert engine._get_worker_pool().timeout == 7
+        finally:
+            engine.close()
+
+    def test_engine_9(self, tmp_path):
+        # the chart sessions in flight stay at max_cs unless asked otherwise
+        mock, url, stop = start_mock_server_thread(bar_count=10)
+        engine = make_engine(tmp_path, url, max_cs=4)
+        pairs = [(f"MOCK:SYM{i}", "1D") for i in range(8)]
+        try:
+            for pair in pairs:
+                engine.symbol_pair_scheduler.ready(pair)
+            engine.getBars()
+            _, connection = tradingview.get_worker_connection(engine.logger, url)
+            assert connection.controller is None
+        finally:
+            engine.close()
+            stop.set()
+        assert engine.pair_set == set(pairs)
+
+    def test_engine_10(self, tmp_path):
+        # the accounts return all the results at once, stream and the worker
+        # processes can not be used with them
+        for kwargs in [{"stream": True}, {"num_process": 2}]:
+            with pytest.raises(ValueError):
+                make_engine(
+                    tmp_path, "ws://127.0.0.1:1", account_list=[("a", None)], **kwargs
+                )
+
+    def test_engine_11(self, tmp_path, monkeypatch):
+        # a streamed pair is written by its updates only, not resampled too
+        engine = make_engine(
+            tmp_path,
+            "ws://127.0.0.1:1",
+            resample_policy=ResamplePolicy(),
+            realtime_pair_list=[("MOCK:SYM0", "1"), ("MOCK:SYM0", "5")],
+        )
+        monkeypatch.setattr(engine, "load_symbol_list", lambda: ["MOCK:SYM0"])
+        engine.symbol_data["MOCK:SYM0"] = {"type": "crypto"}
+        try:
+            engine.load_symbol_pair_list()
+        finally:
+            engine.close()
+        resampled = engine.resample_interval_dict[("MOCK:SYM0", "1")]
+        assert "15" in resampled and "5" not in resampled
@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+from packages.services.frame_decoder import FrameDecoder
+from packages.services.websockets import create_message, prepend_header
+from packages.types.frame import FrameType
+
+
+class TestClass:
+    def test_frame_decoder_1(self):
+        decoder = FrameDecoder()
+        frames = decoder.feed(prepend_header("~h~12"))
+
+        assert len(frames) == 1
+        assert frames[0].frame_type == FrameType.HEARTBEAT
+        assert frames[0].encode() == "~m~5~m~~h~12"
+
+    def test_frame_decoder_2(self):
+        decoder = FrameDecoder()
+        message = create_message("series_completed", ["cs_a", "sds_1"])
+        message += create_message(
+            "symbol_resolved", ["cs_a", "sds_sym_1", {"name": "~m~5~m~"}]
+        )
+        frames = decoder.feed(message)
+
+        assert [frame.m for frame in frames] == ["series_completed", "symbol_resolved"]
+        assert all(frame.frame_type == FrameType.MESSAGE for frame in frames)
+        assert frames[1].data["p"][2]["name"] == "~m~5~m~"
+        assert decoder.buffer == ""
+
+    def test_frame_decoder_3(self):
+        decoder = FrameDecoder()
+        message = create_message("timescale_update", ["cs_a", {"sds_1": {"s": []}}])
+
+        for split in [1, 3, 5, len(message) - 1]:
+            assert decoder.feed(message[:split]) == []
+            frames = decoder.feed(message[split:])
+            assert len(frames) == 1
+            assert frames[0].data["p"][1] == {"sds_1": {"s": []}}
+
+    def test_frame_decoder_4(self):
+        decoder = FrameDecoder()
+        frames = decoder.feed(prepend_header('{"session_id":"x"}').encode("utf-8"))
+
+        assert frames[0].frame_type == FrameType.OTHER
+        assert frames[0].m is None
+        assert frames[0].data == {"session_id": "x"}
+
+    def test_frame_decoder_5(self):
+        # invalid data is skipped up to the next header, the frames around it
+        # and a partial frame buffered before it are kept
+        decoder = FrameDecoder()
+        heartbeat = prepend_header("~h~1")
+        frames = decoder.feed(heartbeat + "garbage" + heartbeat[:6])
+        assert len(frames) == 1 and len(decoder.errors) == 1
+        frames = decoder.feed(heartbeat[6:] + "~m~1a~m~xx" + heartbeat)
+        assert [frame.payload for frame in frames] == ["~h~1", "~h~1"]
+        assert len(decoder.errors) == 1
+        assert decoder.buffer == ""
+
+        # the data following a frame shorter than its payload is skipped
+        frames = decoder.feed("~m~3~m~~h~12" + heartbeat)
+        assert [frame.payload for frame in frames] == ["~h~", "~h~1"]
+        assert len(decoder.errors) == 1
+        assert decoder.feed("garbage") == [] and decoder.buffer == ""
+
+    def test_frame_decoder_6(self):
+        # payload lengths counted in UTF-16 code units or UTF-8 bytes
+        decoder = FrameDecoder()
+        payload = json.dumps(
+            {"m": "quote_completed", "p": ["qs_a", "caf\u00e9 \U0001F680"]},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        for length in [
+            len(payload.encode("utf-16-le")) // 2,
+            len(payload.encode("utf-8")),
+            len(payload),
+        ]:
+            data = f"~m~{length}~m~{payload}" + prepend_header("~h~1")
+            for split in [len(data), len(data) - 5]:
+                frames = decoder.feed(data[:split]) + decoder.feed(data[split:])
+                assert [frame.m for frame in frames] == ["quote_completed", None]
+                assert frames[0].data["p"][1] == "caf\u00e9 \U0001F680"
+                assert decoder.errors == [] and decoder.buffer == ""
@@ -0,0 +1,43 @@
+from packages.utils.intervals import (
+    get_max_bars,
+    get_schedule_period,
+    interval_to_second,
+)
+
+
+class TestClass:
+    def test_get_max_bars_1(self):
+        # nothing stored, fetch everything
+        assert get_max_bars("1", None, 1_000_000) == 50000
+
+    def test_get_max_bars_2(self):
+        now = 1_000_000
+        # 5 new bars plus the overlap, rounded up to a bucket
+        assert get_max_bars("1", now - 5 * 60, now) == 100
+        assert get_max_bars("1", now - 200 * 60, now) == 300
+        assert get_max_bars("1D", now - 2000 * 86400, now) == 3000
+        assert get_max_bars("1S", now - 40000, now, max_bars=20000) == 20000
+        assert get_max_bars("1", now - 100000 * 60, now) == 50000
+
+    def test_get_max_bars_3(self):
+        now = 1_000_000
+        # overlap_bars are always fetched again
+        assert get_max_bars("1", now, now, overlap_bars=150) == 300
+        assert get_max_bars("1", now + 60, now, overlap_bars=0) == 100
+
+    def test_interval_to_second_1(self):
+        assert interval_to_second("1") == 60
+        assert interval_to_second("15") == 900
+        assert interval_to_second("240") == 14400
+        assert interval_to_second("30S") == 30
+        assert interval_to_second("1D") == 86400
+        assert interval_to_second("1W") == 604800
+
+    def test_get_schedule_period_1(self):
+        # the time of 2000 bars, at most 33 h intraday and 7 days above
+        assert get_schedule_period("1S") == 2000
+        assert get_schedule_period("1") == 120000
+        assert get_schedule_period("15") == 120000
+        assert get_schedule_period("240") == 120000
+        assert get_schedule_period("1D") == 604800
+        assert get_schedule_period("1M") == 604800
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+
+from packages.mocks.tradingview_server import start_mock_server_thread
+from packages.scrapers.tradingview import BarsBatch
+from packages.scrapers.worker_pool import ScraperWorkerPool
+from packages.services.connection import TradingViewConnection
+from packages.services.metrics import Histogram, ScraperMetrics, get_metrics
+
+logger = logging.getLogger("test")
+
+
+def make_pairs(num_symbols: int) -> list[tuple[str, str]]:
+    return [(f"MOCK:SYM{i}", interval) for i in range(num_symbols) for interval in ["1", "1D"]]
+
+
+class TestClass:
+    def test_metrics_1(self):
+        a = ScraperMetrics()
+        b = ScraperMetrics()
+        for value in [0.001, 0.002, 0.003]:
+            a.record_latency("ok", value)
+        b.record_latency("ok", 0.5)
+        b.record_latency("error", 20.0)
+        b.record_message("du", 100)
+        b.record_message("not_a_type", 10)
+        a.merge(b)
+
+        latency = a.latency["ok"]
+        assert latency.count == 4
+        assert abs(latency.sum - 0.506) < 1e-9
+        assert latency.quantile(0.5) == 0.00316
+        assert latency.quantile(1.0) == 0.562
+        assert a.latency["error"].counts[-1] == 0  # 20 sec is not past 100
+        assert a.message_cnt == {"du": 1, "other": 1}
+
+        text = a.to_prometheus()
+        assert 'tv_scraper_messages_total{m="du"} 1' in text
+        assert 'tv_scraper_pair_latency_seconds_bucket{status="ok",le="+Inf"} 4' in text
+        assert 'tv_scraper_pair_latency_seconds_count{status="ok"} 4' in text
+
+        try:
+            Histogram((1.0,)).merge(Histogram((2.0,)))
+        except ValueError:
+            pass
+        else:
+            assert False, "merged histograms with different buckets"
+
+    def test_metrics_2(self):
+        mock, url, stop = start_mock_server_thread(bar_count=10)
+        metrics = ScraperMetrics()
+
+        async def run():
+            connection = TradingViewConnection(logger, url)
+            batch = BarsBatch(
+                logger, connection, "", make_pairs(3), max_cs=2, metrics=metrics
+            )
+            try:
+                return await batch.run()
+            finally:
+                await connection.close()
+
+        try:
+            results = asyncio.run(run())
+        finally:
+            stop.set()
+
+        assert len(results) == 6
+        assert metrics.message_cnt["timescale_update"] == 6
+        assert metrics.message_cnt["series_completed"] == 6
+        assert metrics.parse_time["timescale_update"].count == 6
+        assert metrics.latency["ok"].count == 6
+        assert metrics.recv_bytes >= sum(metrics.message_bytes.values())
+        assert metrics.decode_time.count == metrics.recv_cnt > 0
+
+    def test_metrics_3(self):
+        # the metrics of the workers add up in the process owning the pool
+        mock, url, stop = start_mock_server_thread(bar_count=10)
+        pairs = make_pairs(4)
+        get_metrics().take()
+        pool = ScraperWorkerPool(logger, num_processes=2, url=url, max_cs=2)
+        try:
+            results = list(pool.iter_bars("", pairs))
+        finally:
+            pool.close()
+            stop.set()
+
+        metrics = get_metrics().take()
+        assert len(results) == len(pairs)
+        assert metrics.message_cnt["timescale_update"] == len(pairs)
+        assert metrics.latency["ok"].count == len(pairs)
+        assert all("metrics" not in stats for stats in pool.worker_stats)
@@ -0,0 +1,37 @@
+import logging
+
+from packages.mocks.tradingview_server import start_mock_server_thread
+from packages.scrapers.tradingview import sync_get_multiple_bars
+
+
+class TestClass:
+    def test_mock_server_1(self):
+        mock, url, stop = start_mock_server_thread(bar_count=100)
+        pairs = [(f"MOCK:SYM{i}", interval) for i in range(5) for interval in ["1", "1D"]]
+        try:
+            results = sync_get_multiple_bars(
+                logging.getLogger("test"), "", pairs, max_cs=3, url=url
+            )
+        finally:
+            stop.set()
+
+        assert sorted((r[0], r[1]) for r in results) == sorted(pairs)
+        for _, _, bars, detail in results:
+            assert detail["status"] == "ok"
+            assert detail["latency"] > 0
+            assert len(bars) == 100
+        # each symbol is resolved once per chart session it is fetched on
+        assert 5 <= mock.stats["messages_received"]["resolve_symbol"] < len(pairs)
+
+    def test_mock_server_2(self):
+        mock, url, stop = start_mock_server_thread(bar_count=10, error_rate=1.0)
+        pairs = [("MOCK:SYM0", "1"), ("MOCK:SYM1", "1")]
+        try:
+            results = sync_get_multiple_bars(
+                logging.getLogger("test"), "", pairs, max_cs=1, url=url
+            )
+        finally:
+            stop.set()
+
+        assert len(results) == 2
+        assert all(r[2] is None and r[3]["status"] == "error" for r in results)
@@ -0,0 +1,120 @@
+import os
+
+import numpy as np
+import pytest
+
+from packages.services.bars import Bars
+from packages.services.partitions import read_index, split_by_partition
+from packages.services.read import read_bars
+from packages.services.resample import resample_file
+from packages.services.storage_manifest import StorageManifest
+from packages.services.write import (
+    get_file_summary,
+    get_last_line_ts,
+    get_symbol_pair_filepath,
+    scan_storage,
+    update_last_bars,
+    write_to_file,
+)
+
+DAY = 24 * 60 * 60
+
+
+def make_bars(start_ts: int, num: int, close: float = 1.25) -> Bars:
+    ts = start_ts + np.arange(num, dtype=np.int64)
+    values = np.tile([1.5, 2.0, 1.0, close, 100.0], (num, 1))
+    return Bars(ts, values)
+
+
+class TestClass:
+    def test_partitions_1(self):
+        ts = np.array([DAY - 1, DAY, DAY + 1, 3 * DAY])
+        assert split_by_partition("1S", ts) == [
+            ("1970-01-01", slice(0, 1)),
+            ("1970-01-02", slice(1, 3)),
+            ("1970-01-04", slice(3, 4)),
+        ]
+        assert split_by_partition("30S", ts) == [("1970-01", slice(0, 4))]
+
+    @pytest.mark.parametrize("storage_format", ["csv", "binary"])
+    def test_partitions_2(self, tmp_path, monkeypatch, storage_format):
+        monkeypatch.setenv("TV_STORAGE_FORMAT", storage_format)
+        storage_dir = str(tmp_path / "storage")
+        manifest = StorageManifest(str(tmp_path / "cache"), storage_format)
+        series_dir = get_symbol_pair_filepath(storage_dir, "MOCK:SYM", "1S")
+        res = write_to_file(
+            storage_dir, "MOCK:SYM", "1S", make_bars(DAY - 100, 200), manifest
+        )
+        assert res["status"] == "ok"
+        extension = ".csv" if storage_format == "csv" else ".bin"
+        assert sorted(os.listdir(series_dir)) == [
+            "1970-01-01" + extension,
+            "1970-01-02" + extension,
+            "index.json",
+            "index.lock",
+        ]
+        # the partition of the first day is sealed
+        assert read_index(series_dir)["1970-01-01"][:2] == [DAY - 1, 100]
+        sealed_filepath = os.path.join(series_dir, "1970-01-01" + extension)
+        sealed_mtime = os.path.getmtime(sealed_filepath)
+
+        # the overlapped bars of the sealed partition are only verified
+        res = write_to_file(
+            storage_dir, "MOCK:SYM", "1S", make_bars(DAY - 10, 110), manifest
+        )
+        assert res["status"] == "ok"
+        res = write_to_file(
+            storage_dir, "MOCK:SYM", "1S", make_bars(DAY - 5, 105, 1.75), manifest
+        )
+        assert res["status"] == "warning"
+        assert os.path.getmtime(sealed_filepath) == sealed_mtime
+        diff_filepath = get_symbol_pair_filepath(
+            storage_dir, "MOCK:SYM", "1S", ".diff.csv"
+        )
+        with open(diff_filepath) as f:
+            # the stored bars that differ, of both partitions
+            assert len(f.readlines()) == 105
+
+        assert get_last_line_ts(series_dir) == DAY + 99
+        bars = read_bars(storage_dir, "MOCK:SYM", "1S", DAY - 2, DAY + 1)
+        assert bars["timestamp"].tolist() == [DAY - 2, DAY - 1, DAY, DAY + 1]
+        assert bars["close"].tolist() == [1.25, 1.25, 1.75, 1.75]
+        assert len(read_bars(storage_dir, "MOCK:SYM", "1S")["timestamp"]) == 200
+
+        summary = get_file_summary(series_dir)
+        assert summary[:2] == [DAY + 99, 200]
+        assert manifest.get("MOCK:SYM", "1S")[:3] == summary[:3]
+        assert scan_storage(storage_dir)["MOCK:SYM"]["1S"][:3] == summary[:3]
+
+        # real-time updates roll over to the next partition
+        res = update_last_bars(
+            storage_dir, "MOCK:SYM", "1S", make_bars(2 * DAY - 1, 3), manifest
+        )
+        assert (res["replaced"], res["appended"]) == (0, 3)
+        assert get_last_line_ts(series_dir) == 2 * DAY + 1
+        assert "1970-01-02" in read_index(series_dir)
+        assert manifest.get("MOCK:SYM", "1S")[1] == 203
+
+        res = resample_file(storage_dir, "MOCK:SYM", "1S", "5S")
+        bars = read_bars(storage_dir, "MOCK:SYM", "5S")
+        expected = [DAY - 100 + 5 * i for i in range(40)] + [2 * DAY - 5, 2 * DAY]
+        assert bars["timestamp"].tolist() == expected
+
+    def test_partitions_3(self, tmp_path):
+        # a file written before the interval was partitioned is moved to the
+        # partitions by the next write
+        storage_dir = str(tmp_path)
+        write_to_file(storage_dir, "MOCK:SYM", "1", make_bars(DAY - 100, 200))
+        flat_filepath = get_symbol_pair_filepath(storage_dir, "MOCK:SYM", "1S", ".csv")
+        os.rename(
+            get_symbol_pair_filepath(storage_dir, "MOCK:SYM", "1"), flat_filepath
+        )
+        assert scan_storage(storage_dir) == {}
+
+        res = write_to_file(storage_dir, "MOCK:SYM", "1S", make_bars(DAY + 90, 20))
+        assert res["status"] == "ok"
+        assert not os.path.exists(flat_filepath)
+        bars = read_bars(storage_dir, "MOCK:SYM", "1S")
+        assert bars["timestamp"].tolist() == list(range(DAY - 100, DAY + 110))
+        series_dir = get_symbol_pair_filepath(storage_dir, "MOCK:SYM", "1S")
+        assert list(read_index(series_dir)) == ["1970-01-01"]
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import math
+import os
+import time
+
+from packages.mocks.tradingview_server import start_mock_server_thread
+from packages.scrapers.quotes import QuoteStreamer, get_quotes
+from packages.services.quote_table import QuoteTable
+
+logger = logging.getLogger("test")
+
+
+class TestClass:
+    def test_quotes_1(self):
+        table = QuoteTable()
+        assert table.add_symbols(["MOCK:SYM0", "MOCK:SYM1"]) == ["MOCK:SYM0", "MOCK:SYM1"]
+        assert table.add_symbols(["MOCK:SYM1", "MOCK:SYM2"]) == ["MOCK:SYM2"]
+        assert len(table) == 3
+
+        table.update("MOCK:SYM0", "ok", {"lp": 1.5, "volume": 10, "lp_time": 100}, 1.0)
+        # a qsd only carries the fields that changed
+        idx = table.update("MOCK:SYM0", "ok", {"lp": 1.25, "ch": "x"}, 2.0)
+        assert table.get("MOCK:SYM0") == {
+            "lp": 1.25,
+            "volume": 10.0,
+            "lp_time": 100.0,
+            "update_ts": 2.0,
+        }
+        assert table.row_csv(idx) == "2.0,MOCK:SYM0,1.25,10.0,100.0\n"
+        table.update("MOCK:SYM1", "ok", {"lp": 3.0}, 1.0)
+        assert table.row_csv(1) == "1.0,MOCK:SYM1,3.0,,\n"
+
+        table.update("MOCK:SYM2", "error", {}, 1.0)
+        assert table.get("MOCK:SYM2") is None
+        assert table.update("MOCK:SYM3", "ok", {"lp": 1.0}, 1.0) is None
+
+    def test_quotes_2(self, tmp_path):
+        # many symbols on a few quote sessions of one connection
+        mock, url, stop = start_mock_server_thread(symbol_error_rate=0.1)
+        symbol_list = [f"MOCK:SYM{i}" for i in range(250)]
+        filepath = os.path.join(tmp_path, "quotes.csv")
+        streamer = QuoteStreamer(
+            logger, "", symbol_list, filepath=filepath, url=url, max_symbols=100
+        )
+        try:
+            table = asyncio.run(streamer.snapshot())
+        finally:
+            stop.set()
+
+        quotes = [table.get(symbol) for symbol in symbol_list]
+        ok_cnt = sum(quote is not None for quote in quotes)
+        assert 200 < ok_cnt < 250
+        assert all(not math.isnan(quote["lp"]) for quote in quotes if quote is not None)
+        with open(filepath) as f:
+            assert len(f.readlines()) == ok_cnt
+        assert mock.stats["connections"] == 1
+        assert mock.stats["messages_received"]["quote_create_session"] == 3
+        assert mock.stats["messages_received"]["quote_add_symbols"] == 3
+        assert mock.stats["messages_received"].get("chart_create_session", 0) == 0
+
+    def test_quotes_3(self, tmp_path):
+        # updates are streamed, symbols can be added while running
+        mock, url, stop = start_mock_server_thread(update_interval=0.05)
+        filepath = os.path.join(tmp_path, "quotes.csv")
+        streamer = QuoteStreamer(logger, "", ["MOCK:SYM0"], filepath=filepath, url=url)
+        try:
+            streamer.start()
+            time.sleep(0.5)
+            streamer.add_symbols(["MOCK:SYM1"])
+            time.sleep(1.5)
+        finally:
+            streamer.stop()
+            stop.set()
+
+        assert streamer.update_cnt > 10
+        assert streamer.table.get("MOCK:SYM1") is not None
+        with open(filepath) as f:
+            lines = f.readlines()
+        assert len(lines) == streamer.update_cnt
+        assert any(line.split(",")[1] == "MOCK:SYM1" for line in lines)
+
+    def test_quotes_4(self):
+        mock, url, stop = start_mock_server_thread()
+        try:
+            table = get_quotes(logger, "", ["MOCK:SYM0", "MOCK:SYM1"], url=url)
+        finally:
+            stop.set()
+        assert table.get("MOCK:SYM1")["lp"] > 0
@@ -0,0 +1,63 @@
+import mmap
+
+import numpy as np
+import pytest
+
+from packages.services.bars import Bars
+from packages.services.read import read_bars
+from packages.services.write import write_empty_file, write_to_file
+
+
+def make_bars(start_ts: int, num: int) -> Bars:
+    ts = start_ts + 60 * np.arange(num, dtype=np.int64)
+    values = np.column_stack(
+        [np.arange(num) + offset for offset in [0.5, 1.0, 0.0, 0.75, 100.0]]
+    )
+    return Bars(ts, values)
+
+
+def is_mapped(array: np.ndarray) -> bool:
+    base = array.base
+    while isinstance(base, np.ndarray):
+        base = base.base
+    return isinstance(base, memoryview) and isinstance(base.obj, mmap.mmap)
+
+
+class TestClass:
+    @pytest.mark.parametrize("storage_format", ["csv", "binary"])
+    def test_read_1(self, tmp_path, monkeypatch, storage_format):
+        monkeypatch.setenv("TV_STORAGE_FORMAT", storage_format)
+        storage_dir = str(tmp_path)
+        write_to_file(storage_dir, "MOCK:SYM", "1", make_bars(60, 1000))
+
+        bars = read_bars(storage_dir, "MOCK:SYM", "1", 6000, 6300)
+        assert list(bars) == ["timestamp", "open", "high", "low", "close", "volume"]
+        assert bars["timestamp"].dtype == np.int64
+        assert bars["timestamp"].tolist() == [6000, 6060, 6120, 6180, 6240, 6300]
+        assert bars["close"].tolist() == [99.75 + i for i in range(6)]
+        # bounds between bars, open ranges
+        bars = read_bars(storage_dir, "MOCK:SYM", "1", 5990, 6010, ["close"])
+        assert list(bars) == ["close"] and bars["close"].tolist() == [99.75]
+        assert len(read_bars(storage_dir, "MOCK:SYM", "1", 59000)["volume"]) == 17
+        assert len(read_bars(storage_dir, "MOCK:SYM", "1", end_ts=600)["open"]) == 10
+        assert len(read_bars(storage_dir, "MOCK:SYM", "1")["timestamp"]) == 1000
+        assert len(read_bars(storage_dir, "MOCK:SYM", "1", 70000)["close"]) == 0
+
+        assert not any(is_mapped(array) for array in bars.values())
+        views = read_bars(storage_dir, "MOCK:SYM", "1", 6000, 6300, copy=False)
+        assert all(
+            is_mapped(array) == (storage_format == "binary") for array in views.values()
+        )
+
+    def test_read_2(self, tmp_path):
+        storage_dir = str(tmp_path)
+        write_empty_file(storage_dir, "MOCK:EMPTY", "1D")
+        bars = read_bars(storage_dir, "MOCK:EMPTY", "1D", columns=["close"])
+        assert len(bars["close"]) == 0
+
+        ts = np.array([60, 120])
+        write_to_file(storage_dir, "MOCK:SYM", "1", Bars(ts, np.ones((2, 4))))
+        with pytest.raises(ValueError):
+            read_bars(storage_dir, "MOCK:SYM", "1", columns=["volume"])
+        with pytest.raises(FileNotFoundError):
+            read_bars(storage_dir, "MOCK:SYM", "1W")
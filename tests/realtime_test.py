@@ -0,0 +1,73 @@
+import logging
+import os
+import time
+
+from packages.mocks.tradingview_server import start_mock_server_thread
+from packages.scrapers.realtime import SeriesStreamer
+from packages.services.bars import Bars
+from packages.services.read import read_bars
+from packages.services.write import (
+    get_symbol_pair_filepath,
+    update_last_bars,
+    write_to_file,
+)
+
+logger = logging.getLogger("test")
+
+
+def make_bars(ts_list: list[int], close: float) -> Bars:
+    return Bars.from_series(
+        [{"v": [float(ts), 1.0, 2.0, 0.5, close, 10.0]} for ts in ts_list]
+    )
+
+
+def read_rows(filepath: str) -> list[list[float]]:
+    with open(filepath) as f:
+        return [[float(x) for x in line.split(",")] for line in f.readlines()[1:]]
+
+
+class TestClass:
+    def test_realtime_1(self, tmp_path):
+        storage_dir = str(tmp_path)
+        write_to_file(storage_dir, "MOCK:SYM", "1", make_bars([60, 120, 180], 1.0))
+
+        # the last bar is replaced, newer ones are appended, older ignored
+        res = update_last_bars(storage_dir, "MOCK:SYM", "1", make_bars([120, 180, 240], 1.5))
+        assert (res["replaced"], res["appended"]) == (1, 1)
+        filepath = get_symbol_pair_filepath(storage_dir, "MOCK:SYM", "1")
+        rows = read_rows(filepath)
+        assert [row[0] for row in rows] == [60, 120, 180, 240]
+        assert [row[4] for row in rows] == [1.0, 1.0, 1.5, 1.5]
+        assert not os.path.exists(
+            get_symbol_pair_filepath(storage_dir, "MOCK:SYM", "1", ".diff.csv")
+        )
+
+    def test_realtime_2(self, tmp_path):
+        mock, url, stop = start_mock_server_thread(bar_count=20, update_interval=0.05)
+        pairs = [("MOCK:SYM0", "1S"), ("MOCK:SYM1", "1")]
+        written = set()
+        streamer = SeriesStreamer(
+            logger,
+            str(tmp_path),
+            "",
+            pairs,
+            url=url,
+            on_written=lambda symbol, interval, res: written.add((symbol, interval)),
+        )
+        try:
+            streamer.start()
+            time.sleep(1.5)
+        finally:
+            streamer.stop()
+            stop.set()
+
+        assert mock.stats["connections"] == 1
+        assert streamer.update_cnt > 10
+        assert written == set(pairs)
+        for symbol, interval in pairs:
+            ts_list = read_bars(str(tmp_path), symbol, interval)["timestamp"].tolist()
+            # one row per timestamp, in order, up to the current bar
+            assert ts_list == sorted(set(ts_list))
+            assert ts_list[-1] >= time.time() // 60 * 60 - 60
+        # the 1S series got new bars while streaming, in its partition of today
+        assert len(read_bars(str(tmp_path), *pairs[0])["timestamp"]) > 20
@@ -0,0 +1,88 @@
+import numpy as np
+
+from packages.schedulers.resample_policy import ResamplePolicy
+from packages.services.bars import Bars
+from packages.services.resample import (
+    get_bucket_ts,
+    is_derivable,
+    read_bars_since,
+    resample_bars,
+    resample_file,
+)
+from packages.services.write import get_symbol_pair_filepath, write_to_file
+
+DAY = 1693526400  # 2023-09-01 00:00:00 UTC
+
+
+def make_bars(start_ts: int, num: int, step: int = 60) -> Bars:
+    ts = start_ts + step * np.arange(num, dtype=np.int64)
+    close = np.arange(num, dtype=np.float64) + 1
+    values = np.column_stack((close - 0.5, close + 1, close - 1, close, np.ones(num)))
+    return Bars(ts, values)
+
+
+class TestClass:
+    def test_resample_1(self):
+        assert is_derivable("1", "15")
+        assert is_derivable("1", "240")
+        assert is_derivable("5S", "1")
+        assert is_derivable("1M", "3M")
+        assert not is_derivable("3", "5")
+        assert not is_derivable("1", "1")
+        assert not is_derivable("1", "1D")
+        assert not is_derivable("1D", "1W")
+        assert not is_derivable("3M", "1M")
+        assert not is_derivable("1D", "1M")
+
+    def test_resample_2(self):
+        # buckets are aligned to the day, and to the year for months
+        ts = np.array([DAY + 59, DAY + 15 * 60, DAY + 29 * 60], dtype=np.int64)
+        assert get_bucket_ts(ts, "15").tolist() == [DAY, DAY + 900, DAY + 900]
+        ts = np.array([DAY, DAY + 31 * 86400], dtype=np.int64)  # Sep 1, Oct 2
+        assert get_bucket_ts(ts, "3M").tolist() == [1688169600, 1696118400]
+        assert get_bucket_ts(ts, "12M").tolist() == [1672531200, 1672531200]
+
+    def test_resample_3(self):
+        bars = make_bars(DAY, 7)
+        resampled = resample_bars(bars, "3")
+        assert resampled.ts.tolist() == [DAY, DAY + 180, DAY + 360]
+        assert resampled.values.tolist() == [
+            [0.5, 4.0, 0.0, 3.0, 3.0],
+            [3.5, 7.0, 3.0, 6.0, 3.0],
+            [6.5, 8.0, 6.0, 7.0, 1.0],
+        ]
+        # missing bars are skipped, not filled
+        resampled = resample_bars(bars[np.array([0, 1, 5, 6])], "3")
+        assert resampled.ts.tolist() == [DAY, DAY + 180, DAY + 360]
+        assert resampled.values[1].tolist() == [5.5, 7.0, 5.0, 6.0, 1.0]
+
+    def test_resample_4(self, tmp_path):
+        storage_dir = str(tmp_path)
+        symbol = "MOCK:SYM0"
+        # the base bars start in the middle of a bucket
+        write_to_file(storage_dir, symbol, "1", make_bars(DAY + 60, 9))
+        res = resample_file(storage_dir, symbol, "1", "5")
+        assert res["appended"] == 1
+        stored = read_bars_since(get_symbol_pair_filepath(storage_dir, symbol, "5"), None)
+        assert stored.ts.tolist() == [DAY + 300]
+        assert stored.values[0].tolist() == [4.5, 10.0, 4.0, 9.0, 5.0]
+
+        # the last bucket gets completed, the next one is appended
+        write_to_file(storage_dir, symbol, "1", make_bars(DAY + 600, 3))
+        res = resample_file(storage_dir, symbol, "1", "5")
+        assert res["replaced"] == 1 and res["appended"] == 1
+        stored = read_bars_since(get_symbol_pair_filepath(storage_dir, symbol, "5"), None)
+        assert stored.ts.tolist() == [DAY + 300, DAY + 600]
+        assert stored.values[0].tolist() == [4.5, 10.0, 4.0, 9.0, 5.0]
+        assert stored.values[1].tolist() == [0.5, 4.0, 0.0, 3.0, 3.0]
+
+    def test_resample_5(self):
+        policy = ResamplePolicy(base_interval_list=["1", "5", "1D"])
+        interval_list = ["1", "5", "15", "60", "1D", "1W"]
+        assert policy.get_base_interval("crypto", "15", interval_list) == "5"
+        assert policy.get_base_interval("crypto", "60", interval_list) == "5"
+        assert policy.get_base_interval("crypto", "1", interval_list) is None
+        assert policy.get_base_interval("crypto", "1W", interval_list) is None
+        assert policy.get_base_interval("stock", "15", interval_list) is None
+        # the base interval is not scheduled for the symbol
+        assert policy.get_base_interval("crypto", "15", ["15"]) is None
@@ -0,0 +1,31 @@
+import queue
+import multiprocessing as mp
+
+from packages.schedulers.shared_pair_source import SharedPairSource
+
+
+class TestClass:
+    def test_shared_pair_source_1(self):
+        task_queue = queue.Queue()
+        remaining = mp.Value("i", 0)
+        first = SharedPairSource(task_queue, remaining, batch_id=1)
+        assert first.put([("A", "1"), ("B", "1"), ("A", "5")]) == 2
+        assert first() == ("A", "1")
+
+        # a source still running for the first batch hands back the pairs of
+        # the second
+        second = SharedPairSource(task_queue, remaining, batch_id=2)
+        second.put([("C", "1")])
+        assert first() == ("A", "5")
+        assert first() == ("B", "1")
+        assert first() is None
+        assert second() == ("C", "1")
+        assert second() is None
+
+        # the pairs left by an earlier batch are dropped
+        SharedPairSource(task_queue, remaining, batch_id=2).put([("D", "1")])
+        third = SharedPairSource(task_queue, remaining, batch_id=3)
+        third.put([("E", "1"), ("F", "1")])
+        assert third() == ("E", "1")
+        assert third.drain() == 1
+        assert remaining.value == 0 and task_queue.empty()
@@ -0,0 +1,140 @@
+import logging
+import os
+import time
+
+import numpy as np
+
+from packages.engines.tradingview_engine import ScraperEngine
+from packages.services.bars import Bars
+from packages.services.storage_manifest import (
+    BAR_CNT,
+    FILE_SIZE,
+    LAST_TS,
+    OUTCOME,
+    StorageManifest,
+)
+from packages.services.write import (
+    get_file_summary,
+    get_symbol_pair_filepath,
+    scan_storage,
+    update_last_bars,
+    write_empty_file,
+    write_to_file,
+)
+
+
+def make_bars(start_ts: int, num: int) -> Bars:
+    ts = start_ts + 60 * np.arange(num, dtype=np.int64)
+    values = np.tile([1.5, 2.0, 1.0, 1.25, 100.0], (num, 1))
+    return Bars(ts, values)
+
+
+class TestClass:
+    def test_storage_manifest_1(self, tmp_path):
+        # the entries follow the writes and match a scan of the files
+        storage_dir = os.path.join(tmp_path, "storage")
+        cache_dir = os.path.join(tmp_path, "cache")
+        manifest = StorageManifest(cache_dir, "csv")
+        write_to_file(storage_dir, "MOCK:SYM", "1", make_bars(60, 6), manifest=manifest)
+        write_to_file(storage_dir, "MOCK:SYM", "1", make_bars(240, 7), manifest=manifest)
+        update_last_bars(storage_dir, "MOCK:SYM", "1", make_bars(600, 2), manifest=manifest)
+        write_empty_file(storage_dir, "MOCK:EMPTY", "1D", manifest=manifest)
+        manifest.set_outcome("MOCK:SYM", "1", "ok")
+
+        entry = manifest.get("MOCK:SYM", "1")
+        assert entry[LAST_TS] == 660
+        assert entry[BAR_CNT] == 11
+        assert entry[OUTCOME] == "ok"
+        filepath = get_symbol_pair_filepath(storage_dir, "MOCK:SYM", "1")
+        assert entry[FILE_SIZE] == os.path.getsize(filepath)
+        assert manifest.get_last_ts("MOCK:EMPTY", "1D") is None
+        assert manifest.get("MOCK:SYM", "1D") is None
+
+        pairs = scan_storage(storage_dir, num_processes=2)
+        assert pairs["MOCK:SYM"]["1"][:3] == entry[:3]
+        empty_filepath = get_symbol_pair_filepath(storage_dir, "MOCK:EMPTY", "1D")
+        size = os.path.getsize(empty_filepath)
+        assert pairs["MOCK:EMPTY"]["1D"][:3] == [None, 0, size]
+        assert manifest.get("MOCK:EMPTY", "1D")[:3] == [None, 0, size]
+        assert get_file_summary(filepath)[:3] == entry[:3]
+
+    def test_storage_manifest_2(self, tmp_path):
+        # a manifest with changes not saved is stale
+        manifest = StorageManifest(str(tmp_path), "csv")
+        assert not manifest.load()
+        manifest.update("MOCK:SYM", "1", 60, 1, 100)
+        assert os.path.exists(manifest.dirty_filepath)
+        assert not StorageManifest(str(tmp_path), "csv").load()
+
+        manifest.save()
+        assert not os.path.exists(manifest.dirty_filepath)
+        loaded = StorageManifest(str(tmp_path), "csv")
+        assert loaded.load()
+        assert loaded.pairs == manifest.pairs
+        # nor is it loaded for another storage format
+        assert not StorageManifest(str(tmp_path), "binary").load()
+
+        loaded.update("MOCK:SYM", "1", None, 1, 120)
+        assert loaded.get_last_ts("MOCK:SYM", "1") == 60
+        assert not StorageManifest(str(tmp_path), "csv").load()
+
+    def test_storage_manifest_3(self, tmp_path, monkeypatch):
+        # the engine rebuilds a missing manifest, then schedules and sizes the
+        # requests without opening a data file
+        storage_dir = os.path.join(tmp_path, "storage")
+        write_to_file(storage_dir, "MOCK:SYM0", "1", make_bars(int(time.time()) - 180, 3))
+        write_empty_file(storage_dir, "MOCK:SYM1", "1")
+        engine = ScraperEngine(
+            engine_name="test",
+            username=None,
+            password=None,
+            log_dir=str(tmp_path),
+            log_formatter=logging.Formatter("%(message)s"),
+            storage_dir=storage_dir,
+            cache_dir=os.path.join(tmp_path, "cache"),
+            db_url="",
+            url="ws://127.0.0.1:1",
+        )
+        assert len(engine.manifest) == 2
+        assert os.path.exists(engine.manifest.filepath)
+
+        opened = []
+        real_open = open
+
+        def spy_open(file, *args, **kwargs):
+            if str(file).startswith(storage_dir):
+                opened.append(file)
+            return real_open(file, *args, **kwargs)
+
+        monkeypatch.setattr("builtins.open", spy_open)
+        pairs = [("MOCK:SYM0", "1"), ("MOCK:SYM1", "1"), ("MOCK:SYM2", "1")]
+        for symbol, interval in pairs:
+            engine._schedule_symbol_pair(symbol, interval)
+        max_bars_dict = engine._get_max_bars_dict(pairs)
+        monkeypatch.undo()
+        engine.close()
+
+        assert opened == []
+        # only MOCK:SYM2 has no file, the others were crawled recently
+        assert engine.symbol_pair_scheduler.readySize() == 1
+        assert engine.symbol_pair_scheduler.waitingSize() == 2
+        assert max_bars_dict[("MOCK:SYM2", "1")] > max_bars_dict[("MOCK:SYM0", "1")]
+
+    def test_storage_manifest_4(self, tmp_path, monkeypatch):
+        # overlapped lines that do not parse are still counted as replaced
+        monkeypatch.setenv("ERROR_FILE", os.path.join(tmp_path, "error_file.txt"))
+        storage_dir = os.path.join(tmp_path, "storage")
+        manifest = StorageManifest(os.path.join(tmp_path, "cache"), "csv")
+        write_to_file(storage_dir, "MOCK:SYM", "1", make_bars(60, 6), manifest=manifest)
+        filepath = get_symbol_pair_filepath(storage_dir, "MOCK:SYM", "1")
+        with open(filepath) as f:
+            data = f.read()
+        with open(filepath, "w") as f:
+            f.write(data[: data.rindex(",")] + ",x\n")
+
+        write_to_file(storage_dir, "MOCK:SYM", "1", make_bars(300, 3), manifest=manifest)
+        with open(filepath) as f:
+            assert len(f.readlines()) == 1 + 7
+        assert manifest.get("MOCK:SYM", "1")[BAR_CNT] == 7
+        with open(os.path.join(tmp_path, "error_file.txt")) as f:
+            assert f.read() == filepath + "\n"
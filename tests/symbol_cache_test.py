@@ -0,0 +1,60 @@
+from packages.services.symbol_cache import SymbolCapabilityCache
+
+
+class TestClass:
+    def test_symbol_cache_1(self, tmp_path):
+        cache = SymbolCapabilityCache(str(tmp_path), ttl=100)
+        cache.update("MOCK:SYM0", "1", 5, {"data_frequency": "1S"})
+        cache.update("MOCK:SYM0", "1S", None, {"error": "unsupported_resolution"})
+        cache.update("MOCK:SYM0", "1D", 7, {"data_frequency": "1S"})
+        cache.update("MOCK:SYM1", "1", None, {"error": "symbol_error"})
+        cache.update("MOCK:SYM2", "1", None, {"data_frequency": "1D"})
+        cache.update("MOCK:SYM3", "1", None, {"error": "series_error"})
+        cache.save()
+
+        loaded = SymbolCapabilityCache(str(tmp_path), ttl=100)
+        loaded.load()
+        assert loaded.skip_reason("MOCK:SYM0", "1") is None
+        assert loaded.skip_reason("MOCK:SYM0", "1S")[0] == "unsupported_resolution"
+        assert loaded.skip_reason("MOCK:SYM0", "1D")[0] == "width"
+        assert loaded.skip_reason("MOCK:SYM1", "1D")[0] == "symbol_error"
+        assert loaded.skip_reason("MOCK:SYM2", "1")[0] == "data_frequency"
+        assert loaded.skip_reason("MOCK:SYM2", "1W") is None
+        # transient errors are not cached
+        assert loaded.skip_reason("MOCK:SYM3", "1") is None
+        assert loaded.skip_reason("MOCK:SYM4", "1") is None
+
+    def test_symbol_cache_2(self, tmp_path):
+        # the reasons expire after ttl
+        cache = SymbolCapabilityCache(str(tmp_path), ttl=100)
+        cache.update("MOCK:SYM0", "1S", None, {"error": "unsupported_resolution"})
+        cache.update("MOCK:SYM1", "1", None, {"error": "symbol_error"})
+        at = cache.symbols["MOCK:SYM0"]["intervals"]["1S"]["at"]
+        reason, expire = cache.skip_reason("MOCK:SYM0", "1S", now=at + 40)
+        assert reason == "unsupported_resolution" and expire == 60
+        assert cache.skip_reason("MOCK:SYM0", "1S", now=at + 101) is None
+        assert cache.skip_reason("MOCK:SYM1", "1", now=at + 101) is None
+
+        # a resolved symbol clears its symbol_error
+        cache.update("MOCK:SYM1", "1", 5, {"data_frequency": "1S"})
+        assert cache.skip_reason("MOCK:SYM1", "1") is None
+
+    def test_symbol_cache_3(self, tmp_path):
+        # a symbol_error is kept for symbol_error_ttl until it repeats, and
+        # does not skip the intervals with bars
+        cache = SymbolCapabilityCache(
+            str(tmp_path), ttl=100, symbol_error_ttl=10, symbol_error_strikes=3
+        )
+        cache.update("MOCK:SYM0", "1", 5, {"data_frequency": "1S"})
+        cache.update("MOCK:SYM0", "1D", None, {"error": "symbol_error"})
+        at = cache.symbols["MOCK:SYM0"]["error_at"]
+        assert cache.skip_reason("MOCK:SYM0", "1D", now=at + 5)[0] == "symbol_error"
+        assert cache.skip_reason("MOCK:SYM0", "1D", now=at + 11) is None
+        assert cache.skip_reason("MOCK:SYM0", "1", now=at + 5) is None
+        assert cache.skip_reason("MOCK:SYM0", "1W", now=at + 5, has_bars=True) is None
+
+        for _ in range(2):
+            cache.update("MOCK:SYM0", "1D", None, {"error": "symbol_error"})
+        at = cache.symbols["MOCK:SYM0"]["error_at"]
+        assert cache.skip_reason("MOCK:SYM0", "1D", now=at + 50)[1] == 50
+        assert cache.skip_reason("MOCK:SYM0", "1", now=at + 50) is None
@@ -0,0 +1,58 @@
+import logging
+
+from packages.mocks.tradingview_server import start_mock_server_thread
+from packages.scrapers.worker_pool import ScraperWorkerPool
+
+logger = logging.getLogger("test")
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord):
+        self.records.append(record)
+
+
+class TestClass:
+    def test_worker_pool_1(self):
+        # the slow pairs come first, a static split would give them all to
+        # the first worker
+        mock, url, stop = start_mock_server_thread(
+            bar_count=10, interval_latency={"1": 0.2}
+        )
+        pairs = [(f"MOCK:SYM{i}", "1") for i in range(6)]
+        pairs += [(f"MOCK:SYM{i}", "1D") for i in range(6)]
+        pool = ScraperWorkerPool(logger, num_processes=2, url=url, max_cs=2)
+        try:
+            for _ in range(2):
+                results = list(pool.iter_bars("", pairs))
+                assert sorted(r[:2] for r in results) == sorted(pairs)
+                assert all(r[3]["status"] == "ok" for r in results)
+                assert len(pool.worker_stats) == 2
+                assert sum(stats["pairs"] for stats in pool.worker_stats) == len(pairs)
+                assert all(stats["pairs"] > 0 for stats in pool.worker_stats)
+        finally:
+            pool.close()
+            stop.set()
+
+        # the workers keep their connection across batches
+        assert mock.stats["connections"] == 2
+
+    def test_worker_pool_2(self):
+        # the log records of the workers are handled by the logger of the pool
+        mock, url, stop = start_mock_server_thread(bar_count=10, symbol_error_rate=1.0)
+        handler = ListHandler()
+        pool_logger = logging.getLogger("test.worker_pool")
+        pool_logger.addHandler(handler)
+        pool = ScraperWorkerPool(pool_logger, num_processes=2, url=url, max_cs=2)
+        try:
+            results = list(pool.iter_bars("", [("MOCK:SYM0", "1D"), ("MOCK:SYM1", "1D")]))
+        finally:
+            pool.close()
+            stop.set()
+            pool_logger.removeHandler(handler)
+
+        assert len(results) == 2 and all(r[2] is None for r in results)
+        assert any(r.name.startswith("test.worker_pool.worker-") for r in handler.records)
@@ -1,12 +1,18 @@
+from packages.services.bars import Bars
 from packages.services.write import (
-    fGetLastLineTs,
-    fGetLineTs,
-    fRemoveLastLine,
-    fSearchStartByteOfLine,
+    diff_old_overlapped_bars,
+    f_get_last_line_ts as fGetLastLineTs,
+    f_get_line_ts as fGetLineTs,
+    f_remove_last_line as fRemoveLastLine,
+    f_search_start_byte_of_line as fSearchStartByteOfLine,
     get_last_line_ts,
+    format_csv_rows,
     get_symbol_pair_filepath,
+    parse_csv_rows,
     search_idx_of_bars,
+    write_to_file,
 )
+import numpy as np
 import time
 import shutil
 import os
@@ -127,7 +133,9 @@ class TestClass:
             assert fGetLineTs(f, b_line) == None
 
     def test_write_11(self):
-        bars = [{"v": [float(i), 0.0, 0.0, 0.0, 0.0, 0.0]} for i in range(10)]
+        bars = Bars.from_series(
+            [{"v": [float(i), 0.0, 0.0, 0.0, 0.0, 0.0]} for i in range(10)]
+        )
 
         assert search_idx_of_bars(bars, 0, 10, 0) == 0
         assert search_idx_of_bars(bars, 0, 10, 0.5) == 0
@@ -139,6 +147,55 @@ class TestClass:
         assert search_idx_of_bars(bars, 0, 10, 8.5) == 8
         assert search_idx_of_bars(bars, 0, 10, 10) == 9
 
+    def test_write_12(self):
+        storage_dir = os.path.join(get_base_dir(), "test_write_12")
+        shutil.rmtree(storage_dir, ignore_errors=True)
+        series = [
+            {"i": i, "v": [1693550000.0 + 60 * i, 1.5, 2.0, 1.0, 1.25, 100.0]}
+            for i in range(10)
+        ]
+
+        res = write_to_file(storage_dir, "MOCK:SYM", "1", Bars.from_series(series[:6]))
+        assert res["status"] == "ok"
+        # overlapping bars are verified and replaced
+        res = write_to_file(storage_dir, "MOCK:SYM", "1", Bars.from_series(series[3:]))
+        assert res["status"] == "ok"
+
+        filepath = get_symbol_pair_filepath(storage_dir, "MOCK:SYM", "1")
+        with open(filepath) as f:
+            lines = f.readlines()
+        assert lines[0] == "timestamp,open,high,low,close,volume\n"
+        assert lines[1:] == [
+            ",".join([str(int(bar["v"][0]))] + [str(v) for v in bar["v"][1:]]) + "\n"
+            for bar in series
+        ]
+
+        # a stored bar that changed is reported
+        series[9]["v"][4] = 1.75
+        res = write_to_file(storage_dir, "MOCK:SYM", "1", Bars.from_series(series[8:]))
+        assert res["status"] == "warning"
+        shutil.rmtree(storage_dir)
+
+    def test_write_13(self):
+        rows = np.array([[60.0, 1.5, 2.0, 1.0, 1.25, 100.0], [120.0, 0.1, 0.2, 0.3, 0.4, 0.5]])
+        data = format_csv_rows(rows)
+        assert data == "60,1.5,2.0,1.0,1.25,100.0\n120,0.1,0.2,0.3,0.4,0.5\n"
+        assert np.array_equal(parse_csv_rows(data.encode()), rows)
+        # stray characters are tolerated
+        assert np.array_equal(parse_csv_rows(b"60.0,1.5,2.0,1.0,1.25,100.0.\n"), rows[:1])
+
+        # bars are matched by timestamp, the stored ones missing from the new
+        # bars or different are reported
+        old = np.array([[60.0, 1.0], [120.0, 2.0], [180.0, 3.0], [240.0, np.nan]])
+        new = np.array([[60.0, 1.0], [180.0, 3.5], [240.0, np.nan], [300.0, 5.0]])
+        diff_bars, details = diff_old_overlapped_bars(old, new)
+        assert diff_bars.tolist() == [[120.0, 2.0], [180.0, 3.0]]
+        assert details[0]["missing(old_bars)"] == 1
+        assert details[0]["missing(new_bars)"] == 1
+
+        diff_bars, details = diff_old_overlapped_bars(old, old.copy())
+        assert len(diff_bars) == 0 and details == []
+
     # def test_write_10(self):
     #     bars = []
     #     t_start = int(time.time())
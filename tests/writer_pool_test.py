@@ -0,0 +1,97 @@
+import threading
+
+import numpy as np
+
+from packages.schedulers.byte_budget import ByteBudget
+from packages.services.bars import Bars
+from packages.services.storage_manifest import BAR_CNT, StorageManifest
+from packages.services.write import get_symbol_pair_filepath, write_to_file
+from packages.services.writer_pool import WriterPool, merge_bars
+
+
+def make_bars(start_ts: int, num: int, close: float = 1.25) -> Bars:
+    ts = start_ts + 60 * np.arange(num, dtype=np.int64)
+    values = np.tile([1.5, 2.0, 1.0, close, 100.0], (num, 1))
+    return Bars(ts, values)
+
+
+class TestClass:
+    def test_writer_pool_1(self):
+        # later bars replace the earlier ones they overlap
+        merged = merge_bars([make_bars(60, 5), make_bars(180, 5, 1.5)])
+        assert len(merged) == 1
+        assert merged[0].ts.tolist() == [60 * i for i in range(1, 8)]
+        assert merged[0].values[:, 3].tolist() == [1.25] * 2 + [1.5] * 5
+
+        narrow = Bars(np.array([600]), np.array([[1.0, 1.0]]))
+        assert len(merge_bars([make_bars(60, 5), narrow])) == 2
+
+    def test_writer_pool_2(self, tmp_path):
+        # the files are the same as when written one after the other
+        pool_dir = str(tmp_path / "pool")
+        sequential_dir = str(tmp_path / "sequential")
+        manifest = StorageManifest(str(tmp_path / "cache"), "csv")
+        budget = ByteBudget()
+        written = []
+        lock = threading.Lock()
+
+        def on_written(symbol: str, interval: str, res: dict):
+            with lock:
+                written.append((symbol, interval, res["status"]))
+
+        pool = WriterPool(
+            pool_dir, 3, manifest=manifest, budget=budget, on_written=on_written
+        )
+        batches = [
+            (f"MOCK:SYM{i % 20}", "1", make_bars(60 * (1 + j), 10, 1.0 + j))
+            for j in range(3)
+            for i in range(60)
+        ]
+        for symbol, interval, bars in batches:
+            budget.add(bars.nbytes)
+            pool.submit(symbol, interval, bars)
+            write_to_file(sequential_dir, symbol, interval, bars)
+        pool.flush()
+
+        for i in range(20):
+            symbol = f"MOCK:SYM{i}"
+            with open(get_symbol_pair_filepath(pool_dir, symbol, "1")) as f:
+                pool_lines = f.readlines()
+            with open(get_symbol_pair_filepath(sequential_dir, symbol, "1")) as f:
+                assert pool_lines == f.readlines()
+            assert manifest.get(symbol, "1")[BAR_CNT] == len(pool_lines) - 1
+
+        assert budget.stats()["bytes"] == 0
+        assert budget.stats()["items"] == 0
+        stats = pool.stats()
+        assert stats["writes"] == len(written) <= len(batches)
+        assert stats["write_time"] > 0
+        assert {status for _, _, status in written} <= {"ok", "warning"}
+        pool.close()
+
+    def test_writer_pool_3(self, tmp_path):
+        # an error of on_written neither stops the writes of the pair nor
+        # keeps its bars in the budget
+        budget = ByteBudget()
+        calls = []
+
+        def on_written(symbol: str, interval: str, res: dict):
+            calls.append(symbol)
+            if len(calls) == 1:
+                raise TypeError("not serializable")
+
+        pool = WriterPool(str(tmp_path), 1, budget=budget, on_written=on_written)
+        for j in range(3):
+            bars = make_bars(60 * (1 + 10 * j), 10)
+            budget.add(bars.nbytes)
+            pool.submit("MOCK:SYM0", "1", bars)
+        pool.flush()
+        assert pool.active == set()
+        assert budget.stats()["bytes"] == 0
+
+        pool.submit("MOCK:SYM0", "1", make_bars(60 * 31, 10))
+        pool.close()
+        filepath = get_symbol_pair_filepath(str(tmp_path), "MOCK:SYM0", "1")
+        with open(filepath) as f:
+            assert len(f.readlines()) == 41
+        assert len(calls) == pool.stats()["writes"]